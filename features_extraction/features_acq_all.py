@@ -0,0 +1,141 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Sibling feature scripts (this directory is on sys.path when run as a script)
+import features_acq_ecg
+import features_acq_eda
+import features_acq_rsp
+import features_acq_bp
+
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import read_sampling_rate
+from utils.segmentation import load_segmentation
+
+# Each extractor loads its processed_<modality>_* file, labels it with the
+# visit's phases and writes the same features_<modality>_* files as the
+# standalone script.
+MODALITY_EXTRACTORS = {
+    "ecg": features_acq_ecg.extract_features,
+    "eda": features_acq_eda.extract_features,
+    "rsp": features_acq_rsp.extract_features,
+    "bp": features_acq_bp.extract_features,
+}
+
+def find_processed_file(input_dir, modality, participant_id, visit):
+    """
+    processed_<modality>_<id>_<visit>.parquet (or .csv) in input_dir, as
+    written by Layer 2. None if the recording has no such file.
+    """
+    stem = f"processed_{modality}_{participant_id}_{visit.replace(' ', '_')}"
+    for ext in (".parquet", ".csv"):
+        path = os.path.join(input_dir, stem + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def run_modality(modality, *args, **kwargs):
+    """
+    Runs one modality's extractor. Returns an error message, or None on
+    success, so a failing modality doesn't stop the others.
+    """
+    try:
+        MODALITY_EXTRACTORS[modality](*args, **kwargs)
+    except (Exception, SystemExit) as e:
+        # load_data() exits on an unreadable file
+        return f"{type(e).__name__}: {e}"
+    return None
+
+def extract_all(files, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                sampling_rate=None, workers=1, modality_options=None):
+    """
+    Runs every modality in files ({modality: processed file}) with the same
+    visit segmentation. With workers > 1 the modalities run in a process pool.
+    Returns the list of modalities that failed.
+    """
+    modality_options = modality_options or {}
+    jobs = {
+        mod: ((mod, path, segmentation, participant_id, visit, output_dir, window_sizes, hop_size, sampling_rate),
+              modality_options.get(mod, {}))
+        for mod, path in files.items()
+    }
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            futures = {mod: pool.submit(run_modality, *args, **kwargs) for mod, (args, kwargs) in jobs.items()}
+            errors = {mod: future.result() for mod, future in futures.items()}
+    else:
+        errors = {}
+        for mod, (args, kwargs) in jobs.items():
+            print(f"--- {mod.upper()} ---")
+            errors[mod] = run_modality(*args, **kwargs)
+
+    failed = []
+    for mod, error in errors.items():
+        if error is not None:
+            print(f"{mod.upper()} feature extraction failed: {error}")
+            failed.append(mod)
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract features for every modality of one visit, reading the events once.")
+    parser.add_argument("--id", required=True, help="Participant ID")
+    parser.add_argument("--visit", required=True, help="Visit Type (e.g., 'TSST Visit')")
+    parser.add_argument("--dir", required=True, help="Directory with the visit's processed_<modality>_* files (Layer 2 output)")
+    parser.add_argument("--events_file", required=False, help="Path to events CSV file (default: <dir>/events.csv)")
+    parser.add_argument("--out", required=False, help="Output directory (default: --dir)")
+    parser.add_argument("--modalities", nargs="+", choices=list(MODALITY_EXTRACTORS.keys()), default=None,
+                        help="Subset of modalities to extract (default: all with a processed file)")
+    parser.add_argument("--window_size", type=float, nargs='+', default=[1.0], help="Window size(s) in seconds, one output file each")
+    parser.add_argument("--hop_size", type=float, default=None, help="Hop between window starts in seconds (default: window size, i.e. no overlap)")
+    parser.add_argument("--sampling_rate", type=float, default=None, help="Sampling rate in Hz (default: from each file's metadata, else 1000)")
+    parser.add_argument("--workers", type=int, default=1, help="Run modalities in a pool of this many processes (default: 1, one after another)")
+    parser.add_argument("--rr_table", action="store_true", help="ECG: see features_acq_ecg.py --rr_table")
+    parser.add_argument("--hrv_frequency", action="store_true", help="ECG: see features_acq_ecg.py --hrv_frequency")
+    parser.add_argument("--beat_table", action="store_true", help="BP: see features_acq_bp.py --beat_table")
+    parser.add_argument("--feature_store", default=None, help="Also write the features to this feature store directory (see utils/feature_store.py)")
+    parser.add_argument("--max_memory", type=float, default=None, help="Read each processed file in chunks to stay within about this many MB per modality (with --workers, per process)")
+
+    args = parser.parse_args()
+    events_file = args.events_file or os.path.join(args.dir, "events.csv")
+    output_dir = args.out or args.dir
+
+    files = {}
+    sampling_rates = set()
+    for mod in args.modalities or MODALITY_EXTRACTORS.keys():
+        path = find_processed_file(args.dir, mod, args.id, args.visit)
+        if path is None:
+            # A recording may simply not have this channel
+            print(f"No processed {mod.upper()} file, skipping.")
+            continue
+        sampling_rate = args.sampling_rate or read_sampling_rate(path, default=1000)
+        if args.hop_size is not None and int(args.hop_size * sampling_rate) < 1:
+            print(f"Error: --hop_size must be at least one sample, got {args.hop_size}s")
+            sys.exit(1)
+        files[mod] = path
+        sampling_rates.add(sampling_rate)
+
+    if not files:
+        print("No processed files found.")
+        sys.exit(1)
+
+    # The visit's segmentation is loaded (or derived from the events) once for all modalities
+    segmentation = load_segmentation(events_file, args.visit, sorted(sampling_rates))
+
+    modality_options = {
+        "ecg": {"rr_table_mode": args.rr_table, "hrv_frequency": args.hrv_frequency},
+        "bp": {"beat_table": args.beat_table},
+    }
+    for mod in files:
+        modality_options.setdefault(mod, {}).update(feature_store=args.feature_store, max_memory=args.max_memory)
+    failed = extract_all(files, segmentation, args.id, args.visit, output_dir, args.window_size, args.hop_size,
+                         args.sampling_rate, args.workers, modality_options)
+
+    if failed:
+        print(f"Failed modalities: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
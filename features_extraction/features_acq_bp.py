@@ -4,79 +4,67 @@ import numpy as np
 import os
 import sys
 
-def load_data(processed_file, events_file):
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import (apply_schema, beat_table, beats_from_values, chunk_rows_for_budget, iter_signals, load_beats, load_index,
+                             load_signals, peak_envelope, peak_indexes, peaks_between, read_sampling_rate, signal_columns)
+from utils.segmentation import load_segmentation, segment_table
+
+# Sibling window engine (this directory is on sys.path when run as a script)
+from windowing import (SegmentStats, WindowCursor, concat_windows, condition_codes, gather_at, grouped_rows, iter_blocks,
+                       nanmean_rows, nanstd_rows, peak_bounds, window_mean_sd, window_modes, window_pyramid, window_starts,
+                       write_feature_outputs)
+
+PEAK_COLUMNS = ['BP_Systolic_Peak', 'BP_Diastolic_Peak']
+# Envelope column -> the peaks it runs through
+ENVELOPE_COLUMNS = {'BP_Systolic_Interp': 'BP_Systolic_Peak', 'BP_Diastolic_Interp': 'BP_Diastolic_Peak'}
+
+def load_data(processed_file):
     """
-    Loads processed BP data and events.
+    Loads processed BP data.
     """
     print(f"Loading processed data: {processed_file}")
     try:
-        # Optimization: Read header first to exclude 'Event_Label' (mixed types, unused)
-        header = pd.read_csv(processed_file, nrows=0).columns
-        cols_to_use = [c for c in header if 'Event_Label' not in c]
-        
-        bp_df = pd.read_csv(processed_file, usecols=cols_to_use)
+        # Older processed files have a per-sample 'Event_Label' column (mixed types, unused; events are now in the index sidecar). Reads .csv or .parquet.
+        # Systolic/diastolic peaks come from the index sidecar when there is one, so skip the 0/1 columns.
+        exclude = ('Event_Label',)
+        index = load_index(processed_file)
+        exclude += tuple(c for c in PEAK_COLUMNS if c in index)
+        bp_df = load_signals(processed_file, exclude=exclude)
     except Exception as e:
         print(f"Error reading processed file: {e}")
         sys.exit(1)
 
-    print(f"Loading events: {events_file}")
-    try:
-        events_df = pd.read_csv(events_file, header=None, names=['Event', 'Time', 'Duration', 'Type'], on_bad_lines='skip')
-        events_df['Time'] = pd.to_numeric(events_df['Time'], errors='coerce')
-        events_df = events_df.dropna(subset=['Time'])
-    except Exception as e:
-        print(f"Error reading events file: {e}")
-        sys.exit(1)
-        
-    return bp_df, events_df
+    # Files processed with --beat_table have no SBP/DBP envelope columns: rebuild them from the peaks
+    col_clean = find_column(bp_df.columns, 'BP_Clean')
+    if find_column(bp_df.columns, 'BP_Systolic_Interp') is None and col_clean is not None:
+        peaks = {c: index[c] for c in PEAK_COLUMNS if c in index} or peak_indexes(bp_df, PEAK_COLUMNS)
+        clean = bp_df[col_clean].to_numpy()
+        add_envelopes(bp_df, peaks, {c: clean[idx] for c, idx in peaks.items()})
+    return bp_df
 
-def filter_events(events_df, visit_type):
+def add_envelopes(bp_df, peaks, values, offset=0):
     """
-    Filters events based on markers.
+    Adds the BP_Systolic_Interp / BP_Diastolic_Interp envelopes (np.interp
+    through the BP_Clean values at the peaks, utils.signal_io.peak_envelope),
+    for files processed with --beat_table, which leave them out.
+    peaks, values: {peak column: sample indexes / BP_Clean values} over the whole recording.
+    offset: sample of the first row, for a block of a chunked pass.
     """
-    if "TSST" in visit_type:
-        markers = [
-            'Baseline Resting Period', 'Task Introduction', 'Speech Preperation', 
-            'Speech Period', 'Arithmetic Period', 'Debrief Period', 'Recovery Period'
-        ]
-    elif "PDST" in visit_type:
-        markers = [
-            'Baseline Resting Period', 'Speech Period', 'Debrief Period', 'Recovery Period'
-        ]
-    else:
-        print(f"Unknown visit type: {visit_type}. Using all events.")
-        markers = events_df['Event'].unique().tolist()
-
-    filtered_events = events_df[events_df['Event'].isin(markers)].copy()
-    filtered_events = filtered_events.sort_values(by='Time').reset_index(drop=True)
-    return filtered_events, markers
+    for col, peak_col in ENVELOPE_COLUMNS.items():
+        indexes = peaks.get(peak_col, np.array([], dtype=np.int64))
+        bp_df[col] = peak_envelope(indexes, values.get(peak_col, np.array([])), offset, offset + len(bp_df))
+    return bp_df
 
-def label_conditions(bp_df, events_df, sampling_rate=1000):
+def label_conditions(bp_df, segments, offset=0):
     """
     Adds Condition column.
+    offset: sample of the first row, for a block of a chunked pass.
     """
-    bp_df['Condition'] = None
-    events = events_df.sort_values(by='Time').reset_index(drop=True)
-    
-    for i in range(len(events)):
-        current_event = events.iloc[i]
-        start_time = current_event['Time']
-        condition = current_event['Event']
-        
-        start_idx = int(start_time * sampling_rate)
-        
-        if i < len(events) - 1:
-            end_time = events.iloc[i+1]['Time']
-            end_idx = int(end_time * sampling_rate)
-        else:
-            end_idx = len(bp_df)
-            
-        if start_idx < 0: start_idx = 0
-        if end_idx > len(bp_df): end_idx = len(bp_df)
-        
-        if start_idx < len(bp_df):
-            bp_df.loc[start_idx:end_idx, 'Condition'] = condition
-            
+    # int8 codes per sample (see condition_codes); labels are only looked up for the output
+    codes, categories = condition_codes(segments, len(bp_df), offset)
+    bp_df['Condition'] = pd.Categorical.from_codes(codes, categories)
+
     return bp_df
 
 def find_column(columns, prefix):
@@ -85,6 +73,27 @@ def find_column(columns, prefix):
             return col
     return None
 
+def load_beat_table(processed_file, bp_df, sampling_rate):
+    """
+    Per-beat table of a processed BP file (utils.signal_io.beat_table): the
+    <stem>_beats file process_acq_bp.py writes with --beat_table, else built
+    from the systolic/diastolic peaks (index sidecar, or the 0/1 columns of
+    older files) and BP_Clean. Returns None if there is no beats file and
+    the file has no peak positions or no BP_Clean column.
+    """
+    beats = load_beats(processed_file)
+    if beats is not None:
+        return beats
+
+    col_clean = find_column(bp_df.columns, 'BP_Clean')
+    peaks = load_index(processed_file)
+    if 'BP_Systolic_Peak' not in peaks:
+        peaks = peak_indexes(bp_df, PEAK_COLUMNS)
+    if col_clean is None or 'BP_Systolic_Peak' not in peaks:
+        return None
+    troughs = peaks.get('BP_Diastolic_Peak', np.array([], dtype=np.int64))
+    return apply_schema(beat_table(bp_df[col_clean].to_numpy(), peaks['BP_Systolic_Peak'], troughs, sampling_rate), "bp")
+
 def compute_features(segment, sampling_rate):
     if segment.empty:
         return {}
@@ -151,85 +160,344 @@ def compute_features(segment, sampling_rate):
 
     return features
 
-def main():
-    parser = argparse.ArgumentParser(description="Extract BP features.")
-    parser.add_argument("--id", required=True)
-    parser.add_argument("--visit", required=True)
-    parser.add_argument("--file", required=True)
-    parser.add_argument("--events_file", required=True)
-    parser.add_argument("--out", required=True)
-    parser.add_argument("--window_size", type=float, default=1.0)
-    parser.add_argument("--sampling_rate", type=int, default=1000)
-    
-    args = parser.parse_args()
+def beat_window_stats(values, lo, counts):
+    """
+    Mean and SD (ddof=1) of the per-beat values of each window; NaN for
+    windows without beats (SD also for windows with a single beat).
+    """
+    mean = np.full(len(counts), np.nan, dtype=values.dtype)
+    sd = np.full(len(counts), np.nan, dtype=values.dtype)
+    for _, ids, matrix in grouped_rows(values, lo, counts):
+        mean[ids] = nanmean_rows(matrix)
+        sd[ids] = nanstd_rows(matrix)
+    return mean, sd
+
+def compute_windowed_features(bp_df, window_samples, sampling_rate, beats=None, hop_samples=None, pyramid=None, offset=0):
+    """
+    compute_features() for every full window of window_samples at once, one
+    window every hop_samples (default: back to back), with each column reduced
+    per window (see windowing.window_mean_sd, aggregated from `pyramid` when
+    given). Returns the same columns (and values) as the per-window loop.
+    With a beat table (load_beat_table), systolic, diastolic and pulse
+    pressure are instead the mean/SD over the beats whose systolic peak falls
+    in the window; MAP and rate still come from BP_Clean and BP_Rate.
+    offset: sample of the first row of bp_df (a block of a chunked pass);
+    beats always covers the whole recording.
+    """
+    starts = window_starts(len(bp_df), window_samples, hop_samples) + offset
+    n_windows = len(starts)
+    if n_windows == 0:
+        return pd.DataFrame()
+
+    col_sys = find_column(bp_df.columns, 'BP_Systolic_Interp')
+    col_dia = find_column(bp_df.columns, 'BP_Diastolic_Interp')
+    col_clean = find_column(bp_df.columns, 'BP_Clean')
+    col_rate = find_column(bp_df.columns, 'BP_Rate')
+
+    def mean_sd(values, key):
+        return window_mean_sd(values, window_samples, hop_samples, pyramid, key)
+
+    stats = {}
+    if beats is not None:
+        lo, counts = peak_bounds(beats['Systolic_Sample'].to_numpy(), starts, starts + window_samples)
+        for name in ['BP_Systolic', 'BP_Diastolic', 'BP_PulsePressure']:
+            stats[name] = beat_window_stats(beats[name].to_numpy(), lo, counts)
+    else:
+        # 1. Systolic, 2. Diastolic
+        for col, name in [(col_sys, 'BP_Systolic'), (col_dia, 'BP_Diastolic')]:
+            if col:
+                stats[name] = mean_sd(bp_df[col].to_numpy(), col)
+            else:
+                stats[name] = (np.nan, np.nan)
+
+        # 4. Pulse Pressure (point-wise Sys - Dia)
+        if col_sys and col_dia:
+            compute_pp = lambda: bp_df[col_sys].to_numpy() - bp_df[col_dia].to_numpy()
+            pp = pyramid.cached('values', 'BP_PulsePressure', compute_pp) if pyramid is not None else compute_pp()
+            stats['BP_PulsePressure'] = mean_sd(pp, 'BP_PulsePressure')
+        else:
+            stats['BP_PulsePressure'] = (np.nan, np.nan)
+
+    # 3. MAP (Mean Arterial Pressure) from BP_Clean
+    if col_clean:
+        stats['BP_MAP'] = mean_sd(bp_df[col_clean].to_numpy(), col_clean)
+    elif col_sys and col_dia:
+        # Fallback if interp exists: MAP ~ 1/3 Sys + 2/3 Dia
+        sys_val = mean_sd(bp_df[col_sys].to_numpy(), col_sys)[0]
+        dia_val = mean_sd(bp_df[col_dia].to_numpy(), col_dia)[0]
+        stats['BP_MAP'] = ((sys_val + 2*dia_val) / 3, np.nan)
+    else:
+        stats['BP_MAP'] = (np.nan, np.nan)
+
+    # 5. Heart Rate (from BP)
+    if col_rate:
+        stats['BP_Rate'] = mean_sd(bp_df[col_rate].to_numpy(), col_rate)
+    else:
+        stats['BP_Rate'] = (np.nan, np.nan)
+
+    features = pd.DataFrame({
+        'Time': starts / sampling_rate,
+        'Condition': window_modes(bp_df['Condition'], window_samples, hop_samples=hop_samples, pyramid=pyramid, key='Condition'),
+    })
+    for name in ['BP_Systolic', 'BP_Diastolic', 'BP_MAP', 'BP_PulsePressure', 'BP_Rate']:
+        features[f'{name}_Mean'], features[f'{name}_SD'] = stats[name]
+    return features
+
+def extract_features(processed_file, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                     sampling_rate=None, beat_table=False, feature_store=None, max_memory=None):
+    """
+    Event-based and windowed BP features of one processed file, written as
+    features_bp_* CSVs to output_dir. segmentation: the visit's phases
+    (utils.segmentation.load_segmentation), shared by all modalities.
+    feature_store: also write the event-based and windowed tables to this
+    store (utils.feature_store).
+    max_memory: read the file in chunks within this many MB instead of
+    loading it whole (see extract_features_chunked).
+    """
+    if max_memory is not None:
+        return extract_features_chunked(processed_file, segmentation, participant_id, visit, output_dir, window_sizes, hop_size,
+                                        sampling_rate, beat_table, feature_store, max_memory)
+    if sampling_rate is None:
+        sampling_rate = read_sampling_rate(processed_file, default=1000)
     
-    if not os.path.exists(args.out):
-        os.makedirs(args.out)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
         
-    bp_df, events_full = load_data(args.file, args.events_file)
-    events_filtered, markers = filter_events(events_full, args.visit)
-    bp_df = label_conditions(bp_df, events_filtered, args.sampling_rate)
+    bp_df = load_data(processed_file)
+    segments = segment_table(segmentation, sampling_rate, len(bp_df))
+    bp_df = label_conditions(bp_df, segments)
     
     # Event-Based
     print("Starting Event-Based Extraction...")
     event_features_list = []
     
-    for _, row in events_filtered.iterrows():
-        condition = row['Event']
-        start_time = row['Time']
-        
-        next_events = events_filtered[events_filtered['Time'] > start_time]
-        end_time = next_events['Time'].iloc[0] if not next_events.empty else len(bp_df)/args.sampling_rate
-             
-        start_idx = int(start_time * args.sampling_rate)
-        end_idx = int(end_time * args.sampling_rate)
+    for seg in segments.itertuples(index=False):
+        condition = seg.Event
+        start_time = seg.Time
+        end_time = seg.End_Time
+        start_idx = seg.Start_Sample
+        end_idx = seg.End_Sample
         
         segment = bp_df.iloc[start_idx:end_idx]
         
         if not segment.empty:
-            feats = compute_features(segment, args.sampling_rate)
+            feats = compute_features(segment, sampling_rate)
             feats['Condition'] = condition
             feats['Start_Time'] = start_time
             feats['Duration'] = end_time - start_time
             event_features_list.append(feats)
             
-    if event_features_list:
-        df_event = pd.DataFrame(event_features_list)
-        cols = ['Condition', 'Start_Time', 'Duration'] + [c for c in df_event.columns if c not in ['Condition', 'Start_Time', 'Duration']]
-        df_event = df_event[cols]
-        out_name = f"features_bp_event_based_{args.id}_{args.visit.replace(' ', '_')}.csv"
-        df_event.to_csv(os.path.join(args.out, out_name), index=False)
-        print(f"Event-based features saved to {out_name}")
-
     # Window-Based
-    print(f"Starting Window-Based Extraction ({args.window_size}s windows)...")
-    window_samples = int(args.window_size * args.sampling_rate)
-    window_features_list = []
+    hop_note = f", {hop_size}s hop" if hop_size is not None else ""
+    hop_samples = int(hop_size * sampling_rate) if hop_size is not None else None
     
-    total_samples = len(bp_df)
+    beats = None
+    if beat_table:
+        beats = load_beat_table(processed_file, bp_df, sampling_rate)
+        if beats is None:
+            print("Warning: no systolic peak positions or BP_Clean column, using the interpolated columns.")
+        else:
+            beats.insert(2, 'Condition', bp_df['Condition'].iloc[beats['Systolic_Sample'].to_numpy()].to_numpy())
+            out_name = f"features_bp_beats_{participant_id}_{visit.replace(' ', '_')}.csv"
+            beats.to_csv(os.path.join(output_dir, out_name), index=False)
+            print(f"Beat table ({len(beats)} beats) saved to {out_name}")
     
-    for start_idx in range(0, total_samples, window_samples):
-        end_idx = start_idx + window_samples
-        if end_idx > total_samples: break
-            
-        segment = bp_df.iloc[start_idx:end_idx]
-        
-        conditions = segment['Condition'].dropna()
-        current_condition = conditions.mode()[0] if not conditions.empty else "Unknown"
-            
-        feats = compute_features(segment, args.sampling_rate)
-        feats['Time'] = start_idx / args.sampling_rate
-        feats['Condition'] = current_condition
-        window_features_list.append(feats)
+    # Finest size first: coarser multiples of it are aggregated from its windows
+    window_sizes = sorted(set(window_sizes))
+    pyramid = window_pyramid(window_sizes, sampling_rate, hop_size)
+    
+    window_features = {}
+    for window_size in window_sizes:
+        print(f"Starting Window-Based Extraction ({window_size}s windows{hop_note})...")
+        window_samples = int(window_size * sampling_rate)
         
-    if window_features_list:
-        df_window = pd.DataFrame(window_features_list)
-        cols = ['Time', 'Condition'] + [c for c in df_window.columns if c not in ['Time', 'Condition']]
-        df_window = df_window[cols]
-        win_str = str(args.window_size).replace('.', '_')
-        out_name = f"features_bp_windowed_{win_str}s_{args.id}_{args.visit.replace(' ', '_')}.csv"
-        df_window.to_csv(os.path.join(args.out, out_name), index=False)
-        print(f"Window-based features saved to {out_name}")
+        # All windows at once (see compute_windowed_features)
+        window_features[window_size] = compute_windowed_features(bp_df, window_samples, sampling_rate, beats, hop_samples, pyramid)
+
+    write_feature_outputs(event_features_list, window_features, "bp", participant_id, visit, output_dir, hop_size, feature_store)
+
+def extract_features_chunked(processed_file, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                             sampling_rate=None, beat_table=False, feature_store=None, max_memory=1024):
+    """
+    extract_features() reading the processed file in chunks sized for
+    max_memory MB (utils.signal_io.chunk_rows_for_budget), so memory does not
+    grow with the recording length. The beat table is built in a first pass
+    (peaks and the BP_Clean values at them) and covers the whole recording;
+    the continuous columns are reduced per window as each block completes
+    (windowing.iter_blocks) and merged per phase (windowing.SegmentStats).
+    Same outputs as extract_features() up to float rounding; coarser window
+    sizes are computed directly (no window pyramid).
+    """
+    if sampling_rate is None:
+        sampling_rate = read_sampling_rate(processed_file, default=1000)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    hop_note = f", {hop_size}s hop" if hop_size is not None else ""
+    hop_samples = int(hop_size * sampling_rate) if hop_size is not None else None
+    window_sizes = sorted(set(window_sizes))
+    cursors = {window_size: WindowCursor(int(window_size * sampling_rate), hop_samples) for window_size in window_sizes}
+    # Blocks carry the longest window, so every window is whole in one block
+    overlap = max(cursor.window_samples for cursor in cursors.values())
+
+    exclude = ('Event_Label',)
+    index = load_index(processed_file)
+    peak_columns = PEAK_COLUMNS
+    exclude += tuple(c for c in peak_columns if c in index)
+    chunk_rows = chunk_rows_for_budget(processed_file, max_memory, exclude=exclude, min_rows=overlap)
+    columns = [c for c in signal_columns(processed_file) if not any(x in c for x in exclude)]
+    col_sys = find_column(columns, 'BP_Systolic_Interp')
+    col_dia = find_column(columns, 'BP_Diastolic_Interp')
+    col_clean = find_column(columns, 'BP_Clean')
+    col_rate = find_column(columns, 'BP_Rate')
+    # Files processed with --beat_table have no envelope columns: rebuilt per block from the peaks
+    envelopes = col_sys is None and col_clean is not None
+    if envelopes:
+        col_sys, col_dia = 'BP_Systolic_Interp', 'BP_Diastolic_Interp'
+    print(f"Reading processed data in chunks of {chunk_rows} rows (max {max_memory} MB): {processed_file}")
+
+    # The beat table written by process_acq_bp.py --beat_table, if there is one (small, read whole)
+    beats = load_beats(processed_file) if beat_table else None
+    build_beats = beat_table and beats is None
+
+    # 1. First pass: recording length, and the peaks and BP_Clean values of the beat table / envelopes
+    collect = (build_beats or envelopes) and col_clean is not None
+    sidecar = 'BP_Systolic_Peak' in index
+    first_pass_columns = columns[:1]
+    if collect:
+        first_pass_columns = [col_clean] + ([] if sidecar else [c for c in peak_columns if c in columns])
+    found = {c: [] for c in peak_columns}
+    values = {c: [] for c in peak_columns}
+    # Sum of BP_Clean over each beat so far (systolic peak to the next), for the beat table's MAP
+    beat_sums = []
+    n_rows = 0
+    for chunk in iter_signals(processed_file, chunk_rows, columns=first_pass_columns):
+        if collect:
+            if sidecar:
+                chunk_peaks = {c: peaks_between(index[c], n_rows, n_rows + len(chunk)) for c in peak_columns if c in index}
+            else:
+                chunk_peaks = peak_indexes(chunk, peak_columns)
+            clean = chunk[col_clean].to_numpy()
+            for c, local in chunk_peaks.items():
+                found[c].append(local + n_rows)
+                values[c].append(clean[local])
+            if build_beats:
+                # Bin 0: samples still in the beat of the previous chunk's last peak
+                local = chunk_peaks.get('BP_Systolic_Peak', np.array([], dtype=np.int64))
+                beat_ids = np.searchsorted(local, np.arange(len(chunk)), side='right')
+                sums = np.bincount(beat_ids, weights=clean.astype(np.float64), minlength=len(local) + 1)
+                if beat_sums:
+                    beat_sums[-1] += sums[0]
+                beat_sums.extend(sums[1:])
+        n_rows += len(chunk)
+
+    gathered = {c: (np.concatenate(found[c]), np.concatenate(values[c])) if found[c] else
+                (np.array([], dtype=np.int64), np.array([], dtype=np.float32)) for c in peak_columns}
+    if build_beats:
+        (systolic, sbp), (troughs, trough_values) = gathered['BP_Systolic_Peak'], gathered['BP_Diastolic_Peak']
+        if col_clean is None or ('BP_Systolic_Peak' not in index and 'BP_Systolic_Peak' not in columns):
+            print("Warning: no systolic peak positions or BP_Clean column, using the interpolated columns.")
+        else:
+            beats = apply_schema(beats_from_values(systolic, sbp, troughs, trough_values, np.array(beat_sums), sampling_rate), "bp")
+
+    segments = segment_table(segmentation, sampling_rate, n_rows)
+    seg_starts = segments['Start_Sample'].to_numpy()
+    seg_ends = np.minimum(segments['End_Sample'].to_numpy(), n_rows)
+    beat_condition_codes = np.full(0 if beats is None else len(beats), -1, dtype=np.int16)
+
+    # 2. Second pass: windows as their block completes, phase statistics merged across blocks
+    stats = SegmentStats(seg_starts, seg_ends)
+    window_parts = {window_size: [] for window_size in window_sizes}
+    print("Starting Event-Based and Window-Based Extraction...")
+    for offset, block, lo, hi in iter_blocks(iter_signals(processed_file, chunk_rows, exclude=exclude), overlap):
+        block = label_conditions(block, segments, offset)
+        if envelopes:
+            add_envelopes(block, {c: idx for c, (idx, _) in gathered.items()}, {c: v for c, (_, v) in gathered.items()}, offset)
+        for window_size, cursor in cursors.items():
+            taken = cursor.take(offset, len(block))
+            if taken is not None:
+                w_lo, w_hi, start = taken
+                window_parts[window_size].append(compute_windowed_features(block.iloc[w_lo:w_hi], cursor.window_samples, sampling_rate,
+                                                                           beats, hop_samples, offset=start))
+        for col in (col_sys, col_dia, col_clean, col_rate):
+            if col:
+                stats.add(col, block[col].to_numpy()[lo:hi], offset + lo)
+        if col_sys and col_dia:
+            stats.add('BP_PulsePressure', (block[col_sys].to_numpy() - block[col_dia].to_numpy())[lo:hi], offset + lo)
+        if beats is not None:
+            gather_at(beat_condition_codes, beats['Systolic_Sample'].to_numpy(), block['Condition'].cat.codes.to_numpy(), offset)
+
+    # ---------------------------------------------------------
+    # Event-Based (same columns as compute_features)
+    # ---------------------------------------------------------
+    event_features_list = []
+    for i, seg in enumerate(segments.itertuples(index=False)):
+        if seg_ends[i] <= seg_starts[i]:
+            continue
+        feats = {}
+        for col, name in [(col_sys, 'BP_Systolic'), (col_dia, 'BP_Diastolic')]:
+            feats[f'{name}_Mean'], feats[f'{name}_SD'] = stats.mean_sd(col, i) if col else (np.nan, np.nan)
+        # MAP from BP_Clean, or ~ 1/3 Sys + 2/3 Dia
+        if col_clean:
+            feats['BP_MAP_Mean'], feats['BP_MAP_SD'] = stats.mean_sd(col_clean, i)
+        elif col_sys and col_dia:
+            feats['BP_MAP_Mean'] = (feats['BP_Systolic_Mean'] + 2*feats['BP_Diastolic_Mean']) / 3
+            feats['BP_MAP_SD'] = np.nan
+        else:
+            feats['BP_MAP_Mean'] = feats['BP_MAP_SD'] = np.nan
+        if col_sys and col_dia:
+            feats['BP_PulsePressure_Mean'], feats['BP_PulsePressure_SD'] = stats.mean_sd('BP_PulsePressure', i)
+        else:
+            feats['BP_PulsePressure_Mean'] = feats['BP_PulsePressure_SD'] = np.nan
+        feats['BP_Rate_Mean'], feats['BP_Rate_SD'] = stats.mean_sd(col_rate, i) if col_rate else (np.nan, np.nan)
+
+        feats['Condition'] = seg.Event
+        feats['Start_Time'] = seg.Time
+        feats['Duration'] = seg.End_Time - seg.Time
+        event_features_list.append(feats)
+
+    if beats is not None:
+        categories = condition_codes(segments, 0)[1]
+        beats.insert(2, 'Condition', pd.Categorical.from_codes(beat_condition_codes, categories).to_numpy())
+        out_name = f"features_bp_beats_{participant_id}_{visit.replace(' ', '_')}.csv"
+        beats.to_csv(os.path.join(output_dir, out_name), index=False)
+        print(f"Beat table ({len(beats)} beats) saved to {out_name}")
+
+    # Window-Based
+    window_features = {}
+    for window_size in window_sizes:
+        print(f"Window-Based Extraction ({window_size}s windows{hop_note}): {len(window_parts[window_size])} blocks")
+        parts = window_parts[window_size]
+        window_features[window_size] = concat_windows(parts) if parts else pd.DataFrame()
+
+    write_feature_outputs(event_features_list, window_features, "bp", participant_id, visit, output_dir, hop_size, feature_store)
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract BP features.")
+    parser.add_argument("--id", required=True)
+    parser.add_argument("--visit", required=True)
+    parser.add_argument("--file", required=True)
+    parser.add_argument("--events_file", required=True)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--window_size", type=float, nargs='+', default=[1.0])
+    parser.add_argument("--hop_size", type=float, default=None, help="Hop between window starts in seconds (default: window size, i.e. no overlap)")
+    parser.add_argument("--sampling_rate", type=float, default=None, help="Sampling rate in Hz (default: from file metadata, else 1000)")
+    parser.add_argument("--beat_table", action="store_true", help="Windowed systolic/diastolic/pulse pressure from per-beat values instead of the interpolated columns (also saves the beat table)")
+    parser.add_argument("--feature_store", default=None, help="Also write the features to this feature store directory (see utils/feature_store.py)")
+    parser.add_argument("--max_memory", type=float, default=None, help="Read the processed file in chunks to stay within about this many MB (default: load it whole)")
+    
+    args = parser.parse_args()
+    if args.sampling_rate is None:
+        args.sampling_rate = read_sampling_rate(args.file, default=1000)
+    if args.hop_size is not None and int(args.hop_size * args.sampling_rate) < 1:
+        print(f"Error: --hop_size must be at least one sample, got {args.hop_size}s")
+        sys.exit(1)
+    
+    segmentation = load_segmentation(args.events_file, args.visit, [args.sampling_rate])
+    extract_features(args.file, segmentation, args.id, args.visit, args.out, args.window_size, args.hop_size,
+                     args.sampling_rate, beat_table=args.beat_table, feature_store=args.feature_store,
+                     max_memory=args.max_memory)
 
 if __name__ == "__main__":
     main()
@@ -4,66 +4,51 @@ import numpy as np
 
 import os
 import sys
+import warnings
+from scipy.interpolate import PchipInterpolator
+from scipy.signal import welch
 
-def load_data(processed_file, events_file):
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import chunk_rows_for_budget, iter_signals, load_index, load_signals, peak_indexes, read_sampling_rate, signal_columns
+from utils.segmentation import load_segmentation, segment_table
+
+# Sibling window engine (this directory is on sys.path when run as a script)
+from windowing import (SegmentStats, WindowCursor, concat_windows, condition_codes, gather_at, grouped_rows, iter_blocks,
+                       peak_bounds, window_mean_sd, window_modes, window_pyramid, window_starts, write_feature_outputs)
+
+HRV_COLUMNS = ['HRV_RMSSD', 'HRV_SDNN', 'HRV_CVSD', 'HRV_CVNN', 'HRV_MeanNN', 'HRV_MedianNN', 'HRV_pNN50']
+
+# RR artifact flags: outside 30-200 bpm, or more than 20% off the median of
+# the surrounding beats (missed or extra R-peaks, noise)
+RR_RANGE_MS = (300, 2000)
+RR_MAX_DEVIATION = 0.2
+RR_MEDIAN_BEATS = 11
+
+# Frequency-domain HRV: RR series resampled on an even grid, Welch spectra (ms^2)
+HRV_FREQUENCY_COLUMNS = ['HRV_LF', 'HRV_HF', 'HRV_LFHF']
+RR_RESAMPLE_RATE = 4
+LF_BAND = (0.04, 0.15)
+HF_BAND = (0.15, 0.4)
+
+def load_data(processed_file):
     """
-    Loads processed ECG data and events.
+    Loads processed ECG data.
     """
     print(f"Loading processed data: {processed_file}")
     try:
-        # Optimization: Read header first to exclude 'Event_Label' (mixed types, unused)
-        header = pd.read_csv(processed_file, nrows=0).columns
-        cols_to_use = [c for c in header if 'Event_Label' not in c]
-        
-        ecg_df = pd.read_csv(processed_file, usecols=cols_to_use)
+        # Older processed files have a per-sample 'Event_Label' column (mixed types, unused; events are now in the index sidecar). Reads .csv or .parquet.
+        # R-peaks come from the index sidecar when there is one, so skip the 0/1 column.
+        exclude = ('Event_Label',)
+        if 'ECG_R_Peaks' in load_index(processed_file):
+            exclude += ('ECG_R_Peaks',)
+        ecg_df = load_signals(processed_file, exclude=exclude)
     except Exception as e:
         print(f"Error reading processed file: {e}")
         sys.exit(1)
+    return ecg_df
 
-    print(f"Loading events: {events_file}")
-    try:
-        # Assuming typical event file structure: 'Event', 'Time', 'Duration', 'Type'
-        # Or checking what we saw in `head`: 
-        # The previous `head` of events.csv had no header? Using logic from inspection.
-        # "ME-CVP value changed,46.11,0,Marker"
-        # We'll stick to a robust read.
-        events_df = pd.read_csv(events_file, header=None, names=['Event', 'Time', 'Duration', 'Type'], on_bad_lines='skip')
-        
-        # Ensure Time is numeric
-        events_df['Time'] = pd.to_numeric(events_df['Time'], errors='coerce')
-        # Drop rows with invalid time
-        events_df = events_df.dropna(subset=['Time'])
-    except Exception as e:
-        print(f"Error reading events file: {e}")
-        sys.exit(1)
-        
-    return ecg_df, events_df
-
-def filter_events(events_df, visit_type):
-    """
-    Filters events based on meaningful markers for the visit type.
-    """
-    if "TSST" in visit_type:
-        markers = [
-            'Baseline Resting Period', 'Task Introduction', 'Speech Preperation', 
-            'Speech Period', 'Arithmetic Period', 'Debrief Period', 'Recovery Period'
-        ]
-    elif "PDST" in visit_type:
-        # Note: User confirmed 'Speech Period' for PDST
-        markers = [
-            'Baseline Resting Period', 'Speech Period', 'Debrief Period', 'Recovery Period'
-        ]
-    else:
-        print(f"Unknown visit type: {visit_type}. Using all events.")
-        markers = events_df['Event'].unique().tolist()
-
-    filtered_events = events_df[events_df['Event'].isin(markers)].copy()
-    
-    # Sort events by time just in case
-    filtered_events = filtered_events.sort_values(by='Time').reset_index(drop=True)
-    return filtered_events, markers
-
-def label_conditions(ecg_df, events_df, sampling_rate=1000):
+def label_conditions(ecg_df, segments, offset=0):
     """
     Adds a 'Condition' column to the ECG DataFrame based on event time ranges.
     Assumes events mark the START of a phase. Determining END is tricky.
@@ -74,113 +59,268 @@ def label_conditions(ecg_df, events_df, sampling_rate=1000):
     Format:
     Event1 (Time T1) -> Event2 (Time T2).
     Condition between T1 and T2 is Event1.
+    offset: sample of the first row, for a block of a chunked pass.
     """
-    ecg_df['Condition'] = None
-    
-    # We need to map time in seconds to index
-    # Assuming the processed CSV index 0 = Time 0.
-    
-    # Sort events
-    events = events_df.sort_values(by='Time').reset_index(drop=True)
-    
-    for i in range(len(events)):
-        current_event = events.iloc[i]
-        start_time = current_event['Time']
-        condition = current_event['Event']
-        
-        start_idx = int(start_time * sampling_rate)
-        
-        # Determine end time
-        if i < len(events) - 1:
-            end_time = events.iloc[i+1]['Time']
-            end_idx = int(end_time * sampling_rate)
-        else:
-            # Last event: go to end of file
-            end_idx = len(ecg_df)
-            
-        # Boundary checks
-        if start_idx < 0: start_idx = 0
-        if end_idx > len(ecg_df): end_idx = len(ecg_df)
-        
-        if start_idx < len(ecg_df):
-            ecg_df.loc[start_idx:end_idx, 'Condition'] = condition
-            
+    # int8 codes per sample (see condition_codes); labels are only looked up for the output
+    codes, categories = condition_codes(segments, len(ecg_df), offset)
+    ecg_df['Condition'] = pd.Categorical.from_codes(codes, categories)
+
     return ecg_df
 
-def compute_features(segment, sampling_rate):
+def load_r_peaks(processed_file, ecg_df):
+    """
+    R-peak sample indexes for the whole recording: from the index sidecar,
+    or recovered once from the 'ECG_R_Peaks' 0/1 column of older files.
+    """
+    peaks = load_index(processed_file)
+    if 'ECG_R_Peaks' not in peaks:
+        peaks = peak_indexes(ecg_df, ['ECG_R_Peaks'])
+    return peaks.get('ECG_R_Peaks', np.array([], dtype=np.int64))
+
+def build_rr_table(r_peaks, sampling_rate, flag_artifacts=True):
+    """
+    RR interval series of the whole recording, built once per file: one row
+    per R-peak after the first (Sample/Time of the beat ending the interval),
+    the interval in ms, and whether it is flagged as an artifact.
+    """
+    rr = np.diff(r_peaks) / sampling_rate * 1000
+    artifact = np.zeros(len(rr), dtype=bool)
+    if flag_artifacts and len(rr) > 0:
+        local_median = pd.Series(rr).rolling(RR_MEDIAN_BEATS, center=True, min_periods=1).median().to_numpy()
+        artifact = ((rr < RR_RANGE_MS[0]) | (rr > RR_RANGE_MS[1])
+                    | (np.abs(rr / local_median - 1) > RR_MAX_DEVIATION))
+
+    return pd.DataFrame({
+        'Sample': r_peaks[1:],
+        'Time': r_peaks[1:] / sampling_rate,
+        'RR_ms': rr,
+        'Artifact': artifact,
+    })
+
+def rr_bounds(r_peaks, starts, ends, by_beat_time=False):
+    """
+    (lo, counts) RR table rows of each [start, end) sample range: the
+    intervals with both R-peaks inside (np.diff of the range's peaks), or with
+    by_beat_time those whose ending beat falls inside, so an interval spanning
+    a boundary counts in the range its beat lands in.
+    """
+    if by_beat_time:
+        return peak_bounds(r_peaks[1:], starts, ends)
+    lo = np.searchsorted(r_peaks[:-1], starts)
+    hi = np.searchsorted(r_peaks[1:], ends)
+    return lo, np.maximum(hi - lo, 0)
+
+def hrv_rows(rr, artifact):
+    """
+    Time-domain HRV of each row of an RR matrix (ms). Artifact intervals are
+    left out: statistics over the clean intervals, successive differences only
+    between adjacent clean ones (contiguous runs). NaN without intervals.
+    """
+    if artifact.any():
+        rr = np.where(artifact, np.nan, rr)
+        mean, std, median = np.nanmean, np.nanstd, np.nanmedian
+    else:
+        mean, std, median = np.mean, np.std, np.median
+    n_rr = np.sum(~np.isnan(rr), axis=1)
+    drr = np.diff(rr, axis=1)
+
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        # Empty rows (no intervals, or a single one for RMSSD) give NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean_rr = mean(rr, axis=1)
+        sdnn = std(rr, axis=1)
+        rmssd = np.sqrt(mean(np.square(drr), axis=1))
+        return {
+            'HRV_RMSSD': rmssd,
+            'HRV_SDNN': sdnn,
+            'HRV_CVSD': rmssd / mean_rr,
+            'HRV_CVNN': sdnn / mean_rr,
+            'HRV_MeanNN': mean_rr,
+            'HRV_MedianNN': median(rr, axis=1),
+            'HRV_pNN50': np.sum(np.abs(drr) > 50, axis=1) / n_rr * 100,
+        }
+
+def rr_tachogram(rr_table, resample_rate=RR_RESAMPLE_RATE):
+    """
+    RR series (ms) of the whole recording resampled on an even grid (sample k
+    at k / resample_rate seconds) by monotone cubic interpolation (as
+    nk.hrv_frequency; linear interpolation damps the HF band), from the clean
+    intervals at the time of their ending beat. Built once per file; NaN
+    before the first and after the last beat.
+    """
+    clean = rr_table[~rr_table['Artifact']]
+    times = clean['Time'].to_numpy()
+    if len(times) < 2:
+        return np.array([])
+    grid = np.arange(int(times[-1] * resample_rate) + 1) / resample_rate
+    return PchipInterpolator(times, clean['RR_ms'].to_numpy(), extrapolate=False)(grid)
+
+def tachogram_rows(tachogram, starts, window_samples, sampling_rate, resample_rate=RR_RESAMPLE_RATE):
+    """
+    (n_windows, n) matrix of the resampled RR values inside each window of
+    window_samples starting at the given samples, NaN where the tachogram
+    does not reach.
+    """
+    first = np.ceil(np.asarray(starts) * resample_rate / sampling_rate).astype(np.int64)
+    n = int(window_samples * resample_rate / sampling_rate)
+    padded = np.append(tachogram, np.full(max(first.max(initial=0) + n - len(tachogram), 0), np.nan))
+    return padded[first[:, None] + np.arange(n)]
+
+def band_power(freqs, psd, band):
+    mask = (freqs >= band[0]) & (freqs < band[1])
+    return psd[:, mask].sum(axis=1) * (freqs[1] - freqs[0])
+
+def hrv_frequency_rows(tachogram, resample_rate=RR_RESAMPLE_RATE):
+    """
+    LF and HF power (ms^2) and LF/HF of each row of a resampled RR matrix, from
+    one batched Welch call (Hann segments of up to 64 s, 50% overlap). NaN for
+    rows with gaps and for rows shorter than one LF cycle (25 s).
+    """
+    features = {name: np.full(len(tachogram), np.nan) for name in HRV_FREQUENCY_COLUMNS}
+    n = tachogram.shape[1]
+    valid = ~np.isnan(tachogram).any(axis=1)
+    if n < resample_rate / LF_BAND[0] or not valid.any():
+        return features
+
+    freqs, psd = welch(tachogram[valid], fs=resample_rate, nperseg=min(n, 64 * resample_rate), axis=1)
+    lf = band_power(freqs, psd, LF_BAND)
+    hf = band_power(freqs, psd, HF_BAND)
+    features['HRV_LF'][valid] = lf
+    features['HRV_HF'][valid] = hf
+    with np.errstate(all="ignore"):
+        features['HRV_LFHF'][valid] = lf / hf
+    return features
+
+def compute_features(segment, sampling_rate, rr, artifact, tachogram=None):
     """
     Extracts ECG features from a segment of data.
+    rr, artifact: the segment's rows of the RR table (RR_ms, Artifact).
+    tachogram: the segment's resampled RR values (rr_tachogram), for
+    frequency-domain HRV; left out when None.
     """
     if segment.empty:
         return {}
         
-    # We need R-peaks. The processed file has 'ECG_R_Peaks' (binary 0/1).
-    # recover indices
-    r_peaks = np.where(segment['ECG_R_Peaks'] == 1)[0]
-    
     features = {}
 
+    # HRV (Time Domain) from the RR intervals, NaN without any
+    hrv = {name: values[0] for name, values in hrv_rows(rr[None, :], artifact[None, :]).items()}
+
     # 1. Heart Rate (Prefer pre-calculated ECG_Rate)
     if 'ECG_Rate' in segment.columns and not segment['ECG_Rate'].isna().all():
         features['ECG_Rate_Mean'] = segment['ECG_Rate'].mean()
         features['ECG_Rate_SD'] = segment['ECG_Rate'].std()
     else:
-        # Fallback to peaks if Rate column missing
-        if len(r_peaks) >= 2:
-            rr = np.diff(r_peaks) / sampling_rate * 1000
-            features['ECG_Rate_Mean'] = 60000 / np.mean(rr)
-            features['ECG_Rate_SD'] = np.std(rr)
-        else:
-            features['ECG_Rate_Mean'] = np.nan
-            features['ECG_Rate_SD'] = np.nan
+        # Fallback to the RR intervals if Rate column missing
+        features['ECG_Rate_Mean'] = 60000 / hrv['HRV_MeanNN']
+        features['ECG_Rate_SD'] = hrv['HRV_SDNN']
 
     # 2. HRV (Time Domain) - Requires R-peaks
-    if len(r_peaks) >= 2:
-        rr = np.diff(r_peaks) / sampling_rate * 1000
-        features['HRV_RMSSD'] = np.sqrt(np.mean(np.square(np.diff(rr))))
-        features['HRV_SDNN'] = np.std(rr)
-        features['HRV_CVSD'] = features['HRV_RMSSD'] / np.mean(rr)
-        features['HRV_CVNN'] = features['HRV_SDNN'] / np.mean(rr)
-        features['HRV_MeanNN'] = np.mean(rr)
-        features['HRV_MedianNN'] = np.median(rr)
-        features['HRV_pNN50'] = np.sum(np.abs(np.diff(rr)) > 50) / len(rr) * 100
-    else:
-        # Not enough peaks for HRV
-        features['HRV_RMSSD'] = np.nan
-        features['HRV_SDNN'] = np.nan
-        features['HRV_CVSD'] = np.nan
-        features['HRV_CVNN'] = np.nan
-        features['HRV_MeanNN'] = np.nan
-        features['HRV_MedianNN'] = np.nan
-        features['HRV_pNN50'] = np.nan
+    features.update(hrv)
     
-    # Frequency domain requires more continuous data and is slow on windows.
-    # For now, stick to time domain for robustness on short windows.
-    # If user wants freq, we can add later.
+    # 3. HRV (Frequency Domain) - needs at least one LF cycle of beats
+    if tachogram is not None:
+        features.update({name: values[0] for name, values in hrv_frequency_rows(tachogram[None, :]).items()})
     
     return features
 
-def main():
-    parser = argparse.ArgumentParser(description="Extract ECG features based on events and windows.")
-    parser.add_argument("--id", required=True, help="Participant ID")
-    parser.add_argument("--visit", required=True, help="Visit Type (e.g., 'TSST Visit')")
-    parser.add_argument("--file", required=True, help="Path to processed ECG file")
-    parser.add_argument("--events_file", required=True, help="Path to events CSV file")
-    parser.add_argument("--out", required=True, help="Output directory")
-    parser.add_argument("--window_size", type=float, default=1.0, help="Window size in seconds for windowed analysis")
-    parser.add_argument("--sampling_rate", type=int, default=1000, help="Sampling rate in Hz")
-    
-    args = parser.parse_args()
+def compute_windowed_features(ecg_df, r_peaks, window_samples, sampling_rate, hop_samples=None, pyramid=None,
+                              rr_table=None, by_beat_time=False, tachogram=None, offset=0):
+    """
+    compute_features() for every full window of window_samples at once, one
+    window every hop_samples (default: back to back).
+    ECG_Rate is reduced per window (see windowing.window_mean_sd, aggregated
+    from `pyramid` when given); HRV comes from the RR table (build_rr_table,
+    default: without artifact flags), with windows grouped by how many
+    intervals they hold (see rr_bounds for by_beat_time). With a tachogram
+    (rr_tachogram), frequency-domain HRV of all windows comes from one batched
+    Welch call on the resampled RR series, which is shared by every window.
+    Returns the same columns (and values) as the per-window loop.
+    offset: sample of the first row of ecg_df (a block of a chunked pass);
+    r_peaks, rr_table and tachogram always cover the whole recording.
+    """
+    starts = window_starts(len(ecg_df), window_samples, hop_samples) + offset
+    n_windows = len(starts)
+    if n_windows == 0:
+        return pd.DataFrame()
+    if rr_table is None:
+        rr_table = build_rr_table(r_peaks, sampling_rate, flag_artifacts=False)
+
+    # HRV (Time Domain) - windows with at least one RR interval
+    lo, counts = rr_bounds(r_peaks, starts, starts + window_samples, by_beat_time)
+    rr_all = rr_table['RR_ms'].to_numpy()
+    artifact_all = rr_table['Artifact'].to_numpy()
+    hrv = {name: np.full(n_windows, np.nan) for name in HRV_COLUMNS}
+    for n_rr, ids, rr in grouped_rows(rr_all, lo, counts):
+        artifact = artifact_all[lo[ids, None] + np.arange(n_rr)]
+        for name, values in hrv_rows(rr, artifact).items():
+            hrv[name][ids] = values
+
+    # Heart Rate (Prefer pre-calculated ECG_Rate, fall back to peaks where it is all NaN)
+    if 'ECG_Rate' in ecg_df.columns:
+        rate_mean, rate_sd = window_mean_sd(ecg_df['ECG_Rate'].to_numpy(), window_samples, hop_samples, pyramid, 'ECG_Rate')
+        fallback = np.isnan(rate_mean)
+    else:
+        rate_mean = rate_sd = np.full(n_windows, np.nan)
+        fallback = np.ones(n_windows, dtype=bool)
+    if fallback.any():
+        rate_mean = rate_mean.astype(np.float64)
+        rate_sd = rate_sd.astype(np.float64)
+        rate_mean[fallback] = 60000 / hrv['HRV_MeanNN'][fallback]
+        rate_sd[fallback] = hrv['HRV_SDNN'][fallback]
+
+    features = pd.DataFrame({
+        'Time': starts / sampling_rate,
+        'Condition': window_modes(ecg_df['Condition'], window_samples, hop_samples=hop_samples, pyramid=pyramid, key='Condition'),
+        'ECG_Rate_Mean': rate_mean,
+        'ECG_Rate_SD': rate_sd,
+    })
+    for name, values in hrv.items():
+        features[name] = values
+    if tachogram is not None:
+        rows = tachogram_rows(tachogram, starts, window_samples, sampling_rate)
+        for name, values in hrv_frequency_rows(rows).items():
+            features[name] = values
+    return features
+
+def extract_features(processed_file, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                     sampling_rate=None, rr_table_mode=False, hrv_frequency=False, feature_store=None, max_memory=None):
+    """
+    Event-based and windowed ECG features of one processed file, written as
+    features_ecg_* CSVs to output_dir. segmentation: the visit's phases
+    (utils.segmentation.load_segmentation), shared by all modalities.
+    feature_store: also write the event-based and windowed tables to this
+    store (utils.feature_store).
+    max_memory: read the file in chunks within this many MB instead of
+    loading it whole (see extract_features_chunked).
+    """
+    if max_memory is not None:
+        return extract_features_chunked(processed_file, segmentation, participant_id, visit, output_dir, window_sizes, hop_size,
+                                        sampling_rate, rr_table_mode, hrv_frequency, feature_store, max_memory)
+    if sampling_rate is None:
+        sampling_rate = read_sampling_rate(processed_file, default=1000)
     
-    if not os.path.exists(args.out):
-        os.makedirs(args.out)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
         
     # 1. Load Data
-    ecg_df, events_full = load_data(args.file, args.events_file)
+    ecg_df = load_data(processed_file)
+    r_peaks = load_r_peaks(processed_file, ecg_df)
+    
+    # 2. Label Data with the visit's phases (segments.json)
+    segments = segment_table(segmentation, sampling_rate, len(ecg_df))
+    ecg_df = label_conditions(ecg_df, segments)
     
-    # 2. Filter Events & Label Data
-    events_filtered, markers = filter_events(events_full, args.visit)
-    ecg_df = label_conditions(ecg_df, events_filtered, args.sampling_rate)
+    # RR series once per file; segments and windows take their intervals from it
+    rr_table = build_rr_table(r_peaks, sampling_rate, flag_artifacts=rr_table_mode)
+    if rr_table_mode:
+        rr_table.insert(2, 'Condition', ecg_df['Condition'].iloc[rr_table['Sample'].to_numpy()].to_numpy())
+        out_name_rr = f"features_ecg_rr_{participant_id}_{visit.replace(' ', '_')}.csv"
+        rr_table.to_csv(os.path.join(output_dir, out_name_rr), index=False)
+        print(f"RR table ({len(rr_table)} intervals, {rr_table['Artifact'].sum()} flagged as artifacts) saved to {out_name_rr}")
+    rr_all = rr_table['RR_ms'].to_numpy()
+    artifact_all = rr_table['Artifact'].to_numpy()
+    tachogram = rr_tachogram(rr_table) if hrv_frequency else None
     
     # ---------------------------------------------------------
     # 3. Event-Based Extraction
@@ -191,88 +331,194 @@ def main():
     # Group by Condition (this handles the "window for each feature being according to different event markers")
     # Note: Because we labeled by flooding between events, 'Condition' is contiguous blocks.
     # However, if an event repeats (unlikely in this protocol order), groupby handles it.
-    # Ideally we process strictly by the event order defined in filter_events to preserve order.
+    # Phases come in time order from the visit segmentation (utils/segmentation.py), with their sample bounds.
     
-    for _, row in events_filtered.iterrows():
-        condition = row['Event']
-        start_time = row['Time']
-        
-        # Determine specific end time for this occurrence
-        # Find next event time
-        next_events = events_filtered[events_filtered['Time'] > start_time]
-        if not next_events.empty:
-            end_time = next_events['Time'].iloc[0]
-        else:
-             end_time = len(ecg_df) / args.sampling_rate
-             
-        start_idx = int(start_time * args.sampling_rate)
-        end_idx = int(end_time * args.sampling_rate)
+    for seg in segments.itertuples(index=False):
+        condition = seg.Event
+        start_time = seg.Time
+        end_time = seg.End_Time
+        start_idx = seg.Start_Sample
+        end_idx = seg.End_Sample
         
         segment = ecg_df.iloc[start_idx:end_idx]
         
         if not segment.empty:
-            feats = compute_features(segment, args.sampling_rate)
+            (lo,), (count,) = rr_bounds(r_peaks, [start_idx], [end_idx], rr_table_mode)
+            segment_tachogram = None
+            if tachogram is not None:
+                segment_tachogram = tachogram_rows(tachogram, [start_idx], end_idx - start_idx, sampling_rate)[0]
+            feats = compute_features(segment, sampling_rate, rr_all[lo:lo + count], artifact_all[lo:lo + count], segment_tachogram)
             feats['Condition'] = condition
             feats['Start_Time'] = start_time
             feats['Duration'] = end_time - start_time
             event_features_list.append(feats)
             
-    if event_features_list:
-        event_features_df = pd.DataFrame(event_features_list)
-        # Reorder columns
-        cols = ['Condition', 'Start_Time', 'Duration'] + [c for c in event_features_df.columns if c not in ['Condition', 'Start_Time', 'Duration']]
-        event_features_df = event_features_df[cols]
-        
-        out_name_event = f"features_ecg_event_based_{args.id}_{args.visit.replace(' ', '_')}.csv"
-        event_features_df.to_csv(os.path.join(args.out, out_name_event), index=False)
-        print(f"Event-based features saved to {out_name_event}")
-    else:
-        print("No event-based features extracted.")
-
     # ---------------------------------------------------------
     # 4. Window-Based Extraction
     # ---------------------------------------------------------
-    print(f"Starting Window-Based Extraction ({args.window_size}s windows)...")
-    window_samples = int(args.window_size * args.sampling_rate)
-    window_features_list = []
-    
-    # We iterate over the whole file in steps of window_size
-    # This might be slow for huge files, but standard for this type of analysis.
+    hop_note = f", {hop_size}s hop" if hop_size is not None else ""
+    hop_samples = int(hop_size * sampling_rate) if hop_size is not None else None
+    # Finest size first: coarser multiples of it are aggregated from its windows
+    window_sizes = sorted(set(window_sizes))
+    pyramid = window_pyramid(window_sizes, sampling_rate, hop_size)
     
-    total_samples = len(ecg_df)
-    
-    for start_idx in range(0, total_samples, window_samples):
-        end_idx = start_idx + window_samples
-        if end_idx > total_samples:
-            break # Drop last partial window
-            
-        segment = ecg_df.iloc[start_idx:end_idx]
+    window_features = {}
+    for window_size in window_sizes:
+        print(f"Starting Window-Based Extraction ({window_size}s windows{hop_note})...")
+        window_samples = int(window_size * sampling_rate)
         
-        # Determine dominant condition
-        # (Mode of 'Condition' column, ignoring None)
-        conditions = segment['Condition'].dropna()
-        if not conditions.empty:
-            current_condition = conditions.mode()[0]
+        # All windows at once (see compute_windowed_features)
+        window_features[window_size] = compute_windowed_features(ecg_df, r_peaks, window_samples, sampling_rate, hop_samples=hop_samples, pyramid=pyramid,
+                                                                 rr_table=rr_table, by_beat_time=rr_table_mode, tachogram=tachogram)
+
+    write_feature_outputs(event_features_list, window_features, "ecg", participant_id, visit, output_dir, hop_size, feature_store)
+
+def extract_features_chunked(processed_file, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                             sampling_rate=None, rr_table_mode=False, hrv_frequency=False, feature_store=None, max_memory=1024):
+    """
+    extract_features() reading the processed file in chunks sized for
+    max_memory MB (utils.signal_io.chunk_rows_for_budget), so memory does not
+    grow with the recording length. The R-peaks (and the RR table and
+    tachogram built from them) are small and cover the whole recording, so
+    HRV is unaffected by block boundaries; ECG_Rate is reduced per window as
+    each block completes (windowing.iter_blocks) and merged per phase
+    (windowing.SegmentStats). Same outputs as extract_features() up to float
+    rounding; coarser window sizes are computed directly (no window pyramid).
+    """
+    if sampling_rate is None:
+        sampling_rate = read_sampling_rate(processed_file, default=1000)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    hop_note = f", {hop_size}s hop" if hop_size is not None else ""
+    hop_samples = int(hop_size * sampling_rate) if hop_size is not None else None
+    window_sizes = sorted(set(window_sizes))
+    cursors = {window_size: WindowCursor(int(window_size * sampling_rate), hop_samples) for window_size in window_sizes}
+    # Blocks carry the longest window, so every window is whole in one block
+    overlap = max(cursor.window_samples for cursor in cursors.values())
+
+    exclude = ('Event_Label',)
+    index = load_index(processed_file)
+    if 'ECG_R_Peaks' in index:
+        exclude += ('ECG_R_Peaks',)
+    chunk_rows = chunk_rows_for_budget(processed_file, max_memory, exclude=exclude, min_rows=overlap)
+    columns = [c for c in signal_columns(processed_file) if not any(x in c for x in exclude)]
+    print(f"Reading processed data in chunks of {chunk_rows} rows (max {max_memory} MB): {processed_file}")
+
+    # 1. First pass: recording length, and the R-peaks of older files without a sidecar
+    n_rows = 0
+    r_peaks = index.get('ECG_R_Peaks')
+    found = []
+    first_pass_columns = ['ECG_R_Peaks'] if r_peaks is None and 'ECG_R_Peaks' in columns else columns[:1]
+    for chunk in iter_signals(processed_file, chunk_rows, columns=first_pass_columns):
+        if r_peaks is None:
+            found.append(peak_indexes(chunk, ['ECG_R_Peaks']).get('ECG_R_Peaks', np.array([], dtype=np.int64)) + n_rows)
+        n_rows += len(chunk)
+    if r_peaks is None:
+        r_peaks = np.concatenate(found) if found else np.array([], dtype=np.int64)
+
+    segments = segment_table(segmentation, sampling_rate, n_rows)
+    seg_starts = segments['Start_Sample'].to_numpy()
+    seg_ends = np.minimum(segments['End_Sample'].to_numpy(), n_rows)
+
+    # RR series once per file; segments and windows take their intervals from it
+    rr_table = build_rr_table(r_peaks, sampling_rate, flag_artifacts=rr_table_mode)
+    rr_all = rr_table['RR_ms'].to_numpy()
+    artifact_all = rr_table['Artifact'].to_numpy()
+    tachogram = rr_tachogram(rr_table) if hrv_frequency else None
+    rr_condition_codes = np.full(len(rr_table), -1, dtype=np.int16)
+
+    # 2. Second pass: windows as their block completes, phase statistics merged across blocks
+    stats = SegmentStats(seg_starts, seg_ends)
+    window_parts = {window_size: [] for window_size in window_sizes}
+    print("Starting Event-Based and Window-Based Extraction...")
+    for offset, block, lo, hi in iter_blocks(iter_signals(processed_file, chunk_rows, exclude=exclude), overlap):
+        block = label_conditions(block, segments, offset)
+        for window_size, cursor in cursors.items():
+            taken = cursor.take(offset, len(block))
+            if taken is not None:
+                w_lo, w_hi, start = taken
+                window_parts[window_size].append(compute_windowed_features(block.iloc[w_lo:w_hi], r_peaks, cursor.window_samples, sampling_rate,
+                                                                           hop_samples=hop_samples, rr_table=rr_table, by_beat_time=rr_table_mode,
+                                                                           tachogram=tachogram, offset=start))
+        if 'ECG_Rate' in block.columns:
+            stats.add('ECG_Rate', block['ECG_Rate'].to_numpy()[lo:hi], offset + lo)
+        if rr_table_mode:
+            gather_at(rr_condition_codes, rr_table['Sample'].to_numpy(), block['Condition'].cat.codes.to_numpy(), offset)
+
+    if rr_table_mode:
+        categories = condition_codes(segments, 0)[1]
+        rr_table.insert(2, 'Condition', pd.Categorical.from_codes(rr_condition_codes, categories).to_numpy())
+        out_name_rr = f"features_ecg_rr_{participant_id}_{visit.replace(' ', '_')}.csv"
+        rr_table.to_csv(os.path.join(output_dir, out_name_rr), index=False)
+        print(f"RR table ({len(rr_table)} intervals, {rr_table['Artifact'].sum()} flagged as artifacts) saved to {out_name_rr}")
+
+    # ---------------------------------------------------------
+    # 3. Event-Based Features (same columns as compute_features)
+    # ---------------------------------------------------------
+    event_features_list = []
+    for i, seg in enumerate(segments.itertuples(index=False)):
+        start_idx, end_idx = seg_starts[i], seg_ends[i]
+        if end_idx <= start_idx:
+            continue
+        (lo,), (count,) = rr_bounds(r_peaks, [start_idx], [end_idx], rr_table_mode)
+        hrv = {name: values[0] for name, values in hrv_rows(rr_all[lo:lo + count][None, :], artifact_all[lo:lo + count][None, :]).items()}
+
+        feats = {}
+        if stats.count('ECG_Rate', i) > 0:
+            feats['ECG_Rate_Mean'], feats['ECG_Rate_SD'] = stats.mean_sd('ECG_Rate', i)
         else:
-            current_condition = "Unknown"
-            
-        feats = compute_features(segment, args.sampling_rate)
-        feats['Time'] = start_idx / args.sampling_rate
-        feats['Condition'] = current_condition
-        window_features_list.append(feats)
-        
-    if window_features_list:
-        window_features_df = pd.DataFrame(window_features_list)
-        # Reorder
-        cols = ['Time', 'Condition'] + [c for c in window_features_df.columns if c not in ['Time', 'Condition']]
-        window_features_df = window_features_df[cols]
-        
-        window_size_str = str(args.window_size).replace('.', '_')
-        out_name_window = f"features_ecg_windowed_{window_size_str}s_{args.id}_{args.visit.replace(' ', '_')}.csv"
-        window_features_df.to_csv(os.path.join(args.out, out_name_window), index=False)
-        print(f"Window-based features saved to {out_name_window}")
-    else:
-        print("No window-based features extracted.")
+            # Fallback to the RR intervals if Rate column missing
+            feats['ECG_Rate_Mean'] = 60000 / hrv['HRV_MeanNN']
+            feats['ECG_Rate_SD'] = hrv['HRV_SDNN']
+        feats.update(hrv)
+        if tachogram is not None:
+            segment_tachogram = tachogram_rows(tachogram, [start_idx], end_idx - start_idx, sampling_rate)
+            feats.update({name: values[0] for name, values in hrv_frequency_rows(segment_tachogram).items()})
+
+        feats['Condition'] = seg.Event
+        feats['Start_Time'] = seg.Time
+        feats['Duration'] = seg.End_Time - seg.Time
+        event_features_list.append(feats)
+
+    # ---------------------------------------------------------
+    # 4. Window-Based Features
+    # ---------------------------------------------------------
+    window_features = {}
+    for window_size in window_sizes:
+        print(f"Window-Based Extraction ({window_size}s windows{hop_note}): {len(window_parts[window_size])} blocks")
+        parts = window_parts[window_size]
+        window_features[window_size] = concat_windows(parts) if parts else pd.DataFrame()
+
+    write_feature_outputs(event_features_list, window_features, "ecg", participant_id, visit, output_dir, hop_size, feature_store)
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract ECG features based on events and windows.")
+    parser.add_argument("--id", required=True, help="Participant ID")
+    parser.add_argument("--visit", required=True, help="Visit Type (e.g., 'TSST Visit')")
+    parser.add_argument("--file", required=True, help="Path to processed ECG file")
+    parser.add_argument("--events_file", required=True, help="Path to events CSV file")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--window_size", type=float, nargs='+', default=[1.0], help="Window size(s) in seconds for windowed analysis, one output file each")
+    parser.add_argument("--hop_size", type=float, default=None, help="Hop between window starts in seconds (default: window size, i.e. no overlap)")
+    parser.add_argument("--sampling_rate", type=float, default=None, help="Sampling rate in Hz (default: from file metadata, else 1000)")
+    parser.add_argument("--hrv_frequency", action="store_true", help="Add frequency-domain HRV (HRV_LF, HRV_HF, HRV_LFHF) to the event and window outputs")
+    parser.add_argument("--rr_table", action="store_true", help="HRV without artifact RR intervals, with beats assigned to segments/windows by their time (also saves the RR table)")
+    parser.add_argument("--feature_store", default=None, help="Also write the features to this feature store directory (see utils/feature_store.py)")
+    parser.add_argument("--max_memory", type=float, default=None, help="Read the processed file in chunks to stay within about this many MB (default: load it whole)")
+    
+    args = parser.parse_args()
+    if args.sampling_rate is None:
+        args.sampling_rate = read_sampling_rate(args.file, default=1000)
+    if args.hop_size is not None and int(args.hop_size * args.sampling_rate) < 1:
+        print(f"Error: --hop_size must be at least one sample, got {args.hop_size}s")
+        sys.exit(1)
+    
+    segmentation = load_segmentation(args.events_file, args.visit, [args.sampling_rate])
+    extract_features(args.file, segmentation, args.id, args.visit, args.out, args.window_size, args.hop_size,
+                     args.sampling_rate, rr_table_mode=args.rr_table, hrv_frequency=args.hrv_frequency, feature_store=args.feature_store,
+                     max_memory=args.max_memory)
 
 if __name__ == "__main__":
     main()
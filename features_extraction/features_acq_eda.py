@@ -4,89 +4,59 @@ import numpy as np
 import os
 import sys
 
-def load_data(processed_file, events_file):
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import (chunk_rows_for_budget, iter_signals, load_index, load_signals, peak_indexes, peaks_between, read_sampling_rate,
+                             signal_columns)
+from utils.segmentation import load_segmentation, segment_table
+
+# Sibling window engine (this directory is on sys.path when run as a script)
+from windowing import (SegmentStats, WindowCursor, concat_windows, condition_codes, gather_at, iter_blocks, peak_bounds,
+                       peak_means, window_max, window_mean_sd, window_modes, window_pyramid, window_starts, write_feature_outputs)
+
+def load_data(processed_file):
     """
-    Loads processed EDA data and events.
+    Loads processed EDA data.
     """
     print(f"Loading processed data: {processed_file}")
     try:
-        # Optimization: Read header first to exclude 'Event_Label' (mixed types, unused)
-        header = pd.read_csv(processed_file, nrows=0).columns
-        cols_to_use = [c for c in header if 'Event_Label' not in c]
-        
-        eda_df = pd.read_csv(processed_file, usecols=cols_to_use)
+        # Older processed files have a per-sample 'Event_Label' column (mixed types, unused; events are now in the index sidecar). Reads .csv or .parquet.
+        # SCR onsets/peaks come from the index sidecar when there is one, so skip the 0/1 columns.
+        exclude = ('Event_Label',)
+        index = load_index(processed_file)
+        exclude += tuple(c for c in ('SCR_Onsets', 'SCR_Peaks') if c in index)
+        eda_df = load_signals(processed_file, exclude=exclude)
     except Exception as e:
         print(f"Error reading processed file: {e}")
         sys.exit(1)
+    return eda_df
 
-    print(f"Loading events: {events_file}")
-    try:
-        # Load events with robust handling (same as ECG script)
-        events_df = pd.read_csv(events_file, header=None, names=['Event', 'Time', 'Duration', 'Type'], on_bad_lines='skip')
-        
-        # Ensure Time is numeric
-        events_df['Time'] = pd.to_numeric(events_df['Time'], errors='coerce')
-        # Drop rows with invalid time
-        events_df = events_df.dropna(subset=['Time'])
-    except Exception as e:
-        print(f"Error reading events file: {e}")
-        sys.exit(1)
-        
-    return eda_df, events_df
-
-def filter_events(events_df, visit_type):
+def label_conditions(eda_df, segments, offset=0):
     """
-    Filters events based on meaningful markers for the visit type.
+    Adds a 'Condition' column to the EDA DataFrame based on event time ranges.
+    offset: sample of the first row, for a block of a chunked pass.
     """
-    if "TSST" in visit_type:
-        markers = [
-            'Baseline Resting Period', 'Task Introduction', 'Speech Preperation', 
-            'Speech Period', 'Arithmetic Period', 'Debrief Period', 'Recovery Period'
-        ]
-    elif "PDST" in visit_type:
-        markers = [
-            'Baseline Resting Period', 'Speech Period', 'Debrief Period', 'Recovery Period'
-        ]
-    else:
-        print(f"Unknown visit type: {visit_type}. Using all events.")
-        markers = events_df['Event'].unique().tolist()
+    # int8 codes per sample (see condition_codes); labels are only looked up for the output
+    codes, categories = condition_codes(segments, len(eda_df), offset)
+    eda_df['Condition'] = pd.Categorical.from_codes(codes, categories)
 
-    filtered_events = events_df[events_df['Event'].isin(markers)].copy()
-    filtered_events = filtered_events.sort_values(by='Time').reset_index(drop=True)
-    return filtered_events, markers
+    return eda_df
 
-def label_conditions(eda_df, events_df, sampling_rate=1000):
+def load_scr_peaks(processed_file, eda_df):
     """
-    Adds a 'Condition' column to the EDA DataFrame based on event time ranges.
+    SCR peak sample indexes for the whole recording: from the index sidecar,
+    or recovered once from the 'SCR_Peaks' 0/1 column of older files.
+    Returns None if the file has neither.
     """
-    eda_df['Condition'] = None
-    
-    events = events_df.sort_values(by='Time').reset_index(drop=True)
-    
-    for i in range(len(events)):
-        current_event = events.iloc[i]
-        start_time = current_event['Time']
-        condition = current_event['Event']
-        
-        start_idx = int(start_time * sampling_rate)
-        
-        if i < len(events) - 1:
-            end_time = events.iloc[i+1]['Time']
-            end_idx = int(end_time * sampling_rate)
-        else:
-            end_idx = len(eda_df)
-            
-        if start_idx < 0: start_idx = 0
-        if end_idx > len(eda_df): end_idx = len(eda_df)
-        
-        if start_idx < len(eda_df):
-            eda_df.loc[start_idx:end_idx, 'Condition'] = condition
-            
-    return eda_df
+    peaks = load_index(processed_file)
+    if 'SCR_Peaks' not in peaks:
+        peaks = peak_indexes(eda_df, ['SCR_Peaks'])
+    return peaks.get('SCR_Peaks')
 
-def compute_features(segment, sampling_rate):
+def compute_features(segment, sampling_rate, scr_peaks=None):
     """
     Extracts EDA features from a segment of data.
+    scr_peaks: SCR peak indexes relative to the start of the segment (None if unavailable).
     """
     if segment.empty:
         return {}
@@ -113,8 +83,8 @@ def compute_features(segment, sampling_rate):
     # 3. SCR (Skin Conductance Responses)
     # Frequency
     duration_sec = len(segment) / sampling_rate
-    if 'SCR_Peaks' in segment.columns:
-        n_peaks = segment['SCR_Peaks'].sum()
+    if scr_peaks is not None:
+        n_peaks = len(scr_peaks)
         # SCR Frequency (per minute is standard, but for short windows maybe per sec?)
         # Let's do per minute for standard, but handle short windows caution
         if duration_sec > 0:
@@ -125,18 +95,16 @@ def compute_features(segment, sampling_rate):
             
     # Amplitude & Rise Time
     # These are usually populated at the peak indices or non-zero.
-    # We filter for where SCR_Peaks == 1
-    if 'SCR_Peaks' in segment.columns and 'SCR_Amplitude' in segment.columns:
-        peaks_mask = segment['SCR_Peaks'] == 1
-        amplitudes = segment.loc[peaks_mask, 'SCR_Amplitude']
+    # We take their values at the SCR peaks
+    if scr_peaks is not None and 'SCR_Amplitude' in segment.columns:
+        amplitudes = segment['SCR_Amplitude'].iloc[scr_peaks]
         if not amplitudes.empty:
             features['EDA_SCR_Amp_Mean'] = amplitudes.mean()
         else:
             features['EDA_SCR_Amp_Mean'] = np.nan # No peaks in this segment
             
-    if 'SCR_Peaks' in segment.columns and 'SCR_RiseTime' in segment.columns:
-        peaks_mask = segment['SCR_Peaks'] == 1
-        rise_times = segment.loc[peaks_mask, 'SCR_RiseTime']
+    if scr_peaks is not None and 'SCR_RiseTime' in segment.columns:
+        rise_times = segment['SCR_RiseTime'].iloc[scr_peaks]
         if not rise_times.empty:
             features['EDA_SCR_RiseTime_Mean'] = rise_times.mean()
         else:
@@ -144,27 +112,83 @@ def compute_features(segment, sampling_rate):
 
     return features
 
-def main():
-    parser = argparse.ArgumentParser(description="Extract EDA features based on events and windows.")
-    parser.add_argument("--id", required=True, help="Participant ID")
-    parser.add_argument("--visit", required=True, help="Visit Type")
-    parser.add_argument("--file", required=True, help="Path to processed EDA file")
-    parser.add_argument("--events_file", required=True, help="Path to events CSV file")
-    parser.add_argument("--out", required=True, help="Output directory")
-    parser.add_argument("--window_size", type=float, default=1.0, help="Window size in seconds")
-    parser.add_argument("--sampling_rate", type=int, default=1000, help="Sampling rate in Hz")
-    
-    args = parser.parse_args()
+def compute_windowed_features(eda_df, scr_peaks, window_samples, sampling_rate, hop_samples=None, pyramid=None, offset=0):
+    """
+    compute_features() for every full window of window_samples at once, one
+    window every hop_samples (default: back to back).
+    Tonic/phasic statistics are reduced per window (see windowing.window_mean_sd,
+    aggregated from `pyramid` when given);
+    SCR features come from the SCR peak index array with searchsorted bounds.
+    Returns the same columns (and values) as the per-window loop.
+    offset: sample of the first row of eda_df (a block of a chunked pass);
+    scr_peaks always covers the whole recording.
+    """
+    starts = window_starts(len(eda_df), window_samples, hop_samples)
+    n_windows = len(starts)
+    if n_windows == 0:
+        return pd.DataFrame()
+
+    features = pd.DataFrame({
+        'Time': (starts + offset) / sampling_rate,
+        'Condition': window_modes(eda_df['Condition'], window_samples, hop_samples=hop_samples, pyramid=pyramid, key='Condition'),
+    })
+
+    # 1. SCL (Skin Conductance Level) - Tonic Component
+    scl_column = 'EDA_Tonic' if 'EDA_Tonic' in eda_df.columns else 'EDA_Clean'
+    if scl_column in eda_df.columns:
+        features['EDA_SCL_Mean'], features['EDA_SCL_SD'] = window_mean_sd(eda_df[scl_column].to_numpy(), window_samples, hop_samples, pyramid, scl_column)
+    else:
+        features['EDA_SCL_Mean'] = np.nan
+
+    # 2. Phasic Component
+    if 'EDA_Phasic' in eda_df.columns:
+        phasic = eda_df['EDA_Phasic'].to_numpy()
+        features['EDA_Phasic_Mean'], features['EDA_Phasic_SD'] = window_mean_sd(phasic, window_samples, hop_samples, pyramid, 'EDA_Phasic')
+        features['EDA_Phasic_Max'] = window_max(phasic, window_samples, hop_samples, pyramid, 'EDA_Phasic')
+
+    # 3. SCR (Skin Conductance Responses)
+    if scr_peaks is not None:
+        # Peaks of these rows, relative to the first
+        scr_peaks = peaks_between(scr_peaks, offset, offset + len(eda_df))
+        lo, counts = peak_bounds(scr_peaks, starts, starts + window_samples)
+        duration_sec = window_samples / sampling_rate
+        features['EDA_SCR_Freq_PerMin'] = (counts / duration_sec) * 60
+        features['EDA_SCR_Count'] = counts
+
+        # Amplitude & Rise Time at the SCR peaks
+        for column, name in [('SCR_Amplitude', 'EDA_SCR_Amp_Mean'), ('SCR_RiseTime', 'EDA_SCR_RiseTime_Mean')]:
+            if column in eda_df.columns:
+                features[name] = peak_means(eda_df[column].to_numpy(), scr_peaks, lo, counts)
+
+    return features
+
+def extract_features(processed_file, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                     sampling_rate=None, feature_store=None, max_memory=None):
+    """
+    Event-based and windowed EDA features of one processed file, written as
+    features_eda_* CSVs to output_dir. segmentation: the visit's phases
+    (utils.segmentation.load_segmentation), shared by all modalities.
+    feature_store: also write the event-based and windowed tables to this
+    store (utils.feature_store).
+    max_memory: read the file in chunks within this many MB instead of
+    loading it whole (see extract_features_chunked).
+    """
+    if max_memory is not None:
+        return extract_features_chunked(processed_file, segmentation, participant_id, visit, output_dir, window_sizes, hop_size,
+                                        sampling_rate, feature_store, max_memory)
+    if sampling_rate is None:
+        sampling_rate = read_sampling_rate(processed_file, default=1000)
     
-    if not os.path.exists(args.out):
-        os.makedirs(args.out)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
         
     # 1. Load Data
-    eda_df, events_full = load_data(args.file, args.events_file)
+    eda_df = load_data(processed_file)
+    scr_peaks = load_scr_peaks(processed_file, eda_df)
     
-    # 2. Filter Events & Label Data
-    events_filtered, markers = filter_events(events_full, args.visit)
-    eda_df = label_conditions(eda_df, events_filtered, args.sampling_rate)
+    # 2. Label Data with the visit's phases (segments.json)
+    segments = segment_table(segmentation, sampling_rate, len(eda_df))
+    eda_df = label_conditions(eda_df, segments)
     
     # ---------------------------------------------------------
     # 3. Event-Based Extraction
@@ -172,77 +196,179 @@ def main():
     print("Starting Event-Based Extraction...")
     event_features_list = []
     
-    for _, row in events_filtered.iterrows():
-        condition = row['Event']
-        start_time = row['Time']
-        
-        next_events = events_filtered[events_filtered['Time'] > start_time]
-        if not next_events.empty:
-            end_time = next_events['Time'].iloc[0]
-        else:
-             end_time = len(eda_df) / args.sampling_rate
-             
-        start_idx = int(start_time * args.sampling_rate)
-        end_idx = int(end_time * args.sampling_rate)
+    for seg in segments.itertuples(index=False):
+        condition = seg.Event
+        start_time = seg.Time
+        end_time = seg.End_Time
+        start_idx = seg.Start_Sample
+        end_idx = seg.End_Sample
         
         segment = eda_df.iloc[start_idx:end_idx]
         
         if not segment.empty:
-            feats = compute_features(segment, args.sampling_rate)
+            feats = compute_features(segment, sampling_rate, None if scr_peaks is None else peaks_between(scr_peaks, start_idx, end_idx))
             feats['Condition'] = condition
             feats['Start_Time'] = start_time
             feats['Duration'] = end_time - start_time
             event_features_list.append(feats)
             
-    if event_features_list:
-        event_features_df = pd.DataFrame(event_features_list)
-        cols = ['Condition', 'Start_Time', 'Duration'] + [c for c in event_features_df.columns if c not in ['Condition', 'Start_Time', 'Duration']]
-        event_features_df = event_features_df[cols]
-        
-        out_name_event = f"features_eda_event_based_{args.id}_{args.visit.replace(' ', '_')}.csv"
-        event_features_df.to_csv(os.path.join(args.out, out_name_event), index=False)
-        print(f"Event-based features saved to {out_name_event}")
-    else:
-        print("No event-based features extracted.")
-
     # ---------------------------------------------------------
     # 4. Window-Based Extraction
     # ---------------------------------------------------------
-    print(f"Starting Window-Based Extraction ({args.window_size}s windows)...")
-    window_samples = int(args.window_size * args.sampling_rate)
-    window_features_list = []
-    
-    total_samples = len(eda_df)
+    hop_note = f", {hop_size}s hop" if hop_size is not None else ""
+    hop_samples = int(hop_size * sampling_rate) if hop_size is not None else None
+    # Finest size first: coarser multiples of it are aggregated from its windows
+    window_sizes = sorted(set(window_sizes))
+    pyramid = window_pyramid(window_sizes, sampling_rate, hop_size)
     
-    for start_idx in range(0, total_samples, window_samples):
-        end_idx = start_idx + window_samples
-        if end_idx > total_samples:
-            break
-            
-        segment = eda_df.iloc[start_idx:end_idx]
+    window_features = {}
+    for window_size in window_sizes:
+        print(f"Starting Window-Based Extraction ({window_size}s windows{hop_note})...")
+        window_samples = int(window_size * sampling_rate)
         
-        conditions = segment['Condition'].dropna()
-        if not conditions.empty:
-            current_condition = conditions.mode()[0]
+        # All windows at once (see compute_windowed_features)
+        window_features[window_size] = compute_windowed_features(eda_df, scr_peaks, window_samples, sampling_rate, hop_samples=hop_samples, pyramid=pyramid)
+
+    write_feature_outputs(event_features_list, window_features, "eda", participant_id, visit, output_dir, hop_size, feature_store)
+
+def extract_features_chunked(processed_file, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                             sampling_rate=None, feature_store=None, max_memory=1024):
+    """
+    extract_features() reading the processed file in chunks sized for
+    max_memory MB (utils.signal_io.chunk_rows_for_budget), so memory does not
+    grow with the recording length. SCR peaks are kept for the whole
+    recording (with the amplitude and rise time at each, gathered as the
+    blocks go by), so SCR counts do not depend on block boundaries; tonic and
+    phasic statistics are reduced per window as each block completes
+    (windowing.iter_blocks) and merged per phase (windowing.SegmentStats).
+    Same outputs as extract_features() up to float rounding; coarser window
+    sizes are computed directly (no window pyramid).
+    """
+    if sampling_rate is None:
+        sampling_rate = read_sampling_rate(processed_file, default=1000)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    hop_note = f", {hop_size}s hop" if hop_size is not None else ""
+    hop_samples = int(hop_size * sampling_rate) if hop_size is not None else None
+    window_sizes = sorted(set(window_sizes))
+    cursors = {window_size: WindowCursor(int(window_size * sampling_rate), hop_samples) for window_size in window_sizes}
+    # Blocks carry the longest window, so every window is whole in one block
+    overlap = max(cursor.window_samples for cursor in cursors.values())
+
+    exclude = ('Event_Label',)
+    index = load_index(processed_file)
+    exclude += tuple(c for c in ('SCR_Onsets', 'SCR_Peaks') if c in index)
+    chunk_rows = chunk_rows_for_budget(processed_file, max_memory, exclude=exclude, min_rows=overlap)
+    columns = [c for c in signal_columns(processed_file) if not any(x in c for x in exclude)]
+    print(f"Reading processed data in chunks of {chunk_rows} rows (max {max_memory} MB): {processed_file}")
+
+    # 1. First pass: recording length, and the SCR peaks of older files without a sidecar
+    n_rows = 0
+    scr_peaks = index.get('SCR_Peaks')
+    found = []
+    from_column = scr_peaks is None and 'SCR_Peaks' in columns
+    for chunk in iter_signals(processed_file, chunk_rows, columns=['SCR_Peaks'] if from_column else columns[:1]):
+        if from_column:
+            found.append(peak_indexes(chunk, ['SCR_Peaks'])['SCR_Peaks'] + n_rows)
+        n_rows += len(chunk)
+    if from_column:
+        scr_peaks = np.concatenate(found) if found else np.array([], dtype=np.int64)
+
+    segments = segment_table(segmentation, sampling_rate, n_rows)
+    seg_starts = segments['Start_Sample'].to_numpy()
+    seg_ends = np.minimum(segments['End_Sample'].to_numpy(), n_rows)
+    scl_column = 'EDA_Tonic' if 'EDA_Tonic' in columns else 'EDA_Clean'
+    # Amplitude & rise time at every SCR peak
+    peak_values = {column: np.full(len(scr_peaks), np.nan, dtype=np.float32)
+                   for column in ('SCR_Amplitude', 'SCR_RiseTime') if scr_peaks is not None and column in columns}
+
+    # 2. Second pass: windows as their block completes, phase statistics merged across blocks
+    stats = SegmentStats(seg_starts, seg_ends)
+    window_parts = {window_size: [] for window_size in window_sizes}
+    print("Starting Event-Based and Window-Based Extraction...")
+    for offset, block, lo, hi in iter_blocks(iter_signals(processed_file, chunk_rows, exclude=exclude), overlap):
+        block = label_conditions(block, segments, offset)
+        for window_size, cursor in cursors.items():
+            taken = cursor.take(offset, len(block))
+            if taken is not None:
+                w_lo, w_hi, start = taken
+                window_parts[window_size].append(compute_windowed_features(block.iloc[w_lo:w_hi], scr_peaks, cursor.window_samples, sampling_rate,
+                                                                           hop_samples=hop_samples, offset=start))
+        for column in (scl_column, 'EDA_Phasic'):
+            if column in block.columns:
+                stats.add(column, block[column].to_numpy()[lo:hi], offset + lo)
+        for column, values in peak_values.items():
+            gather_at(values, scr_peaks, block[column].to_numpy(), offset)
+
+    # ---------------------------------------------------------
+    # 3. Event-Based Features (same columns as compute_features)
+    # ---------------------------------------------------------
+    event_features_list = []
+    for i, seg in enumerate(segments.itertuples(index=False)):
+        start_idx, end_idx = seg_starts[i], seg_ends[i]
+        if end_idx <= start_idx:
+            continue
+        feats = {}
+        # 1. SCL - Tonic Component
+        if scl_column in columns:
+            feats['EDA_SCL_Mean'], feats['EDA_SCL_SD'] = stats.mean_sd(scl_column, i)
         else:
-            current_condition = "Unknown"
-            
-        feats = compute_features(segment, args.sampling_rate)
-        feats['Time'] = start_idx / args.sampling_rate
-        feats['Condition'] = current_condition
-        window_features_list.append(feats)
-        
-    if window_features_list:
-        window_features_df = pd.DataFrame(window_features_list)
-        cols = ['Time', 'Condition'] + [c for c in window_features_df.columns if c not in ['Time', 'Condition']]
-        window_features_df = window_features_df[cols]
-        
-        window_size_str = str(args.window_size).replace('.', '_')
-        out_name_window = f"features_eda_windowed_{window_size_str}s_{args.id}_{args.visit.replace(' ', '_')}.csv"
-        window_features_df.to_csv(os.path.join(args.out, out_name_window), index=False)
-        print(f"Window-based features saved to {out_name_window}")
-    else:
-        print("No window-based features extracted.")
+            feats['EDA_SCL_Mean'] = np.nan
+        # 2. Phasic Component
+        if 'EDA_Phasic' in columns:
+            feats['EDA_Phasic_Mean'], feats['EDA_Phasic_SD'] = stats.mean_sd('EDA_Phasic', i)
+            feats['EDA_Phasic_Max'] = stats.max('EDA_Phasic', i)
+        # 3. SCR - peaks of the phase, and the amplitude & rise time there
+        if scr_peaks is not None:
+            first, last = np.searchsorted(scr_peaks, [start_idx, end_idx])
+            duration_sec = (end_idx - start_idx) / sampling_rate
+            feats['EDA_SCR_Freq_PerMin'] = ((last - first) / duration_sec) * 60
+            feats['EDA_SCR_Count'] = last - first
+            for column, name in [('SCR_Amplitude', 'EDA_SCR_Amp_Mean'), ('SCR_RiseTime', 'EDA_SCR_RiseTime_Mean')]:
+                if column in peak_values:
+                    feats[name] = pd.Series(peak_values[column][first:last]).mean() if last > first else np.nan
+
+        feats['Condition'] = seg.Event
+        feats['Start_Time'] = seg.Time
+        feats['Duration'] = seg.End_Time - seg.Time
+        event_features_list.append(feats)
+
+    # ---------------------------------------------------------
+    # 4. Window-Based Features
+    # ---------------------------------------------------------
+    window_features = {}
+    for window_size in window_sizes:
+        print(f"Window-Based Extraction ({window_size}s windows{hop_note}): {len(window_parts[window_size])} blocks")
+        parts = window_parts[window_size]
+        window_features[window_size] = concat_windows(parts) if parts else pd.DataFrame()
+
+    write_feature_outputs(event_features_list, window_features, "eda", participant_id, visit, output_dir, hop_size, feature_store)
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract EDA features based on events and windows.")
+    parser.add_argument("--id", required=True, help="Participant ID")
+    parser.add_argument("--visit", required=True, help="Visit Type")
+    parser.add_argument("--file", required=True, help="Path to processed EDA file")
+    parser.add_argument("--events_file", required=True, help="Path to events CSV file")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--window_size", type=float, nargs='+', default=[1.0], help="Window size(s) in seconds, one output file each")
+    parser.add_argument("--hop_size", type=float, default=None, help="Hop between window starts in seconds (default: window size, i.e. no overlap)")
+    parser.add_argument("--sampling_rate", type=float, default=None, help="Sampling rate in Hz (default: from file metadata, else 1000)")
+    parser.add_argument("--feature_store", default=None, help="Also write the features to this feature store directory (see utils/feature_store.py)")
+    parser.add_argument("--max_memory", type=float, default=None, help="Read the processed file in chunks to stay within about this many MB (default: load it whole)")
+    
+    args = parser.parse_args()
+    if args.sampling_rate is None:
+        args.sampling_rate = read_sampling_rate(args.file, default=1000)
+    if args.hop_size is not None and int(args.hop_size * args.sampling_rate) < 1:
+        print(f"Error: --hop_size must be at least one sample, got {args.hop_size}s")
+        sys.exit(1)
+    
+    segmentation = load_segmentation(args.events_file, args.visit, [args.sampling_rate])
+    extract_features(args.file, segmentation, args.id, args.visit, args.out, args.window_size, args.hop_size,
+                     args.sampling_rate, feature_store=args.feature_store, max_memory=args.max_memory)
 
 if __name__ == "__main__":
     main()
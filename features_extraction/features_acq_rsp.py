@@ -4,80 +4,40 @@ import numpy as np
 import os
 import sys
 
-def load_data(processed_file, events_file):
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import chunk_rows_for_budget, iter_signals, load_signals, read_sampling_rate, signal_columns
+from utils.segmentation import load_segmentation, segment_table
+
+# Sibling window engine (this directory is on sys.path when run as a script)
+from windowing import (SegmentStats, WindowCursor, concat_windows, condition_codes, gather_at, iter_blocks, window_code_counts,
+                       window_mean_sd, window_modes, window_pyramid, window_starts, write_feature_outputs)
+
+# Slope phase codes; on equal counts the dominant phase is the first in this order
+SLOPE_PHASES = ['Inhale', 'Exhale', 'Hold']
+
+def load_data(processed_file):
     """
-    Loads processed RSP data and events.
+    Loads processed RSP data.
     """
     print(f"Loading processed data: {processed_file}")
     try:
-        # Optimization: Read header first to exclude 'Event_Label' (mixed types, unused)
-        header = pd.read_csv(processed_file, nrows=0).columns
-        cols_to_use = [c for c in header if 'Event_Label' not in c]
-        print(f"Loading columns: {len(cols_to_use)} / {len(header)}")
-        
-        rsp_df = pd.read_csv(processed_file, usecols=cols_to_use)
+        # Older processed files have a per-sample 'Event_Label' column (mixed types, unused; events are now in the index sidecar). Reads .csv or .parquet.
+        rsp_df = load_signals(processed_file, exclude=('Event_Label',))
     except Exception as e:
         print(f"Error reading processed file: {e}")
         sys.exit(1)
+    return rsp_df
 
-    print(f"Loading events: {events_file}")
-    try:
-        events_df = pd.read_csv(events_file, header=None, names=['Event', 'Time', 'Duration', 'Type'], on_bad_lines='skip')
-        events_df['Time'] = pd.to_numeric(events_df['Time'], errors='coerce')
-        events_df = events_df.dropna(subset=['Time'])
-    except Exception as e:
-        print(f"Error reading events file: {e}")
-        sys.exit(1)
-        
-    return rsp_df, events_df
-
-def filter_events(events_df, visit_type):
-    """
-    Filters events based on meaningful markers for the visit type.
-    """
-    if "TSST" in visit_type:
-        markers = [
-            'Baseline Resting Period', 'Task Introduction', 'Speech Preperation', 
-            'Speech Period', 'Arithmetic Period', 'Debrief Period', 'Recovery Period'
-        ]
-    elif "PDST" in visit_type:
-        markers = [
-            'Baseline Resting Period', 'Speech Period', 'Debrief Period', 'Recovery Period'
-        ]
-    else:
-        print(f"Unknown visit type: {visit_type}. Using all events.")
-        markers = events_df['Event'].unique().tolist()
-
-    filtered_events = events_df[events_df['Event'].isin(markers)].copy()
-    filtered_events = filtered_events.sort_values(by='Time').reset_index(drop=True)
-    return filtered_events, markers
-
-def label_conditions(rsp_df, events_df, sampling_rate=1000):
+def label_conditions(rsp_df, segments, offset=0):
     """
     Adds a 'Condition' column to the RSP DataFrame based on event time ranges.
+    offset: sample of the first row, for a block of a chunked pass.
     """
-    rsp_df['Condition'] = None
-    events = events_df.sort_values(by='Time').reset_index(drop=True)
-    
-    for i in range(len(events)):
-        current_event = events.iloc[i]
-        start_time = current_event['Time']
-        condition = current_event['Event']
-        
-        start_idx = int(start_time * sampling_rate)
-        
-        if i < len(events) - 1:
-            end_time = events.iloc[i+1]['Time']
-            end_idx = int(end_time * sampling_rate)
-        else:
-            end_idx = len(rsp_df)
-            
-        if start_idx < 0: start_idx = 0
-        if end_idx > len(rsp_df): end_idx = len(rsp_df)
-        
-        if start_idx < len(rsp_df):
-            rsp_df.loc[start_idx:end_idx, 'Condition'] = condition
-            
+    # int8 codes per sample (see condition_codes); labels are only looked up for the output
+    codes, categories = condition_codes(segments, len(rsp_df), offset)
+    rsp_df['Condition'] = pd.Categorical.from_codes(codes, categories)
+
     return rsp_df
 
 def find_column(columns, prefix):
@@ -188,23 +148,141 @@ def compute_features(segment, sampling_rate, gradient_threshold=None):
 
     return features
 
-def main():
-    parser = argparse.ArgumentParser(description="Extract RSP features based on events and windows.")
-    parser.add_argument("--id", required=True, help="Participant ID")
-    parser.add_argument("--visit", required=True, help="Visit Type")
-    parser.add_argument("--file", required=True, help="Path to processed RSP file")
-    parser.add_argument("--events_file", required=True, help="Path to events CSV file")
-    parser.add_argument("--out", required=True, help="Output directory")
-    parser.add_argument("--window_size", type=float, default=1.0, help="Window size in seconds")
-    parser.add_argument("--sampling_rate", type=int, default=1000, help="Sampling rate in Hz")
-    
-    args = parser.parse_args()
+def slope_phase_codes(gradient, threshold):
+    """
+    Classifies gradient samples into SLOPE_PHASES codes:
+    0 Inhale (slope > threshold), 1 Exhale (slope < -threshold),
+    2 Hold (|slope| <= threshold), -1 for NaN (counted in no phase).
+    """
+    codes = np.full(gradient.shape, -1, dtype=np.int8)
+    codes[np.abs(gradient) <= threshold] = 2
+    codes[gradient < -threshold] = 1
+    codes[gradient > threshold] = 0
+    return codes
+
+def slope_phase_counts(signal_clean, threshold, window_samples, hop_samples=None, pyramid=None, key=None):
+    """
+    (n_windows, 3) counts of each SLOPE_PHASES code per window, with the
+    gradient taken within each window as np.gradient(segment) does (one-sided
+    differences at the window's first and last sample): one gradient over the
+    whole signal, then each window's counts are corrected for its two edge
+    samples. With a pyramid the signal-wide codes are kept and their counts
+    aggregated from the base windows.
+    """
+    compute_codes = lambda: slope_phase_codes(np.gradient(signal_clean), threshold)
+    codes = pyramid.cached('slope_codes', key, compute_codes) if pyramid is not None else compute_codes()
+    counts = window_code_counts(codes, window_samples, len(SLOPE_PHASES), hop_samples, pyramid, key)
+
+    starts = window_starts(len(signal_clean), window_samples, hop_samples)
+    rows = np.arange(len(starts))
+    first = starts
+    last = starts + window_samples - 1
+    edge_codes = [
+        (first, slope_phase_codes(signal_clean[first + 1] - signal_clean[first], threshold)),
+        (last, slope_phase_codes(signal_clean[last] - signal_clean[last - 1], threshold)),
+    ]
+    for edge, own in edge_codes:
+        central = codes[edge]
+        counts[rows[central >= 0], central[central >= 0]] -= 1
+        counts[rows[own >= 0], own[own >= 0]] += 1
+    return counts
+
+def compute_windowed_features(rsp_df, window_samples, sampling_rate, gradient_threshold=None, hop_samples=None, pyramid=None, offset=0):
+    """
+    compute_features() for every full window of window_samples at once, one
+    window every hop_samples (default: back to back).
+    Rate/amplitude are reduced per window (see windowing.window_mean_sd,
+    aggregated from `pyramid` when given); the
+    slope phase comes from one gradient pass (see slope_phase_counts) and
+    code counts per window. Returns the same columns (and values) as the
+    per-window loop.
+    offset: sample of the first row of rsp_df (a block of a chunked pass).
+    """
+    starts = window_starts(len(rsp_df), window_samples, hop_samples)
+    n_windows = len(starts)
+    if n_windows == 0:
+        return pd.DataFrame()
+
+    col_rate = find_column(rsp_df.columns, 'RSP_Rate')
+    col_amp = find_column(rsp_df.columns, 'RSP_Amplitude')
+    col_phase = find_column(rsp_df.columns, 'RSP_Phase')
+    col_clean = find_column(rsp_df.columns, 'RSP_Clean')
+
+    features = pd.DataFrame({
+        'Time': (starts + offset) / sampling_rate,
+        'Condition': window_modes(rsp_df['Condition'], window_samples, hop_samples=hop_samples, pyramid=pyramid, key='Condition'),
+    })
+
+    # 1. Rate & 2. Amplitude
+    for col, name in [(col_rate, 'RSP_Rate'), (col_amp, 'RSP_Amp')]:
+        if col:
+            features[f'{name}_Mean'], features[f'{name}_SD'] = window_mean_sd(rsp_df[col].to_numpy(), window_samples, hop_samples, pyramid, col)
+        else:
+            features[f'{name}_Mean'] = np.nan
+            features[f'{name}_SD'] = np.nan
+
+    # 3. Respiratory Phase (Inhale/Exhale/Hold) - Slope Based
+    if col_clean and gradient_threshold is not None:
+        counts = slope_phase_counts(rsp_df[col_clean].to_numpy(), gradient_threshold, window_samples, hop_samples, pyramid, col_clean)
+        for i, phase in enumerate(SLOPE_PHASES):
+            features[f'RSP_Slope_{phase}_Ratio'] = counts[:, i] / window_samples
+        features['RSP_Slope_Dominant'] = np.asarray(SLOPE_PHASES, dtype=object)[counts.argmax(axis=1)]
+    else:
+        for phase in SLOPE_PHASES:
+            features[f'RSP_Slope_{phase}_Ratio'] = np.nan
+        features['RSP_Slope_Dominant'] = "Unknown"
+
+    # 4. Respiratory Phase (NeuroKit Based - Legacy/Check)
+    if col_phase:
+        def phase_codes():
+            phase = rsp_df[col_phase].to_numpy()
+            # 0 Inhale (1), 1 Exhale (0), 2 any other value; NaN not counted
+            codes = np.where(phase == 1.0, 0, np.where(phase == 0.0, 1, 2))
+            codes[pd.isna(phase)] = -1
+            return codes
+        codes = pyramid.cached('phase_codes', col_phase, phase_codes) if pyramid is not None else phase_codes()
+        counts = window_code_counts(codes, window_samples, 3, hop_samples, pyramid, col_phase)
+        n_valid = counts.sum(axis=1)
+        with np.errstate(all="ignore"):
+            # value_counts(normalize=True) over the non-NaN samples; 0.0 if there are none
+            features['RSP_Inhale_Ratio'] = np.where(n_valid > 0, counts[:, 0] / n_valid, 0.0)
+            features['RSP_Exhale_Ratio'] = np.where(n_valid > 0, counts[:, 1] / n_valid, 0.0)
+
+        # Dominant Phase (mode, ties to the smaller value)
+        modes = window_modes(rsp_df[col_phase], window_samples, default=None, hop_samples=hop_samples, pyramid=pyramid, key=col_phase)
+        dominant = np.full(n_windows, "Unknown", dtype=object)
+        dominant[modes == 1.0] = "Inhale"
+        dominant[modes == 0.0] = "Exhale"
+        features['RSP_Phase_Dominant'] = dominant
+    else:
+        features['RSP_Inhale_Ratio'] = np.nan
+        features['RSP_Exhale_Ratio'] = np.nan
+        features['RSP_Phase_Dominant'] = np.nan
+
+    return features
+
+def extract_features(processed_file, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                     sampling_rate=None, feature_store=None, max_memory=None):
+    """
+    Event-based and windowed RSP features of one processed file, written as
+    features_rsp_* CSVs to output_dir. segmentation: the visit's phases
+    (utils.segmentation.load_segmentation), shared by all modalities.
+    feature_store: also write the event-based and windowed tables to this
+    store (utils.feature_store).
+    max_memory: read the file in chunks within this many MB instead of
+    loading it whole (see extract_features_chunked).
+    """
+    if max_memory is not None:
+        return extract_features_chunked(processed_file, segmentation, participant_id, visit, output_dir, window_sizes, hop_size,
+                                        sampling_rate, feature_store, max_memory)
+    if sampling_rate is None:
+        sampling_rate = read_sampling_rate(processed_file, default=1000)
     
-    if not os.path.exists(args.out):
-        os.makedirs(args.out)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
         
     # 1. Load Data
-    rsp_df, events_full = load_data(args.file, args.events_file)
+    rsp_df = load_data(processed_file)
     
     # Determine Global Gradient Threshold
     gradient_threshold = None
@@ -223,9 +301,9 @@ def main():
         else:
             print("Warning: RSP_Clean empty, cannot calculate threshold.")
     
-    # 2. Filter Events & Label Data
-    events_filtered, markers = filter_events(events_full, args.visit)
-    rsp_df = label_conditions(rsp_df, events_filtered, args.sampling_rate)
+    # 2. Label Data with the visit's phases (segments.json)
+    segments = segment_table(segmentation, sampling_rate, len(rsp_df))
+    rsp_df = label_conditions(rsp_df, segments)
     
     # ---------------------------------------------------------
     # 3. Event-Based Extraction
@@ -233,77 +311,266 @@ def main():
     print("Starting Event-Based Extraction...")
     event_features_list = []
     
-    for _, row in events_filtered.iterrows():
-        condition = row['Event']
-        start_time = row['Time']
-        
-        next_events = events_filtered[events_filtered['Time'] > start_time]
-        if not next_events.empty:
-            end_time = next_events['Time'].iloc[0]
-        else:
-             end_time = len(rsp_df) / args.sampling_rate
-             
-        start_idx = int(start_time * args.sampling_rate)
-        end_idx = int(end_time * args.sampling_rate)
+    for seg in segments.itertuples(index=False):
+        condition = seg.Event
+        start_time = seg.Time
+        end_time = seg.End_Time
+        start_idx = seg.Start_Sample
+        end_idx = seg.End_Sample
         
         segment = rsp_df.iloc[start_idx:end_idx]
         
         if not segment.empty:
-            feats = compute_features(segment, args.sampling_rate, gradient_threshold)
+            feats = compute_features(segment, sampling_rate, gradient_threshold)
             feats['Condition'] = condition
             feats['Start_Time'] = start_time
             feats['Duration'] = end_time - start_time
             event_features_list.append(feats)
             
-    if event_features_list:
-        event_features_df = pd.DataFrame(event_features_list)
-        cols = ['Condition', 'Start_Time', 'Duration'] + [c for c in event_features_df.columns if c not in ['Condition', 'Start_Time', 'Duration']]
-        event_features_df = event_features_df[cols]
-        
-        out_name_event = f"features_rsp_event_based_{args.id}_{args.visit.replace(' ', '_')}.csv"
-        event_features_df.to_csv(os.path.join(args.out, out_name_event), index=False)
-        print(f"Event-based features saved to {out_name_event}")
-    else:
-        print("No event-based features extracted.")
-
     # ---------------------------------------------------------
     # 4. Window-Based Extraction
     # ---------------------------------------------------------
-    print(f"Starting Window-Based Extraction ({args.window_size}s windows)...")
-    window_samples = int(args.window_size * args.sampling_rate)
-    window_features_list = []
+    hop_note = f", {hop_size}s hop" if hop_size is not None else ""
+    hop_samples = int(hop_size * sampling_rate) if hop_size is not None else None
+    # Finest size first: coarser multiples of it are aggregated from its windows
+    window_sizes = sorted(set(window_sizes))
+    pyramid = window_pyramid(window_sizes, sampling_rate, hop_size)
     
-    total_samples = len(rsp_df)
-    
-    for start_idx in range(0, total_samples, window_samples):
-        end_idx = start_idx + window_samples
-        if end_idx > total_samples:
-            break
-            
-        segment = rsp_df.iloc[start_idx:end_idx]
+    window_features = {}
+    for window_size in window_sizes:
+        print(f"Starting Window-Based Extraction ({window_size}s windows{hop_note})...")
+        window_samples = int(window_size * sampling_rate)
         
-        conditions = segment['Condition'].dropna()
-        if not conditions.empty:
-            current_condition = conditions.mode()[0]
+        # All windows at once (see compute_windowed_features)
+        window_features[window_size] = compute_windowed_features(rsp_df, window_samples, sampling_rate, gradient_threshold, hop_samples, pyramid)
+
+    write_feature_outputs(event_features_list, window_features, "rsp", participant_id, visit, output_dir, hop_size, feature_store)
+
+def gradient_std_chunked(chunks, col_clean):
+    """
+    np.std(np.gradient(x)) of the non-NaN values x of col_clean, from
+    consecutive chunks without holding the signal. Each chunk's gradients are
+    taken with the last two values of the previous chunk in front, so they are
+    those of np.gradient on the whole series, and folded into a running count,
+    mean and sum of squared deviations (Welford's update, one chunk at a time
+    as in Chan et al.). Returns (std, or None with fewer than two values; rows read).
+    """
+    n_rows = 0
+    count, mean, m2 = 0, 0.0, 0.0
+    tail = None
+
+    def merge(gradient):
+        nonlocal count, mean, m2
+        if len(gradient) == 0:
+            return
+        gradient = gradient.astype(np.float64)
+        part_mean = gradient.mean()
+        n = count + len(gradient)
+        delta = part_mean - mean
+        m2 += ((gradient - part_mean) ** 2).sum() + delta * delta * count * len(gradient) / n
+        mean += delta * len(gradient) / n
+        count = n
+
+    for chunk in chunks:
+        n_rows += len(chunk)
+        values = chunk[col_clean].to_numpy()
+        values = values[~np.isnan(values)]
+        extended = values if tail is None else np.concatenate([tail, values])
+        if len(extended) >= 2:
+            gradient = np.gradient(extended)
+            # The last value waits for its right neighbour; after the first gradient,
+            # tail[1] is the one still waiting from the previous chunk
+            merge(gradient[:-1] if tail is None or len(tail) < 2 else gradient[1:-1])
+            extended = extended[-2:]
+        tail = extended
+
+    if tail is None or len(tail) < 2:
+        return None, n_rows
+    # One-sided difference at the end of the series, as np.gradient
+    merge(np.array([tail[1] - tail[0]]))
+    return tail.dtype.type(np.sqrt(m2 / count)), n_rows
+
+def slope_edge_correction(counts, value_at, first, last, n_rows, threshold):
+    """
+    Corrects a segment's SLOPE_PHASES counts, taken from the gradient over the
+    whole signal, for its first and last sample, where np.gradient(segment)
+    uses one-sided differences (as slope_phase_counts does per window).
+    value_at(i): RSP_Clean at sample i.
+    """
+    if last == first:
+        return counts
+    own_first = value_at(first + 1) - value_at(first)
+    own_last = value_at(last) - value_at(last - 1)
+    central_first = own_first if first == 0 else (value_at(first + 1) - value_at(first - 1)) / 2
+    central_last = own_last if last == n_rows - 1 else (value_at(last + 1) - value_at(last - 1)) / 2
+    central = slope_phase_codes(np.array([central_first, central_last]), threshold)
+    own = slope_phase_codes(np.array([own_first, own_last]), threshold)
+    for code in central[central >= 0]:
+        counts[code] -= 1
+    for code in own[own >= 0]:
+        counts[code] += 1
+    return counts
+
+def extract_features_chunked(processed_file, segmentation, participant_id, visit, output_dir, window_sizes=(1.0,), hop_size=None,
+                             sampling_rate=None, feature_store=None, max_memory=1024):
+    """
+    extract_features() reading the processed file in chunks sized for
+    max_memory MB (utils.signal_io.chunk_rows_for_budget), so memory does not
+    grow with the recording length. A first pass over RSP_Clean gives the
+    global gradient threshold (gradient_std_chunked) and the length; a second
+    computes the windows of each block as it completes (windowing.iter_blocks)
+    and merges the phases' statistics (windowing.SegmentStats).
+    Same outputs as extract_features() up to float rounding; coarser window
+    sizes are computed directly (no window pyramid).
+    """
+    if sampling_rate is None:
+        sampling_rate = read_sampling_rate(processed_file, default=1000)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    hop_note = f", {hop_size}s hop" if hop_size is not None else ""
+    hop_samples = int(hop_size * sampling_rate) if hop_size is not None else None
+    window_sizes = sorted(set(window_sizes))
+    cursors = {window_size: WindowCursor(int(window_size * sampling_rate), hop_samples) for window_size in window_sizes}
+    # Blocks carry the longest window, so every window is whole in one block
+    overlap = max(cursor.window_samples for cursor in cursors.values())
+
+    exclude = ('Event_Label',)
+    chunk_rows = chunk_rows_for_budget(processed_file, max_memory, exclude=exclude, min_rows=overlap)
+    columns = [c for c in signal_columns(processed_file) if not any(x in c for x in exclude)]
+    col_rate = find_column(columns, 'RSP_Rate')
+    col_amp = find_column(columns, 'RSP_Amplitude')
+    col_phase = find_column(columns, 'RSP_Phase')
+    col_clean = find_column(columns, 'RSP_Clean')
+    print(f"Reading processed data in chunks of {chunk_rows} rows (max {max_memory} MB): {processed_file}")
+
+    # 1. First pass: Global Gradient Threshold and recording length
+    gradient_threshold = None
+    if col_clean:
+        print("Calculating global gradient threshold for 'Hold' detection...")
+        grad_std, n_rows = gradient_std_chunked(iter_signals(processed_file, chunk_rows, columns=[col_clean]), col_clean)
+        if grad_std is not None:
+            # Threshold = 5% of global gradient standard deviation
+            gradient_threshold = 0.05 * grad_std
+            print(f"Global Gradient Std: {grad_std:.6f}, Threshold: {gradient_threshold:.6f}")
         else:
-            current_condition = "Unknown"
-            
-        feats = compute_features(segment, args.sampling_rate, gradient_threshold)
-        feats['Time'] = start_idx / args.sampling_rate
-        feats['Condition'] = current_condition
-        window_features_list.append(feats)
-        
-    if window_features_list:
-        window_features_df = pd.DataFrame(window_features_list)
-        cols = ['Time', 'Condition'] + [c for c in window_features_df.columns if c not in ['Time', 'Condition']]
-        window_features_df = window_features_df[cols]
-        
-        window_size_str = str(args.window_size).replace('.', '_')
-        out_name_window = f"features_rsp_windowed_{window_size_str}s_{args.id}_{args.visit.replace(' ', '_')}.csv"
-        window_features_df.to_csv(os.path.join(args.out, out_name_window), index=False)
-        print(f"Window-based features saved to {out_name_window}")
+            print("Warning: RSP_Clean empty, cannot calculate threshold.")
     else:
-        print("No window-based features extracted.")
+        n_rows = sum(len(chunk) for chunk in iter_signals(processed_file, chunk_rows, columns=columns[:1]))
+
+    # 2. Second pass: windows as their block completes, phase statistics merged across blocks
+    segments = segment_table(segmentation, sampling_rate, n_rows)
+    seg_starts = segments['Start_Sample'].to_numpy()
+    seg_ends = np.minimum(segments['End_Sample'].to_numpy(), n_rows)
+    stats = SegmentStats(seg_starts, seg_ends)
+    # RSP_Clean around each phase's first and last sample, for the slope edge correction
+    edge_samples = np.unique(np.clip(np.concatenate([seg_starts + k for k in (-1, 0, 1)] + [seg_ends + k for k in (-2, -1, 0)]), 0, max(n_rows - 1, 0)))
+    edge_values = np.full(len(edge_samples), np.nan, dtype=np.float32)
+    window_parts = {window_size: [] for window_size in window_sizes}
+
+    print("Starting Event-Based and Window-Based Extraction...")
+    for offset, block, lo, hi in iter_blocks(iter_signals(processed_file, chunk_rows, exclude=exclude), overlap):
+        block = label_conditions(block, segments, offset)
+        for window_size, cursor in cursors.items():
+            taken = cursor.take(offset, len(block))
+            if taken is not None:
+                w_lo, w_hi, start = taken
+                window_parts[window_size].append(compute_windowed_features(block.iloc[w_lo:w_hi], cursor.window_samples, sampling_rate,
+                                                                           gradient_threshold, hop_samples, offset=start))
+        for col in (col_rate, col_amp):
+            if col:
+                stats.add(col, block[col].to_numpy()[lo:hi], offset + lo)
+        if col_phase:
+            stats.add_counts(col_phase, block[col_phase].to_numpy()[lo:hi], offset + lo)
+        if col_clean and gradient_threshold is not None:
+            clean = block[col_clean].to_numpy()
+            stats.add_counts('slope', slope_phase_codes(np.gradient(clean), gradient_threshold)[lo:hi], offset + lo)
+            gather_at(edge_values, edge_samples, clean, offset)
+
+    # ---------------------------------------------------------
+    # 3. Event-Based Features (same columns as compute_features)
+    # ---------------------------------------------------------
+    value_at = lambda i: edge_values[np.searchsorted(edge_samples, i)]
+    event_features_list = []
+    for i, seg in enumerate(segments.itertuples(index=False)):
+        if seg_ends[i] <= seg_starts[i]:
+            continue
+        feats = {}
+        for col, name in [(col_rate, 'RSP_Rate'), (col_amp, 'RSP_Amp')]:
+            feats[f'{name}_Mean'], feats[f'{name}_SD'] = stats.mean_sd(col, i) if col else (np.nan, np.nan)
+
+        if col_clean and gradient_threshold is not None:
+            counts = np.zeros(len(SLOPE_PHASES), dtype=np.int64)
+            for code, n in stats.value_counts('slope', i).items():
+                if code >= 0:
+                    counts[code] += n
+            counts = slope_edge_correction(counts, value_at, seg_starts[i], seg_ends[i] - 1, n_rows, gradient_threshold)
+            n_samples = seg_ends[i] - seg_starts[i]
+            for phase, n in zip(SLOPE_PHASES, counts):
+                feats[f'RSP_Slope_{phase}_Ratio'] = n / n_samples
+            feats['RSP_Slope_Dominant'] = SLOPE_PHASES[counts.argmax()]
+        else:
+            for phase in SLOPE_PHASES:
+                feats[f'RSP_Slope_{phase}_Ratio'] = np.nan
+            feats['RSP_Slope_Dominant'] = "Unknown"
+
+        if col_phase:
+            phase_counts = stats.value_counts(col_phase, i)
+            n_valid = sum(phase_counts.values())
+            feats['RSP_Inhale_Ratio'] = phase_counts.get(1.0, 0) / n_valid if n_valid else 0.0
+            feats['RSP_Exhale_Ratio'] = phase_counts.get(0.0, 0) / n_valid if n_valid else 0.0
+            # Dominant Phase (mode, ties to the smaller value)
+            dominant = "Unknown"
+            if phase_counts:
+                most = max(phase_counts.values())
+                mode_val = min(value for value, n in phase_counts.items() if n == most)
+                dominant = {1.0: "Inhale", 0.0: "Exhale"}.get(mode_val, "Unknown")
+            feats['RSP_Phase_Dominant'] = dominant
+        else:
+            feats['RSP_Inhale_Ratio'] = np.nan
+            feats['RSP_Exhale_Ratio'] = np.nan
+            feats['RSP_Phase_Dominant'] = np.nan
+
+        feats['Condition'] = seg.Event
+        feats['Start_Time'] = seg.Time
+        feats['Duration'] = seg.End_Time - seg.Time
+        event_features_list.append(feats)
+
+    # ---------------------------------------------------------
+    # 4. Window-Based Features
+    # ---------------------------------------------------------
+    window_features = {}
+    for window_size in window_sizes:
+        print(f"Window-Based Extraction ({window_size}s windows{hop_note}): {len(window_parts[window_size])} blocks")
+        parts = window_parts[window_size]
+        window_features[window_size] = concat_windows(parts) if parts else pd.DataFrame()
+
+    write_feature_outputs(event_features_list, window_features, "rsp", participant_id, visit, output_dir, hop_size, feature_store)
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract RSP features based on events and windows.")
+    parser.add_argument("--id", required=True, help="Participant ID")
+    parser.add_argument("--visit", required=True, help="Visit Type")
+    parser.add_argument("--file", required=True, help="Path to processed RSP file")
+    parser.add_argument("--events_file", required=True, help="Path to events CSV file")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--window_size", type=float, nargs='+', default=[1.0], help="Window size(s) in seconds, one output file each")
+    parser.add_argument("--hop_size", type=float, default=None, help="Hop between window starts in seconds (default: window size, i.e. no overlap)")
+    parser.add_argument("--sampling_rate", type=float, default=None, help="Sampling rate in Hz (default: from file metadata, else 1000)")
+    parser.add_argument("--feature_store", default=None, help="Also write the features to this feature store directory (see utils/feature_store.py)")
+    parser.add_argument("--max_memory", type=float, default=None, help="Read the processed file in chunks to stay within about this many MB (default: load it whole)")
+    
+    args = parser.parse_args()
+    if args.sampling_rate is None:
+        args.sampling_rate = read_sampling_rate(args.file, default=1000)
+    if args.hop_size is not None and int(args.hop_size * args.sampling_rate) < 1:
+        print(f"Error: --hop_size must be at least one sample, got {args.hop_size}s")
+        sys.exit(1)
+    
+    segmentation = load_segmentation(args.events_file, args.visit, [args.sampling_rate])
+    extract_features(args.file, segmentation, args.id, args.visit, args.out, args.window_size, args.hop_size,
+                     args.sampling_rate, feature_store=args.feature_store, max_memory=args.max_memory)
 
 if __name__ == "__main__":
     main()
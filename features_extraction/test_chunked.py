@@ -0,0 +1,104 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Processed files are made with the Layer 2 processing functions (processing/ is not a package)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "processing"))
+import neurokit2 as nk
+import process_acq_bp
+import process_acq_ecg
+import process_acq_eda
+import process_acq_rsp
+from utils.signal_io import apply_schema, beat_table, beats_path, load_index, load_signals, save_signals, save_signals_with_index
+from utils.segmentation import load_segmentation
+
+import features_acq_bp
+import features_acq_ecg
+import features_acq_eda
+import features_acq_rsp
+
+FS = 100
+DURATION = 120
+VISIT = "TSST Visit"
+EVENTS = [("Baseline Resting Period", 5.0), ("Speech Period", 37.3), ("Arithmetic Period", 80.0)]
+
+def _processed_files(directory):
+    t = np.arange(DURATION * FS) / FS
+    channel = lambda name, data: SimpleNamespace(name=name, data=data)
+    ecg = process_acq_ecg.process_ecg(channel("ECG", nk.ecg_simulate(duration=DURATION, sampling_rate=FS, random_state=1)), FS)
+    eda = process_acq_eda.process_eda(channel("EDA", nk.eda_simulate(duration=DURATION, sampling_rate=FS, scr_number=8, random_state=1)), FS)
+    rsp = pd.concat([process_acq_rsp.process_single_rsp(nk.rsp_simulate(duration=DURATION, sampling_rate=FS, random_state=seed), FS,
+                                                        f"Channel_{seed}_RSP", "RSP") for seed in (1, 2)], axis=1)
+    bp = 95 + 20 * np.sin(2 * np.pi * 1.2 * t) ** 8 + 3 * np.sin(2 * np.pi * 0.1 * t)
+    bp, _ = process_acq_bp.process_bp(channel("BP", bp), FS)
+
+    files = {}
+    for modality, signals in (("ecg", ecg), ("eda", eda), ("rsp", rsp), ("bp", bp)):
+        files[modality] = os.path.join(directory, f"processed_{modality}_1_TSST_Visit.csv")
+        save_signals_with_index(signals, files[modality], modality, FS)
+    return files
+
+@pytest.fixture(scope="module")
+def processed(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("processed")
+    events_file = directory / "events.csv"
+    pd.DataFrame({"event_label": [e for e, _ in EVENTS], "start_time": [t for _, t in EVENTS],
+                  "duration": 0, "source_channel": "Marker"}).to_csv(events_file, index=False)
+    return _processed_files(str(directory)), load_segmentation(str(events_file), VISIT, [FS])
+
+def _outputs(directory):
+    return {name: pd.read_csv(os.path.join(directory, name)) for name in sorted(os.listdir(directory))}
+
+def _assert_same_outputs(in_memory_dir, chunked_dir, n_files):
+    in_memory, chunked = _outputs(in_memory_dir), _outputs(chunked_dir)
+    assert list(chunked) == list(in_memory) and len(in_memory) == n_files
+    for name, expected in in_memory.items():
+        assert len(expected) > 0
+        pd.testing.assert_frame_equal(chunked[name], expected, check_exact=False, rtol=1e-5, atol=1e-9)
+
+@pytest.mark.parametrize("modality,module", [("ecg", features_acq_ecg), ("eda", features_acq_eda),
+                                             ("rsp", features_acq_rsp), ("bp", features_acq_bp)])
+# Window lengths and hops that are not multiples of each other, so chunk and window edges don't line up
+@pytest.mark.parametrize("window_sizes,hop_size", [((1.0, 7.3), None), ((7.3,), 1.1)])
+def test_chunked_matches_in_memory(processed, tmp_path, modality, module, window_sizes, hop_size):
+    files, segmentation = processed
+    for name, max_memory in (("memory", None), ("chunked", 1e-6)):
+        # 1e-6 MB: the smallest chunks (one longest window), so many windows straddle two chunks
+        os.makedirs(tmp_path / name)
+        module.extract_features(files[modality], segmentation, "1", VISIT, str(tmp_path / name), window_sizes, hop_size,
+                                FS, max_memory=max_memory)
+    _assert_same_outputs(tmp_path / "memory", tmp_path / "chunked", 1 + len(window_sizes))
+
+@pytest.mark.parametrize("beats_file", [False, True])
+def test_bp_beat_table_chunked_matches_in_memory(processed, tmp_path, beats_file):
+    # Beat-averaged BP windows, from the <stem>_beats file or rebuilt from the peaks
+    files, segmentation = processed
+    processed_file = str(tmp_path / os.path.basename(files["bp"]))
+    signals = load_signals(files["bp"])
+    save_signals_with_index(signals, processed_file, "bp", FS)
+    if beats_file:
+        peaks = load_index(processed_file)
+        beats = beat_table(signals["BP_Clean"].to_numpy(dtype=np.float64), peaks["BP_Systolic_Peak"], peaks["BP_Diastolic_Peak"], FS)
+        save_signals(apply_schema(beats, "bp"), beats_path(processed_file), FS)
+    for name, max_memory in (("memory", None), ("chunked", 1e-6)):
+        os.makedirs(tmp_path / name)
+        features_acq_bp.extract_features(processed_file, segmentation, "1", VISIT, str(tmp_path / name), (1.0, 7.3), None,
+                                         FS, beat_table=True, max_memory=max_memory)
+    _assert_same_outputs(tmp_path / "memory", tmp_path / "chunked", 4)
+    beats = pd.read_csv(tmp_path / "memory" / "features_bp_beats_1_TSST_Visit.csv")
+    assert list(beats.columns[:3]) == ["Systolic_Sample", "Systolic_Time", "Condition"] and beats["BP_MAP"].notna().sum() > 50
+
+def test_gradient_std_chunked():
+    values = 1000 + np.sin(np.arange(5000) / 40) + 0.01 * np.random.default_rng(0).standard_normal(5000)
+    values[1000:1010] = np.nan
+    expected = np.std(np.gradient(values[~np.isnan(values)]))
+    for size in (1, 2, 3, 999, 5000):
+        chunks = [pd.DataFrame({"RSP_Clean": values[i:i + size]}) for i in range(0, len(values), size)]
+        std, n_rows = features_acq_rsp.gradient_std_chunked(chunks, "RSP_Clean")
+        assert n_rows == len(values)
+        np.testing.assert_allclose(std, expected, rtol=1e-9)
+    assert features_acq_rsp.gradient_std_chunked([pd.DataFrame({"RSP_Clean": [1.0]})], "RSP_Clean") == (None, 1)
@@ -0,0 +1,108 @@
+import warnings
+
+import neurokit2 as nk
+import numpy as np
+import pandas as pd
+
+import features_acq_ecg
+from features_acq_ecg import (build_rr_table, compute_features, compute_windowed_features, hrv_frequency_rows, hrv_rows,
+                              rr_tachogram, tachogram_rows)
+from windowing import window_starts
+
+FS = 100
+
+def _r_peaks(seconds, a_lf=0.0, a_hf=0.0, fs=FS):
+    # Beats whose RR (ms) is modulated at 0.1 Hz (LF) and 0.25 Hz (HF)
+    times = [1.0]
+    while times[-1] < seconds - 2:
+        t = times[-1]
+        times.append(t + (850 + a_lf * np.sin(2 * np.pi * 0.1 * t) + a_hf * np.sin(2 * np.pi * 0.25 * t)) / 1000)
+    return np.round(np.array(times) * fs).astype(np.int64)
+
+def _ecg_df(seconds=300):
+    # ECG_Rate with a NaN stretch (rate from the RR intervals there) and three phases
+    n = seconds * FS
+    rate = (70 + 5 * np.sin(np.arange(n) / 700)).astype(np.float32)
+    rate[4000:5500] = np.nan
+    condition = np.repeat(["Baseline Resting Period", "Speech Period", "Arithmetic Period"], [7333, 12000, n - 19333])
+    return pd.DataFrame({"ECG_Rate": rate, "Condition": pd.Categorical(condition)})
+
+def _per_window(ecg_df, r_peaks, window_samples, hop_samples, tachogram=None):
+    # The per-window loop compute_windowed_features replaces
+    rows = []
+    for start in window_starts(len(ecg_df), window_samples, hop_samples):
+        segment = ecg_df.iloc[start:start + window_samples]
+        peaks = r_peaks[(r_peaks >= start) & (r_peaks < start + window_samples)]
+        rr = np.diff(peaks) / FS * 1000
+        segment_tachogram = None if tachogram is None else tachogram_rows(tachogram, [start], window_samples, FS)[0]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            feats = compute_features(segment, FS, rr, np.zeros(len(rr), dtype=bool), segment_tachogram)
+        rows.append({"Time": start / FS, "Condition": segment["Condition"].mode()[0], **feats})
+    return pd.DataFrame(rows)
+
+def test_windows_match_per_window_loop():
+    ecg_df = _ecg_df()
+    r_peaks = _r_peaks(300, a_lf=40, a_hf=25)
+    tachogram = rr_tachogram(build_rr_table(r_peaks, FS, flag_artifacts=False))
+    for window_samples, hop_samples, tach in ((100, None, None), (1000, None, None), (3000, 700, tachogram)):
+        windows = compute_windowed_features(ecg_df, r_peaks, window_samples, FS, hop_samples=hop_samples, tachogram=tach)
+        expected = _per_window(ecg_df, r_peaks, window_samples, hop_samples, tach)
+        pd.testing.assert_frame_equal(windows.astype({"Condition": object}), expected, check_dtype=False, rtol=1e-6)
+        # Windows inside the NaN stretch take the rate from the RR intervals
+        starts = window_starts(len(ecg_df), window_samples, hop_samples)
+        inside = (starts >= 4000) & (starts + window_samples <= 5500)
+        np.testing.assert_allclose(windows["ECG_Rate_Mean"][inside], 60000 / windows["HRV_MeanNN"][inside])
+    # 1 s windows hold at most one interval: no successive differences
+    windows = compute_windowed_features(ecg_df, r_peaks, 100, FS)
+    assert windows["HRV_MeanNN"].notna().sum() > 30 and windows["HRV_RMSSD"].isna().all()
+
+def test_rr_artifact_flags():
+    r_peaks = _r_peaks(60, a_lf=60)
+    # An extra beat (split interval), a missed beat (doubled one) and a pause longer than 2 s
+    r_peaks = np.sort(np.concatenate([np.delete(r_peaks, 30), [r_peaks[10] + 40]]))
+    r_peaks[50:] += 250
+    assert not build_rr_table(r_peaks, FS, flag_artifacts=False)["Artifact"].any()
+    rr_table = build_rr_table(r_peaks, FS, flag_artifacts=True)
+    rr = rr_table["RR_ms"].to_numpy()
+    flagged = np.flatnonzero(rr_table["Artifact"])
+    np.testing.assert_array_equal(flagged, [10, 11, 30, 49])
+    assert rr[49] > 2000 and rr[10] < 500 and rr[30] > 1500
+    np.testing.assert_array_equal(rr_table["Sample"], r_peaks[1:])
+
+    # HRV over the clean intervals, successive differences only within clean runs
+    hrv = {name: values[0] for name, values in hrv_rows(rr[None, :], rr_table["Artifact"].to_numpy()[None, :]).items()}
+    clean = np.delete(rr, flagged)
+    runs = np.split(rr, flagged)
+    drr = np.concatenate([np.diff(run[1:] if i else run) for i, run in enumerate(runs)])
+    np.testing.assert_allclose(hrv["HRV_MeanNN"], clean.mean())
+    np.testing.assert_allclose(hrv["HRV_SDNN"], clean.std())
+    np.testing.assert_allclose(hrv["HRV_RMSSD"], np.sqrt(np.mean(drr ** 2)))
+    # Flagged intervals stay out of the tachogram
+    tachogram = rr_tachogram(rr_table)
+    assert np.nanmax(tachogram) < 1000 and np.nanmin(tachogram) > 700
+
+def test_hrv_frequency_matches_neurokit():
+    fs = 1000
+    for a_lf, a_hf in ((40, 25), (20, 40)):
+        r_peaks = _r_peaks(400, a_lf, a_hf, fs)
+        tachogram = rr_tachogram(build_rr_table(r_peaks, fs))
+        starts = np.array([10, 70, 200]) * fs
+        batch = hrv_frequency_rows(tachogram_rows(tachogram, starts, 120 * fs, fs))
+        for i, start in enumerate(starts):
+            # One batched Welch call gives the same as one call per segment
+            single = hrv_frequency_rows(tachogram_rows(tachogram, [start], 120 * fs, fs))
+            for name, values in single.items():
+                np.testing.assert_allclose(batch[name][i], values[0], rtol=1e-9)
+            peaks = r_peaks[(r_peaks >= start) & (r_peaks < start + 120 * fs)]
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                expected = nk.hrv_frequency(peaks, sampling_rate=fs, psd_method="welch")
+            np.testing.assert_allclose(batch["HRV_LFHF"][i], expected["HRV_LFHF"].iloc[0], rtol=0.1)
+        # A sine of amplitude a has power a^2 / 2 (ms^2)
+        np.testing.assert_allclose(batch["HRV_LF"], a_lf ** 2 / 2, rtol=0.05)
+        np.testing.assert_allclose(batch["HRV_HF"], a_hf ** 2 / 2, rtol=0.15)
+    # Shorter than one LF cycle, or past the last beat
+    assert np.isnan(hrv_frequency_rows(tachogram_rows(tachogram, [0], 20 * fs, fs))["HRV_LF"]).all()
+    assert np.isnan(hrv_frequency_rows(tachogram_rows(tachogram, [350 * fs], 60 * fs, fs))["HRV_LF"]).all()
+    assert features_acq_ecg.HRV_FREQUENCY_COLUMNS == list(batch)
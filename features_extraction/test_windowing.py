@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+from utils.feature_store import query_features
+from windowing import (SegmentStats, WindowCursor, concat_windows, gather_at, iter_blocks, nanmax_rows, nanmean_rows,
+                       nanstd_rows, window_code_counts, window_matrix, window_max, window_mean_sd, window_modes,
+                       window_pyramid, window_starts, write_feature_outputs)
+
+def _signal(n=5000, seed=0, dtype=np.float64):
+    # Slow wave on a large offset (cancellation-prone), with NaN gaps and a flat stretch
+    rng = np.random.default_rng(seed)
+    values = 1000 + np.sin(np.arange(n) / 50) + 0.1 * rng.standard_normal(n)
+    values[300:340] = np.nan
+    values[1200:1700] = 1000.5
+    return values.astype(dtype)
+
+def _per_window(values, window_samples, hop_samples, stat):
+    # The per-window loop the kernels replace
+    return np.array([getattr(pd.Series(values[s:s + window_samples]), stat)()
+                     for s in window_starts(len(values), window_samples, hop_samples)])
+
+def test_row_reductions_match_pandas():
+    values = _signal()
+    values[:100] = np.nan
+    matrix = window_matrix(values, 100)
+    np.testing.assert_allclose(nanmean_rows(matrix), _per_window(values, 100, None, "mean"), rtol=1e-12)
+    np.testing.assert_allclose(nanstd_rows(matrix), _per_window(values, 100, None, "std"), rtol=1e-9)
+    np.testing.assert_array_equal(nanmax_rows(matrix), _per_window(values, 100, None, "max"))
+    assert np.isnan(nanmean_rows(matrix)[0]) and np.isnan(nanmax_rows(matrix)[0])
+
+def test_running_mean_sd_matches_per_window():
+    values = _signal()
+    for window_samples, hop_samples in ((200, 10), (500, 1), (250, 125)):
+        mean, sd = window_mean_sd(values, window_samples, hop_samples)
+        np.testing.assert_allclose(mean, _per_window(values, window_samples, hop_samples, "mean"), rtol=1e-12)
+        np.testing.assert_allclose(sd, _per_window(values, window_samples, hop_samples, "std"), rtol=1e-6, atol=1e-9)
+    # Flat windows come out exact
+    mean, sd = window_mean_sd(values, 200, 10)
+    flat = window_starts(len(values), 200, 10)
+    flat = (flat >= 1200) & (flat + 200 <= 1700)
+    assert (mean[flat] == 1000.5).all() and (sd[flat] == 0).all()
+
+def test_running_mean_sd_float32():
+    values = _signal(dtype=np.float32)
+    mean, sd = window_mean_sd(values, 200, 10)
+    assert mean.dtype == np.float32 and sd.dtype == np.float32
+    np.testing.assert_allclose(mean, _per_window(values, 200, 10, "mean"), rtol=1e-6)
+    np.testing.assert_allclose(sd, _per_window(values, 200, 10, "std"), rtol=1e-3, atol=1e-4)
+
+def test_running_max_matches_per_window():
+    values = _signal()
+    values[2000:2400] = np.nan
+    for window_samples, hop_samples in ((200, 10), (300, 7), (1000, 1), (250, 125)):
+        np.testing.assert_array_equal(window_max(values, window_samples, hop_samples),
+                                      _per_window(values, window_samples, hop_samples, "max"))
+
+def test_code_counts_and_modes_with_hop():
+    rng = np.random.default_rng(1)
+    codes = rng.integers(-1, 3, 3000)
+    labels = pd.Series(np.array(["A", "B", "C", None], dtype=object)[codes])
+    for window_samples, hop_samples in ((100, 100), (100, 10), (333, 50)):
+        counts = window_code_counts(codes, window_samples, 3, hop_samples)
+        starts = window_starts(len(codes), window_samples, hop_samples)
+        expected = np.array([np.bincount(codes[s:s + window_samples][codes[s:s + window_samples] >= 0], minlength=3)
+                             for s in starts])
+        np.testing.assert_array_equal(counts, expected)
+        modes = window_modes(labels, window_samples, hop_samples=hop_samples)
+        assert list(modes) == [labels[s:s + window_samples].dropna().mode()[0] for s in starts]
+
+def test_pyramid_matches_direct():
+    values = _signal(n=12345)
+    values[4000:4600] = np.nan  # empty base windows
+    codes = np.random.default_rng(2).integers(-1, 4, len(values))
+    pyramid = window_pyramid([0.5, 2.0, 5.0, 10.0], 100)
+    assert pyramid.base_samples == 50
+    for window_samples in (200, 500, 1000):
+        assert pyramid.covers(window_samples)
+        mean, sd = window_mean_sd(values, window_samples, pyramid=pyramid, key="x")
+        direct_mean, direct_sd = window_mean_sd(values, window_samples)
+        np.testing.assert_allclose(mean, direct_mean, rtol=1e-12)
+        np.testing.assert_allclose(sd, direct_sd, rtol=1e-9)
+        assert np.array_equal(np.isnan(mean), np.isnan(direct_mean))
+        np.testing.assert_array_equal(window_max(values, window_samples, pyramid=pyramid, key="x"),
+                                      window_max(values, window_samples))
+        np.testing.assert_array_equal(window_code_counts(codes, window_samples, 4, pyramid=pyramid, key="c"),
+                                      window_code_counts(codes, window_samples, 4))
+    # Overlapping windows and sizes that are not a multiple are computed directly
+    assert not pyramid.covers(200, 50) and not pyramid.covers(75) and not pyramid.covers(50)
+    assert window_pyramid([1.0], 100) is None and window_pyramid([1.0, 2.0], 100, hop_size=0.5) is None
+
+def _chunks(values, sizes):
+    # Consecutive DataFrame chunks of the given lengths (the rest in the last one)
+    bounds = np.cumsum([0] + list(sizes) + [len(values)])
+    return [pd.DataFrame({"x": values[a:b]}) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+def test_blocks_and_cursor_give_the_whole_signal_windows():
+    values = _signal(n=4321)
+    sizes = [700, 700, 650, 1000, 3]
+    for window_samples, hop_samples in ((100, None), (640, None), (640, 30), (300, 170)):
+        cursor = WindowCursor(window_samples, hop_samples)
+        covered, parts = [], []
+        for offset, block, lo, hi in iter_blocks(_chunks(values, sizes), 640):
+            np.testing.assert_array_equal(block["x"].to_numpy(), values[offset:offset + len(block)])
+            covered.append(np.arange(offset + lo, offset + hi))
+            taken = cursor.take(offset, len(block))
+            if taken is None:
+                continue
+            lo_w, hi_w, start = taken
+            mean, sd = window_mean_sd(block["x"].to_numpy()[lo_w:hi_w], window_samples, hop_samples)
+            parts.append(pd.DataFrame({"Start": start + window_starts(hi_w - lo_w, window_samples, hop_samples),
+                                       "Mean": mean, "SD": sd}))
+        # Every sample exactly once in lo:hi
+        np.testing.assert_array_equal(np.concatenate(covered), np.arange(len(values)))
+        windows = concat_windows(parts)
+        mean, sd = window_mean_sd(values, window_samples, hop_samples)
+        np.testing.assert_array_equal(windows["Start"], window_starts(len(values), window_samples, hop_samples))
+        np.testing.assert_allclose(windows["Mean"], mean, rtol=1e-12)
+        np.testing.assert_allclose(windows["SD"], sd, rtol=1e-6, atol=1e-9)
+
+def test_segment_stats_merge_blocks():
+    values = _signal(n=6000, dtype=np.float32)
+    labels = np.array(["a", "b", None], dtype=object)[np.random.default_rng(3).integers(0, 3, len(values))]
+    starts, ends = np.array([0, 250, 1300, 5990]), np.array([250, 1300, 5990, 6000])
+    stats = SegmentStats(starts, ends)
+    for offset in range(0, len(values), 777):
+        stats.add("x", values[offset:offset + 777], offset)
+        stats.add_counts("label", labels[offset:offset + 777], offset)
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        segment = pd.Series(values[start:end])
+        mean, sd = stats.mean_sd("x", i)
+        assert stats.count("x", i) == segment.count()
+        np.testing.assert_allclose([mean, sd], [segment.mean(), segment.std()], rtol=1e-5)
+        assert stats.max("x", i) == segment.max()
+        assert stats.value_counts("label", i) == pd.Series(labels[start:end]).value_counts().to_dict()
+
+def test_gather_at():
+    out = np.full(5, np.nan)
+    indexes = np.array([3, 10, 11, 25, 40])
+    values = np.arange(100.0)
+    for offset in range(0, 100, 12):
+        gather_at(out, indexes, values[offset:offset + 12], offset)
+    np.testing.assert_array_equal(out, values[indexes])
+
+def test_write_feature_outputs(tmp_path):
+    events = [{"EDA_Tonic_Mean": 1.5, "Condition": "Speech Period", "Start_Time": 37.3, "Duration": 42.7}]
+    windows = {1.0: pd.DataFrame({"Time": [0.0, 1.0], "EDA_Tonic_Mean": [1.0, 2.0]}), 7.3: pd.DataFrame()}
+    write_feature_outputs(events, windows, "eda", "1", "TSST Visit", str(tmp_path), hop_size=0.5, feature_store=str(tmp_path / "store"))
+    event_df = pd.read_csv(tmp_path / "features_eda_event_based_1_TSST_Visit.csv")
+    assert list(event_df.columns) == ["Condition", "Start_Time", "Duration", "EDA_Tonic_Mean"]
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "features_eda_windowed_1_0s_hop_0_5s_1_TSST_Visit.csv"), windows[1.0])
+    # Empty tables are not written
+    assert not list(tmp_path.glob("features_eda_windowed_7_3s*"))
+    stored = query_features(str(tmp_path / "store"), "windowed_1_0s_hop_0_5s")
+    assert list(stored["EDA_Tonic_Mean"]) == [1.0, 2.0] and set(stored["Modality"]) == {"eda"}
@@ -0,0 +1,572 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# The features_acq_* scripts put the repository root (utils/) on sys.path
+from utils.feature_store import write_features
+
+# Shared window engine for the features_acq_* scripts.
+# Windowed extraction used to slice the DataFrame once per window and call
+# compute_features() on each slice. These helpers compute the same statistics
+# for all windows at once: continuous columns are reshaped to
+# (n_windows, window_samples) and reduced along rows, and peak-based features
+# are taken from the peak index arrays with searchsorted window boundaries.
+# Reductions follow pandas' rules (skipna, ddof=1 for std, float32 stays float32)
+# so the output matches the per-window loop.
+# Overlapping windows (hop_samples < window_samples) cannot be reshaped; they
+# use running kernels instead (cumulative sums for counts/means/SDs, van Herk
+# prefix/suffix maxima), so the cost stays linear in the recording length
+# however much the windows overlap.
+# Several back-to-back window sizes share a WindowPyramid: per-window sufficient
+# statistics of the finest size, which coarser multiples are aggregated from.
+# write_feature_outputs() writes the resulting tables, the same way for the
+# in-memory and the chunked (extract_features_chunked) paths.
+
+def _is_tiling(window_samples, hop_samples):
+    return hop_samples is None or hop_samples == window_samples
+
+def window_starts(total_samples, window_samples, hop_samples=None):
+    """
+    Start sample of every full window, one every hop_samples (default:
+    window_samples, i.e. back to back). Windows past the end are dropped.
+    """
+    if _is_tiling(window_samples, hop_samples):
+        n_windows = total_samples // window_samples
+        return np.arange(n_windows, dtype=np.int64) * window_samples
+    return np.arange(0, total_samples - window_samples + 1, hop_samples, dtype=np.int64)
+
+def window_name(window_size, hop_size=None):
+    """
+    Window part of a windowed feature file name: '1_0s', or '30_0s_hop_1_0s'
+    for overlapping windows.
+    """
+    name = f"{str(window_size).replace('.', '_')}s"
+    if hop_size is not None and hop_size != window_size:
+        name += f"_hop_{str(hop_size).replace('.', '_')}s"
+    return name
+
+def window_matrix(values, window_samples):
+    """
+    (n_windows, window_samples) view of a 1D array, without the last partial window.
+    """
+    values = np.asarray(values)
+    n_windows = len(values) // window_samples
+    return values[:n_windows * window_samples].reshape(n_windows, window_samples)
+
+def _float_matrix(matrix):
+    if matrix.dtype.kind != "f":
+        matrix = matrix.astype(np.float64)
+    return matrix
+
+def nanmean_rows(matrix):
+    """
+    Row means skipping NaN, like Series.mean(). NaN for rows without values;
+    Series.mean() returns those as a float64 NaN, which turns the column float64.
+    """
+    matrix = _float_matrix(matrix)
+    mask = np.isnan(matrix)
+    count = (~mask).sum(axis=1).astype(matrix.dtype)
+    total = np.where(mask, 0, matrix).sum(axis=1, dtype=matrix.dtype)
+    with np.errstate(all="ignore"):
+        mean = total / count
+    if (count == 0).any():
+        mean = mean.astype(np.float64)
+        mean[count == 0] = np.nan
+    return mean
+
+def nanstd_rows(matrix, ddof=1):
+    """
+    Row standard deviations skipping NaN, like Series.std() (two-pass, ddof=1).
+    NaN for rows with ddof or fewer values.
+    """
+    matrix = _float_matrix(matrix)
+    mask = np.isnan(matrix)
+    count = (~mask).sum(axis=1).astype(matrix.dtype)
+    d = count - ddof
+    values = np.where(mask, 0, matrix)
+    with np.errstate(all="ignore"):
+        avg = values.sum(axis=1, dtype=np.float64) / count
+        sqr = (avg[:, None] - values) ** 2
+        sqr[mask] = 0
+        var = sqr.sum(axis=1, dtype=np.float64) / d
+    var[d <= 0] = np.nan
+    return np.sqrt(var.astype(matrix.dtype, copy=False))
+
+def nanmax_rows(matrix):
+    """
+    Row maxima skipping NaN, like Series.max(). NaN for rows without values.
+    """
+    matrix = _float_matrix(matrix)
+    mask = np.isnan(matrix)
+    result = np.where(mask, -np.inf, matrix).max(axis=1)
+    result[mask.all(axis=1)] = np.nan
+    return result
+
+def _running_moments(values, starts, window_samples):
+    """
+    Non-NaN count, sum and sum of squares of (values - shift) over each window,
+    from cumulative sums. The shift (the overall mean) keeps the sums small,
+    so the variance does not suffer from cancellation on long recordings.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    shift = values[valid].mean() if valid.any() else 0.0
+    dev = np.where(valid, values - shift, 0.0)
+    ends = starts + window_samples
+
+    def window_sums(x):
+        c = np.concatenate(([0], np.cumsum(x)))
+        return c[ends] - c[starts]
+
+    return window_sums(valid), window_sums(dev), window_sums(dev * dev), shift
+
+def running_mean_sd(values, starts, window_samples, ddof=1):
+    """
+    NaN-skipping mean and SD (ddof=1) of every window [start, start + window_samples)
+    from running sums; the result keeps a float32 input's dtype.
+    """
+    dtype = values.dtype if values.dtype.kind == "f" else np.dtype(np.float64)
+    count, total, squares, shift = _running_moments(values, starts, window_samples)
+    with np.errstate(all="ignore"):
+        mean = shift + total / count
+        m2 = np.maximum(squares - total * total / count, 0.0)
+        sd = np.sqrt(m2 / (count - ddof))
+    # Flat windows (common in interpolated signals) are exact rather than a rounding residue
+    high = running_max(values, starts, window_samples)
+    flat = high == -running_max(-values, starts, window_samples)
+    mean[flat] = high[flat]
+    sd[flat] = 0.0
+    mean[count == 0] = np.nan
+    sd[count <= ddof] = np.nan
+    return mean.astype(dtype), sd.astype(dtype)
+
+def running_max(values, starts, window_samples):
+    """
+    NaN-skipping max of every window [start, start + window_samples), van Herk /
+    Gil-Werman style: the max over a window is the max of a block suffix and
+    the next block's prefix, so each sample is visited a fixed number of times.
+    """
+    values = _float_matrix(np.asarray(values))
+    n_blocks = -(-len(values) // window_samples)
+    padded = np.full(n_blocks * window_samples, -np.inf, dtype=values.dtype)
+    padded[:len(values)] = np.where(np.isnan(values), -np.inf, values)
+    blocks = padded.reshape(n_blocks, window_samples)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    result = np.maximum(suffix[starts], prefix[starts + window_samples - 1])
+    result[np.isneginf(result)] = np.nan
+    return result
+
+def window_mean_sd(values, window_samples, hop_samples=None, pyramid=None, key=None):
+    """
+    Mean and SD (ddof=1) of every window of a 1D array, NaN skipped:
+    row reductions for back-to-back windows, running sums for overlapping ones,
+    or aggregated from `pyramid`'s base windows (statistics cached under `key`).
+    """
+    values = np.asarray(values)
+    if pyramid is not None and pyramid.covers(window_samples, hop_samples):
+        return pyramid.mean_sd(key, values, window_samples)
+    if _is_tiling(window_samples, hop_samples):
+        matrix = window_matrix(values, window_samples)
+        return nanmean_rows(matrix), nanstd_rows(matrix)
+    return running_mean_sd(values, window_starts(len(values), window_samples, hop_samples), window_samples)
+
+def window_max(values, window_samples, hop_samples=None, pyramid=None, key=None):
+    """
+    Max of every window of a 1D array, NaN skipped (see window_mean_sd).
+    """
+    values = np.asarray(values)
+    if pyramid is not None and pyramid.covers(window_samples, hop_samples):
+        return pyramid.max(key, values, window_samples)
+    if _is_tiling(window_samples, hop_samples):
+        return nanmax_rows(window_matrix(values, window_samples))
+    return running_max(values, window_starts(len(values), window_samples, hop_samples), window_samples)
+
+def peak_bounds(peaks, starts, ends):
+    """
+    For each window [start, end): index of its first peak in `peaks` and its peak count.
+    """
+    lo = np.searchsorted(peaks, starts)
+    hi = np.searchsorted(peaks, ends)
+    return lo, hi - lo
+
+def grouped_rows(values, lo, counts):
+    """
+    Groups windows by how many values they cover and yields
+    (count, window_ids, matrix) with matrix[i] = values[lo[id]:lo[id] + count].
+    Each row has exactly the values of its window, so row-wise numpy
+    reductions give the same results as on the per-window slices.
+    """
+    for count in np.unique(counts):
+        if count == 0:
+            continue
+        ids = np.flatnonzero(counts == count)
+        yield count, ids, values[lo[ids, None] + np.arange(count)]
+
+def peak_means(values, peaks, lo, counts):
+    """
+    Mean of values at each window's peaks, like values.iloc[peaks].mean().
+    NaN (and a float64 result) for windows without peaks or without valid values there.
+    """
+    values = _float_matrix(np.asarray(values))
+    means = np.full(len(counts), np.nan, dtype=values.dtype)
+    for _, ids, matrix in grouped_rows(values[peaks], lo, counts):
+        means[ids] = nanmean_rows(matrix)
+    if np.isnan(means).any():
+        means = means.astype(np.float64)
+    return means
+
+def window_code_counts(codes, window_samples, n_codes, hop_samples=None, pyramid=None, key=None):
+    """
+    (n_windows, n_codes) occurrences of each code 0..n_codes-1 per window, from
+    one bincount over the reshaped code array (running counts per code for
+    overlapping windows, sums of base-window counts with a pyramid).
+    Negative codes are not counted.
+    """
+    codes = np.asarray(codes)
+    if pyramid is not None and pyramid.covers(window_samples, hop_samples):
+        return pyramid.code_counts(key, codes, window_samples, n_codes)
+    if not _is_tiling(window_samples, hop_samples):
+        starts = window_starts(len(codes), window_samples, hop_samples)
+        counts = np.empty((len(starts), n_codes), dtype=np.int64)
+        for code in range(n_codes):
+            c = np.concatenate(([0], np.cumsum(codes == code)))
+            counts[:, code] = c[starts + window_samples] - c[starts]
+        return counts
+
+    codes = window_matrix(codes, window_samples)
+    n_windows = codes.shape[0]
+    rows = np.broadcast_to(np.arange(n_windows)[:, None], codes.shape)
+    valid = codes >= 0
+    counts = np.bincount(rows[valid] * n_codes + codes[valid], minlength=n_windows * n_codes)
+    return counts.reshape(n_windows, n_codes)
+
+def condition_codes(segments, total_samples, offset=0):
+    """
+    Per-sample condition codes from the visit's phases (utils.segmentation
+    segment_table, in time order): every sample gets the last phase that
+    starts at or before it, as the per-event .loc writes of
+    label_conditions() used to. Returns (codes, categories): int8 codes into
+    the sorted event labels, -1 before the first phase (and for phases
+    without a label).
+    offset: codes of samples offset..offset + total_samples only (a block of
+    a chunked pass); the categories do not depend on it.
+    """
+    event_codes, categories = pd.factorize(segments['Event'], sort=True)
+    dtype = np.int8 if len(categories) <= np.iinfo(np.int8).max else np.int16
+
+    # Phase boundaries in samples; each phase runs until the next one starts
+    starts = segments['Start_Sample'].to_numpy() - offset
+    bounds = np.clip(np.append(starts, total_samples), 0, total_samples)
+    codes = np.repeat(np.append(-1, event_codes).astype(dtype), np.diff(np.append(0, bounds)))
+    return codes, categories
+
+def _label_codes(labels):
+    # A Categorical with sorted categories (label_conditions) is used as is
+    if isinstance(labels.dtype, pd.CategoricalDtype) and labels.cat.categories.is_monotonic_increasing:
+        return labels.cat.codes.to_numpy(), labels.cat.categories
+    return pd.factorize(labels, sort=True)
+
+def window_modes(labels, window_samples, default="Unknown", hop_samples=None, pyramid=None, key=None):
+    """
+    Most common non-null label per window, like segment.dropna().mode()[0]:
+    ties go to the label that sorts first. `default` for windows without labels.
+    Labels are counted as codes and only looked up for the window results.
+    """
+    if pyramid is not None:
+        codes, categories = pyramid.cached('labels', key, lambda: _label_codes(labels))
+    else:
+        codes, categories = _label_codes(labels)
+    n_categories = len(categories)
+
+    if n_categories == 0:
+        return np.full(len(window_starts(len(codes), window_samples, hop_samples)), default, dtype=object)
+
+    counts = window_code_counts(codes, window_samples, n_categories, hop_samples, pyramid, ('labels', key))
+    modes = np.asarray(categories, dtype=object)[counts.argmax(axis=1)]
+    modes[counts.sum(axis=1) == 0] = default
+    return modes
+
+def window_pyramid(window_sizes, sampling_rate, hop_size=None):
+    """
+    WindowPyramid over the smallest of several back-to-back window sizes
+    (seconds), or None when there is nothing to share.
+    """
+    if hop_size is not None or len(window_sizes) < 2:
+        return None
+    return WindowPyramid(int(min(window_sizes) * sampling_rate))
+
+class WindowPyramid:
+    """
+    Sufficient statistics of every back-to-back window of the finest window
+    size, kept per column (key): non-NaN count, mean and sum of squared
+    deviations, maximum, and code counts. Coarser window sizes that are a
+    multiple of it are aggregated from these instead of from the samples.
+    The finest size itself is computed directly, so its output is unchanged.
+    """
+
+    def __init__(self, base_samples):
+        self.base_samples = base_samples
+        self._cache = {}
+
+    def covers(self, window_samples, hop_samples=None):
+        """
+        True if windows of window_samples are aggregated from the base windows.
+        """
+        return (_is_tiling(window_samples, hop_samples) and window_samples > self.base_samples
+                and window_samples % self.base_samples == 0)
+
+    def cached(self, kind, key, compute):
+        """
+        compute() once per (kind, key), then the stored result.
+        """
+        if (kind, key) not in self._cache:
+            self._cache[(kind, key)] = compute()
+        return self._cache[(kind, key)]
+
+    def _grouped(self, stat, window_samples):
+        # (n_windows, factor, ...) view of per-base-window statistics
+        factor = window_samples // self.base_samples
+        n_windows = len(stat) // factor
+        return stat[:n_windows * factor].reshape((n_windows, factor) + stat.shape[1:])
+
+    def _moments(self, values):
+        matrix = _float_matrix(window_matrix(values, self.base_samples))
+        mask = np.isnan(matrix)
+        count = (~mask).sum(axis=1)
+        values64 = np.where(mask, 0, matrix).astype(np.float64)
+        with np.errstate(all="ignore"):
+            mean = values64.sum(axis=1) / count
+            m2 = np.where(mask, 0, (values64 - mean[:, None]) ** 2).sum(axis=1)
+        # Empty base windows add nothing when merged
+        mean[count == 0] = 0.0
+        return count, mean, m2, matrix.dtype
+
+    def mean_sd(self, key, values, window_samples, ddof=1):
+        """
+        Mean and SD per window, merging the base windows' counts, means and
+        sums of squared deviations (Chan et al.). Same dtype rules as
+        nanmean_rows/nanstd_rows.
+        """
+        count, mean, m2, dtype = self.cached('moments', key, lambda: self._moments(values))
+        count, mean, m2 = (self._grouped(x, window_samples) for x in (count, mean, m2))
+        n = count.sum(axis=1)
+        with np.errstate(all="ignore"):
+            total_mean = (count * mean).sum(axis=1) / n
+            total_m2 = m2.sum(axis=1) + (count * (mean - total_mean[:, None]) ** 2).sum(axis=1)
+            sd = np.sqrt(total_m2 / (n - ddof))
+        sd[n <= ddof] = np.nan
+        total_mean = total_mean.astype(dtype)
+        if (n == 0).any():
+            total_mean = total_mean.astype(np.float64)
+            total_mean[n == 0] = np.nan
+        return total_mean, sd.astype(dtype)
+
+    def max(self, key, values, window_samples):
+        """
+        Max per window from the base windows' maxima.
+        """
+        maxima = self.cached('max', key, lambda: nanmax_rows(window_matrix(values, self.base_samples)))
+        return nanmax_rows(self._grouped(maxima, window_samples))
+
+    def code_counts(self, key, codes, window_samples, n_codes):
+        """
+        Code counts per window, summed from the base windows' counts.
+        """
+        counts = self.cached('counts', key, lambda: window_code_counts(codes, self.base_samples, n_codes))
+        return self._grouped(counts, window_samples).sum(axis=1)
+
+# Chunked extraction (--max_memory): the processed file is read in chunks
+# (utils.signal_io.iter_signals) and never held whole. iter_blocks() carries
+# the end of each block into the next, so windows that straddle two chunks
+# are computed from one block; a WindowCursor per window size hands each
+# window out once, at the same positions as on the whole signal. Per-phase
+# statistics are merged across blocks in a SegmentStats.
+
+def iter_blocks(chunks, overlap):
+    """
+    Yields (offset, block, lo, hi) for consecutive chunks of a signal: block
+    holds samples offset.. and starts with the last `overlap` samples of the
+    previous block. Rows lo:hi of the blocks cover every sample exactly once,
+    with both neighbours in the same block (except at the ends of the
+    signal), for per-sample accumulators.
+    """
+    overlap = max(overlap, 1)
+    chunks = iter(chunks)
+    block = next(chunks, None)
+    offset = done = 0
+    while block is not None:
+        following = next(chunks, None)
+        hi = len(block) if following is None else len(block) - 1
+        keep = min(overlap, len(block))
+        # Taken before the block is handed out, so columns added to it are not carried
+        tail = block.iloc[len(block) - keep:].copy()
+        yield offset, block, done - offset, hi
+        if following is None:
+            break
+        done = offset + hi
+        offset += len(block) - keep
+        block = pd.concat([tail, following], ignore_index=True)
+
+class WindowCursor:
+    """
+    Windows of one size already computed in a chunked pass over iter_blocks()
+    (whose overlap must be at least window_samples).
+    """
+
+    def __init__(self, window_samples, hop_samples=None):
+        self.window_samples = window_samples
+        self.hop_samples = window_samples if hop_samples is None else hop_samples
+        self.next_start = 0
+
+    def take(self, offset, n_rows):
+        """
+        (lo, hi, start) for a block of n_rows starting at sample offset: rows
+        lo:hi hold its complete windows that were not taken yet, the first of
+        them starting at sample `start`, so window_starts() on those rows gives
+        the windows of the whole signal. None if the block completes none.
+        """
+        n_windows = (offset + n_rows - self.window_samples - self.next_start) // self.hop_samples + 1
+        if n_windows <= 0:
+            return None
+        start = self.next_start
+        lo = start - offset
+        hi = lo + (n_windows - 1) * self.hop_samples + self.window_samples
+        self.next_start += n_windows * self.hop_samples
+        return lo, hi, start
+
+def gather_at(out, indexes, values, offset):
+    """
+    out[i] = values[indexes[i] - offset] for the sorted sample indexes that
+    fall in a block of values starting at sample offset.
+    """
+    lo, hi = np.searchsorted(indexes, [offset, offset + len(values)])
+    out[lo:hi] = np.asarray(values)[indexes[lo:hi] - offset]
+
+class SegmentStats:
+    """
+    Statistics of fixed sample ranges [start, end) (the visit's phases),
+    merged over consecutive blocks of a signal: per column (key) the non-NaN
+    count, mean and sum of squared deviations (Chan et al., as in
+    WindowPyramid.mean_sd), maximum, and value counts.
+    """
+
+    def __init__(self, starts, ends):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self._moments = {}
+        self._max = {}
+        self._counts = {}
+
+    def _parts(self, values, offset):
+        # (segment id, its values in this block)
+        n = len(values)
+        lo = np.clip(self.starts - offset, 0, n)
+        hi = np.clip(self.ends - offset, 0, n)
+        for i in np.flatnonzero(hi > lo):
+            yield i, values[lo[i]:hi[i]]
+
+    def add(self, key, values, offset):
+        """
+        Adds a block of values (samples offset..) to the moments and maxima of key.
+        """
+        values = np.asarray(values)
+        if key not in self._moments:
+            dtype = values.dtype if values.dtype.kind == "f" else np.dtype(np.float64)
+            n_segments = len(self.starts)
+            self._moments[key] = (np.zeros(n_segments, dtype=np.int64), np.zeros(n_segments), np.zeros(n_segments), dtype)
+            self._max[key] = np.full(n_segments, -np.inf)
+        count, mean, m2, _ = self._moments[key]
+        maxima = self._max[key]
+        for i, part in self._parts(values, offset):
+            part = part.astype(np.float64)
+            part = part[~np.isnan(part)]
+            if len(part) == 0:
+                continue
+            part_mean = part.mean()
+            n = count[i] + len(part)
+            delta = part_mean - mean[i]
+            m2[i] += ((part - part_mean) ** 2).sum() + delta * delta * count[i] * len(part) / n
+            mean[i] += delta * len(part) / n
+            count[i] = n
+            maxima[i] = max(maxima[i], part.max())
+
+    def add_counts(self, key, values, offset):
+        """
+        Adds a block of values (samples offset..) to the value counts of key; NaN is not counted.
+        """
+        counts = self._counts.setdefault(key, [{} for _ in self.starts])
+        for i, part in self._parts(np.asarray(values), offset):
+            found, n = np.unique(part[~pd.isna(part)], return_counts=True)
+            for value, k in zip(found.tolist(), n.tolist()):
+                counts[i][value] = counts[i].get(value, 0) + k
+
+    def count(self, key, segment):
+        return int(self._moments[key][0][segment]) if key in self._moments else 0
+
+    def mean_sd(self, key, segment, ddof=1):
+        """
+        Mean and SD of key over a segment, like Series.mean()/std(): NaN
+        without values (SD also with ddof or fewer), in the column's dtype.
+        """
+        count, mean, m2, dtype = self._moments[key]
+        n = count[segment]
+        mean_value = dtype.type(mean[segment]) if n > 0 else np.nan
+        sd_value = dtype.type(np.sqrt(m2[segment] / (n - ddof))) if n > ddof else np.nan
+        return mean_value, sd_value
+
+    def max(self, key, segment):
+        count, _, _, dtype = self._moments[key]
+        return dtype.type(self._max[key][segment]) if count[segment] > 0 else np.nan
+
+    def value_counts(self, key, segment):
+        """
+        {value: count} of key over a segment (empty if none).
+        """
+        if key not in self._counts:
+            return {}
+        return self._counts[key][segment]
+
+def concat_windows(parts):
+    """
+    Window tables of consecutive blocks as one. A column that is float64 in
+    any block (a float32 reduction with empty windows) is float64 in all of
+    them, as when every window is computed at once.
+    """
+    wide = {col for part in parts for col, dtype in part.dtypes.items() if dtype == np.float64}
+    parts = [part.astype({col: np.float64 for col in wide if col in part.columns}) for part in parts]
+    return pd.concat(parts, ignore_index=True)
+
+def write_feature_outputs(event_features, window_features, modality, participant_id, visit, output_dir, hop_size=None,
+                          feature_store=None):
+    """
+    Writes one file's features to output_dir: event_features (one dict per
+    phase) as features_<modality>_event_based_<participant>_<visit>.csv,
+    Condition, Start_Time and Duration first, and window_features ({window
+    size: DataFrame}) as features_<modality>_windowed_<window_name>_... .csv.
+    feature_store: also write each table to this store (utils.feature_store).
+    """
+    visit_name = visit.replace(' ', '_')
+    if event_features:
+        event_df = pd.DataFrame(event_features)
+        first = ['Condition', 'Start_Time', 'Duration']
+        event_df = event_df[first + [c for c in event_df.columns if c not in first]]
+        out_name = f"features_{modality}_event_based_{participant_id}_{visit_name}.csv"
+        event_df.to_csv(os.path.join(output_dir, out_name), index=False)
+        print(f"Event-based features saved to {out_name}")
+        if feature_store:
+            write_features(event_df, feature_store, "event_based", participant_id, visit, modality)
+    else:
+        print("No event-based features extracted.")
+
+    for window_size, window_df in window_features.items():
+        if window_df.empty:
+            print(f"No window-based features extracted ({window_size}s windows).")
+            continue
+        win_str = window_name(window_size, hop_size)
+        out_name = f"features_{modality}_windowed_{win_str}_{participant_id}_{visit_name}.csv"
+        window_df.to_csv(os.path.join(output_dir, out_name), index=False)
+        print(f"Window-based features saved to {out_name}")
+        if feature_store:
+            write_features(window_df, feature_store, f"windowed_{win_str}", participant_id, visit, modality)
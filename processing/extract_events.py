@@ -1,13 +1,24 @@
-import bioread
 import pandas as pd
 import numpy as np
 import argparse
 import os
+import sys
 
-def extract_events(acq_file, output_dir):
-    print(f"Reading {acq_file}...")
-    data = bioread.read_file(acq_file)
-    
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import read_acq
+
+def find_event_channels(data):
+    """
+    Finds digital/event marker channels (e.g. 'Digital input').
+    """
+    return [c for c in data.channels if "Digital" in c.name or "Event" in c.name]
+
+def events_from_data(data):
+    """
+    Builds the events table (text markers + digital channel rising edges)
+    from an already-read ACQ file.
+    """
     # Identify Event Channels (Digital or specific labels)
     # Moxie study typically uses digital channels for markers: 'Digital input', 'Label', etc.
     # We look for channels with "Digital" or "Event" in name, or specific logic.
@@ -39,8 +50,8 @@ def extract_events(acq_file, output_dir):
             })
 
     # 2. Check Digital Channels (Fallback/Additional)
-    for channel in data.channels:
-        if "Digital" in channel.name or "Event" in channel.name:
+    for channel in find_event_channels(data):
+        if channel.data is not None:
             print(f"Processing Event Channel: {channel.name}")
             vals = channel.data
             # Detect rising edges
@@ -60,10 +71,15 @@ def extract_events(acq_file, output_dir):
                     "source_channel": channel.name
                 })
     
+    return pd.DataFrame(events_list)
+
+def write_events(df, output_dir):
+    """
+    Writes events.csv into output_dir (creating it if needed).
+    """
     # Ensure output dir
     os.makedirs(output_dir, exist_ok=True)
     
-    df = pd.DataFrame(events_list)
     output_file = os.path.join(output_dir, "events.csv")
     
     if not df.empty:
@@ -74,11 +90,21 @@ def extract_events(acq_file, output_dir):
         print("No events found. Creating empty key file.")
         # Create empty with headers
         pd.DataFrame(columns=["event_label", "start_time", "duration"]).to_csv(output_file, index=False)
+    return output_file
+
+def extract_events(acq_file, output_dir, archive_dir=None):
+    print(f"Reading {acq_file}...")
+    # Markers come from the header; only the digital channels are decoded
+    data = read_acq(acq_file, find_event_channels, archive_dir=archive_dir)
+    
+    df = events_from_data(data)
+    return write_events(df, output_dir)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--acq_file", required=True)
     parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--archive_dir", required=False, help="ACQ archive from ingest_acq.py")
     args = parser.parse_args()
     
-    extract_events(args.acq_file, args.output_dir)
+    extract_events(args.acq_file, args.output_dir, args.archive_dir)
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import ARCHIVE_MANIFEST, read_acq_channels, read_acq_header, read_archive_manifest
+from utils.fingerprint import file_fingerprint, is_unchanged
+
+ARCHIVE_DIRNAME = "acq_archive"
+
+def default_archive_dir(output_root, participant_id, visit_type):
+    """
+    Archive location for a visit, next to its processed files and events.csv.
+    """
+    return os.path.join(output_root, str(participant_id), visit_type, ARCHIVE_DIRNAME)
+
+def ingest_acq(acq_file, archive_dir, force=False):
+    """
+    Decodes an ACQ file once into archive_dir: ch<NN>.npy per channel and a
+    manifest.json with channel headers, event markers and the source file's
+    size/mtime/sha256. Skipped if the archive already matches the file.
+    Returns True if the file was (re)ingested.
+    """
+    previous = read_archive_manifest(archive_dir)
+    if not force and previous is not None and is_unchanged(acq_file, previous.get("source")):
+        print(f"Archive is current: {archive_dir}")
+        # Same content under a new mtime (copied/touched): record it so the hash isn't recomputed next time
+        if os.stat(acq_file).st_mtime != previous["source"].get("mtime"):
+            previous["source"] = dict(file_fingerprint(acq_file, None), path=os.path.abspath(acq_file))
+            with open(os.path.join(archive_dir, ARCHIVE_MANIFEST), "w") as f:
+                json.dump(previous, f, indent=2)
+        return False
+
+    source = file_fingerprint(acq_file, previous.get("source") if previous else None)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    # The manifest is written last, so a half-written archive is never used
+    manifest_file = os.path.join(archive_dir, ARCHIVE_MANIFEST)
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+
+    print(f"Reading {acq_file}...")
+    header = read_acq_header(acq_file)
+
+    # One channel decoded at a time, so memory peaks at the largest channel, not the recording
+    channels = []
+    for i in range(len(header.channels)):
+        chan = read_acq_channels(acq_file, [i]).channels[i]
+        filename = f"ch{i:02d}.npy"
+        np.save(os.path.join(archive_dir, filename), chan.data)
+        channels.append({
+            "file": filename,
+            "name": chan.name,
+            "units": chan.units,
+            "samples_per_second": chan.samples_per_second,
+            "point_count": chan.point_count,
+            "frequency_divider": chan.frequency_divider,
+        })
+        print(f"  {filename}: {chan.name} ({chan.point_count} samples @ {chan.samples_per_second} Hz)")
+        chan.free_data()
+
+    markers = [
+        {
+            "text": m.text,
+            "sample_index": int(m.sample_index),
+            "channel_number": m.channel_number,
+            "type_code": m.type_code,
+            "date_created_str": m.date_created_str,
+        }
+        for m in header.event_markers
+    ]
+
+    manifest = {
+        "source": dict(source, path=os.path.abspath(acq_file)),
+        "samples_per_second": header.samples_per_second,
+        "channels": channels,
+        "event_markers": markers,
+    }
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Archived {len(channels)} channels and {len(markers)} markers to {archive_dir}")
+    return True
+
+def ingest_catalog(catalog_file, output_root, force=False):
+    """
+    Ingests every Acqknowledge file in a processing catalog (once per file,
+    although the catalog has one row per modality).
+    """
+    catalog = pd.read_csv(catalog_file)
+    acq_rows = catalog[catalog['device'] == 'acq'].drop_duplicates(subset=['file_path'])
+
+    failed = []
+    for _, row in acq_rows.iterrows():
+        archive_dir = default_archive_dir(output_root, row['participant_id'], row['visit_type'])
+        try:
+            ingest_acq(row['file_path'], archive_dir, force)
+        except Exception as e:
+            print(f"Failed to ingest {row['file_path']}: {e}")
+            failed.append(row['file_path'])
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest ACQ files into memory-mapped per-channel archives.")
+    parser.add_argument("--acq_file", help="Single ACQ file to ingest (with --archive_dir)")
+    parser.add_argument("--archive_dir", help="Archive directory for --acq_file")
+    parser.add_argument("--catalog", help="Processing catalog; ingests every acq file into <output_root>/<PID>/<Visit>/acq_archive")
+    parser.add_argument("--output_root", help="Output root used with --catalog")
+    parser.add_argument("--force", action="store_true", help="Re-ingest even if the archive is current")
+    args = parser.parse_args()
+
+    if args.catalog:
+        if not args.output_root:
+            print("Error: --catalog requires --output_root")
+            sys.exit(1)
+        failed = ingest_catalog(args.catalog, args.output_root, args.force)
+        if failed:
+            sys.exit(1)
+    elif args.acq_file and args.archive_dir:
+        ingest_acq(args.acq_file, args.archive_dir, args.force)
+    else:
+        print("Error: give either --acq_file and --archive_dir, or --catalog and --output_root")
+        sys.exit(1)
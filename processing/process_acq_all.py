@@ -0,0 +1,165 @@
+import argparse
+import pandas as pd
+import sys
+import os
+
+# Sibling processing scripts (this directory is on sys.path when run as a script)
+import extract_events
+import process_acq_ecg
+import process_acq_eda
+import process_acq_rsp
+import process_acq_bp
+import process_acq_emg
+
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import read_acq
+from utils.signal_io import OUTPUT_FORMATS
+
+# Each module finds its own channel(s) (find_ecg_channel, find_eda_channel, ...)
+# and writes the same processed_<modality>_* file as the standalone script.
+MODALITY_PROCESSORS = {
+    "ecg": process_acq_ecg.process_file,
+    "eda": process_acq_eda.process_file,
+    "rsp": process_acq_rsp.process_file,
+    "bp": process_acq_bp.process_file,
+    "emg": process_acq_emg.process_file,
+}
+
+# Channel finders, so only channels some modality actually uses are decoded
+MODALITY_FINDERS = {
+    "ecg": process_acq_ecg.find_ecg_channel,
+    "eda": process_acq_eda.find_eda_channel,
+    "rsp": process_acq_rsp.find_rsp_channels,
+    "bp": process_acq_bp.find_bp_channel,
+    "emg": process_acq_emg.find_emg_channels,
+}
+
+# Modalities whose process_file() writes peak indexes and accepts sparse_peaks
+SPARSE_PEAK_MODALITIES = ["ecg", "eda", "bp"]
+
+# Slow-varying modalities whose process_file() can decimate first (target_rate)
+DECIMATED_MODALITIES = ["eda", "rsp", "bp"]
+
+# Multi-channel modalities whose process_file() can process channels in a pool (workers)
+PARALLEL_CHANNEL_MODALITIES = ["rsp", "emg"]
+
+def parse_target_rates(values):
+    """
+    Parses --target_rates entries like 'eda=50' into {modality: rate in Hz}.
+    """
+    rates = {}
+    for value in values or []:
+        mod, sep, rate = value.partition("=")
+        if not sep or mod not in DECIMATED_MODALITIES:
+            raise ValueError(f"Invalid target rate '{value}' (expected one of {', '.join(DECIMATED_MODALITIES)}=<Hz>)")
+        rates[mod] = float(rate)
+    return rates
+
+def process_all(data, participant_id, visit_type, output_dir, events_file=None,
+                modalities=None, output_format="csv", extract=True, sparse_peaks=False, target_rates=None, workers=1,
+                write_beat_table=False):
+    """
+    Runs event extraction and every Acqknowledge modality on one already-read ACQ file.
+    target_rates: {modality: Hz} to decimate EDA/RSP/BP to before processing.
+    workers: processes for the channels of RSP/EMG (modalities still run one after another).
+    write_beat_table: BP writes a per-beat table instead of the interpolated SBP/DBP columns.
+    Returns {modality: output_file or None} and a list of modalities that raised.
+    """
+    if modalities is None:
+        modalities = list(MODALITY_PROCESSORS.keys())
+    if events_file is None:
+        events_file = os.path.join(output_dir, "events.csv")
+
+    # 1. Events (Layer 1 in the per-modality workflow)
+    if extract:
+        print("--- Events ---")
+        events_df = extract_events.events_from_data(data)
+        events_file = extract_events.write_events(events_df, output_dir)
+
+    # Read back exactly what the standalone scripts would read
+    events_df = None
+    if os.path.exists(events_file):
+        events_df = pd.read_csv(events_file)
+    else:
+        print("Events file not found.")
+
+    # 2. Modalities
+    outputs = {}
+    failed = []
+    for mod in modalities:
+        print(f"--- {mod.upper()} ---")
+        kwargs = {"sparse_peaks": sparse_peaks} if mod in SPARSE_PEAK_MODALITIES else {}
+        if target_rates and target_rates.get(mod):
+            kwargs["target_rate"] = target_rates[mod]
+        if mod in PARALLEL_CHANNEL_MODALITIES:
+            kwargs["workers"] = workers
+        if mod == "bp" and write_beat_table:
+            kwargs["write_beat_table"] = True
+        try:
+            outputs[mod] = MODALITY_PROCESSORS[mod](data, events_df, participant_id, visit_type, output_dir, output_format, **kwargs)
+        except Exception as e:
+            # Keep going so one bad channel doesn't lose the other modalities
+            print(f"{mod.upper()} processing failed: {e}")
+            outputs[mod] = None
+            failed.append(mod)
+
+    return outputs, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Read an ACQ file once and process events + all Acqknowledge modalities.")
+    parser.add_argument("--participant_id", required=True)
+    parser.add_argument("--visit_type", required=True)
+    parser.add_argument("--acq_file", required=True)
+    parser.add_argument("--events_file", required=False, help="Existing events CSV, used with --skip_events (default: <output_dir>/events.csv)")
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--output_format", choices=OUTPUT_FORMATS, default="csv", help="csv (default) or parquet")
+    parser.add_argument("--archive_dir", required=False, help="ACQ archive from ingest_acq.py (used instead of decoding the .acq if current)")
+    parser.add_argument("--modalities", nargs="+", choices=list(MODALITY_PROCESSORS.keys()), default=None,
+                        help="Subset of modalities to process (default: all)")
+    parser.add_argument("--skip_events", action="store_true", help="Use an existing events file instead of extracting events")
+    parser.add_argument("--sparse_peaks", action="store_true", help="Store peak positions only in the _index.npz sidecars, not as 0/1 columns")
+    parser.add_argument("--target_rates", nargs="+", default=None, metavar="MODALITY=HZ",
+                        help="Decimate slow modalities before processing, e.g. eda=50 rsp=50 bp=100 (default: native rate)")
+    parser.add_argument("--workers", type=int, default=1, help="Process RSP/EMG channels in a pool of this many processes (default: 1, one after another)")
+    parser.add_argument("--beat_table", action="store_true", help="BP: write a per-beat table (<stem>_beats) instead of the interpolated SBP/DBP columns")
+
+    args = parser.parse_args()
+
+    try:
+        target_rates = parse_target_rates(args.target_rates)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    modalities = args.modalities or list(MODALITY_PROCESSORS.keys())
+    finders = [MODALITY_FINDERS[mod] for mod in modalities]
+    if not args.skip_events:
+        finders.append(extract_events.find_event_channels)
+
+    # Load Data (the only decode for this file, limited to the channels in use)
+    print(f"Reading {args.acq_file}...")
+    try:
+        data = read_acq(args.acq_file, *finders, archive_dir=args.archive_dir)
+    except Exception as e:
+        print(f"Error reading ACQ: {e}")
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    outputs, failed = process_all(data, args.participant_id, args.visit_type, args.output_dir,
+                                  events_file=args.events_file, modalities=modalities,
+                                  output_format=args.output_format, extract=not args.skip_events,
+                                  sparse_peaks=args.sparse_peaks, target_rates=target_rates,
+                                  workers=args.workers, write_beat_table=args.beat_table)
+
+    print("\n--- Summary ---")
+    for mod, output_file in outputs.items():
+        print(f"  {mod}: {output_file if output_file else 'no output'}")
+
+    if failed:
+        print(f"Failed modalities: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,17 @@ if not hasattr(np, 'trapz'):
         from scipy import integrate
         np.trapz = integrate.trapezoid
 
-import bioread
 import neurokit2 as nk
 import sys
 import os
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import read_acq
+from utils.decimation import decimate
+from utils.signal_io import (OUTPUT_FORMATS, apply_schema, beat_table, beats_path, output_path, peak_envelope, save_signals,
+                             save_signals_with_index)
+
 def find_bp_channel(data):
     """
     Finds Blood Pressure / NIBP channel.
@@ -30,11 +36,37 @@ def find_bp_channel(data):
             
     return None
 
-def process_bp(channel, fs, events_df):
+def find_troughs(signal, peaks):
+    """
+    Diastolic trough between each pair of consecutive systolic peaks: the
+    index of the minimum of signal[peaks[i]:peaks[i+1]] (the first one if
+    tied, like np.argmin), for all beats at once. np.minimum.reduceat gives
+    each beat's minimum; the trough is the first sample of the beat equal to it.
+    """
+    peaks = np.asarray(peaks, dtype=np.int64)
+    if len(peaks) < 2:
+        return np.array([], dtype=np.int64)
+    span = np.asarray(signal[peaks[0]:peaks[-1]])
+    starts = peaks[:-1] - peaks[0]
+    minima = np.minimum.reduceat(span, starts)
+    is_min = span == np.repeat(minima, np.diff(peaks))
+    if np.isnan(minima).any():
+        # A beat with NaN has a NaN minimum; np.argmin stops at its first NaN
+        is_min |= np.isnan(span)
+    hits = np.flatnonzero(is_min)
+    return hits[np.searchsorted(hits, starts)] + peaks[0]
+
+def process_bp(channel, fs, values=None, envelopes=True):
     """
     Process BP signal treating it as PPG/Continuous Waveform.
-    Outputs Cleaned Signal, Systolic (Peaks), Diastolic (Troughs), Rate.
+    Outputs Cleaned Signal, Systolic (Peaks), Diastolic (Troughs), Rate,
+    and the per-beat table (beat_table). Both are empty if processing failed.
+    values: the samples to process (default: channel.data), e.g. after decimation.
+    envelopes: also output the interpolated SBP/DBP columns (BP_Systolic_Interp,
+               BP_Diastolic_Interp).
     """
+    if values is None:
+        values = channel.data
     print(f"Processing {channel.name} with sampling rate {fs}Hz")
     
     # 1. Clean
@@ -44,10 +76,10 @@ def process_bp(channel, fs, events_df):
     try:
         # Standard cutoff for BP/Pulse waves is often around 5-10Hz to smooth, 
         # or up to 40Hz if morphology is critical. 8Hz is a good balance for NIBP envelope.
-        bp_cleaned = nk.signal_filter(channel.data, sampling_rate=fs, lowcut=None, highcut=8, method='butterworth', order=4)
+        bp_cleaned = nk.signal_filter(values, sampling_rate=fs, lowcut=None, highcut=8, method='butterworth', order=4)
     except Exception as e:
         print(f"BP cleaning failed: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), pd.DataFrame()
         
     # 2. Find Peaks (Systolic)
     try:
@@ -71,7 +103,7 @@ def process_bp(channel, fs, events_df):
         
         # Let's construct the output DataFrame
         signals = pd.DataFrame({
-            "BP_Raw": channel.data,
+            "BP_Raw": values,
             "BP_Clean": bp_cleaned,
             "BP_Rate": rate
         })
@@ -81,55 +113,66 @@ def process_bp(channel, fs, events_df):
         signals.iloc[peaks, signals.columns.get_loc('BP_Systolic_Peak')] = 1
         
         # Find Troughs (Diastolic)
-        # Simply invert signal and find peaks or use minimum between peaks
-        # A simple approach: Minimum value between two systolic peaks
-        troughs = []
-        for i in range(len(peaks)-1):
-            # slice between peaks
-            segment = bp_cleaned[peaks[i]:peaks[i+1]]
-            # find min index local to segment
-            min_loc = np.argmin(segment)
-            # absolute index
-            troughs.append(peaks[i] + min_loc)
+        # Minimum value between two systolic peaks (find_troughs, all beats at once)
+        troughs = find_troughs(bp_cleaned, peaks)
             
         signals['BP_Diastolic_Peak'] = 0
         signals.iloc[troughs, signals.columns.get_loc('BP_Diastolic_Peak')] = 1
         
-        # Interpolate SBP and DBP curves for continuous view?
-        # User wants "clean simple scripts". Time series of Pressure is good.
-        # Let's verify the user's intent: "multiple channels for BP, example systolic, dyastolic"
-        # Since we derived them, we can output the continuous estimates of SBP/DBP (e.g. sample-and-hold or interpolation)
-        # Or just the cleaned wave (which is the pressure) and the markers.
-        # The CLEANED WAVE essentially oscillates between SBP and DBP. 
-        # So "BP_Clean" IS the pressure tracing. 
-        
-        # However, it's often useful to have the envelope.
-        # Let's add interpolated SBP/DBP columns.
+        # The CLEANED WAVE oscillates between SBP and DBP, so "BP_Clean" IS the pressure tracing.
+        # SBP/DBP per beat also go in a compact table (beat_table).
+        beats = beat_table(bp_cleaned, peaks, troughs, fs)
         
-        # Create a series with only peak values, then interpolate
-        sbp_series = pd.Series(np.nan, index=np.arange(len(signals)))
-        sbp_series.iloc[peaks] = bp_cleaned[peaks]
-        signals['BP_Systolic_Interp'] = sbp_series.interpolate(method='linear').bfill()
+        # Continuous SBP/DBP envelopes: linear between beats, held before the first and after the last
+        # (np.interp, utils.signal_io.peak_envelope). Without them, consumers rebuild them the same way.
+        if envelopes:
+            signals['BP_Systolic_Interp'] = peak_envelope(peaks, bp_cleaned[peaks], 0, len(signals))
+            signals['BP_Diastolic_Interp'] = peak_envelope(troughs, bp_cleaned[troughs], 0, len(signals))
         
-        dbp_series = pd.Series(np.nan, index=np.arange(len(signals)))
-        dbp_series.iloc[troughs] = bp_cleaned[troughs]
-        signals['BP_Diastolic_Interp'] = dbp_series.interpolate(method='linear').bfill()
-        
-        # Add Event Labels
-        if events_df is not None and not events_df.empty:
-            signals['Event_Label'] = None
-            for _, row in events_df.iterrows():
-                label = row['event_label']
-                start_time = row['start_time']
-                start_idx = int(start_time * fs)
-                if 0 <= start_idx < len(signals):
-                     signals.at[start_idx, 'Event_Label'] = label
+        # Event positions are saved in the index sidecar, not as a column
                      
-        return signals
+        return signals, beats
         
     except Exception as e:
         print(f"BP Processing failed: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), pd.DataFrame()
+
+def process_file(data, events_df, participant_id, visit_type, output_dir, output_format="csv", sparse_peaks=False, target_rate=None,
+                 write_beat_table=False):
+    """
+    Finds, processes and saves the BP channel of an already-read ACQ file.
+    target_rate: decimate to about this rate (Hz) first; the file records the effective rate.
+    write_beat_table: write the per-beat table (<stem>_beats) and leave the
+                BP_Systolic_Interp / BP_Diastolic_Interp columns out of the signal file.
+    Returns the output file path, or None if nothing was generated.
+    """
+    # Find Channel
+    bp_chan = find_bp_channel(data)
+    
+    if bp_chan is None:
+        print("No Blood Pressure channel found.")
+        return None
+        
+    # Anti-aliased decimation (no-op without a target rate)
+    values, fs = decimate(bp_chan.data, data.samples_per_second, target_rate)
+    if fs != data.samples_per_second:
+        print(f"Decimated {bp_chan.name} from {data.samples_per_second}Hz to {fs}Hz")
+
+    # Process
+    signals_df, beats = process_bp(bp_chan, fs, values, envelopes=not write_beat_table)
+    
+    if not signals_df.empty:
+        output_stem = f"processed_bp_{participant_id}_{visit_type.replace(' ', '_')}"
+        output_file = output_path(output_dir, output_stem, output_format)
+        save_signals_with_index(signals_df, output_file, "bp", fs, sparse_peaks, events_df)
+        print(f"Processed BP signals saved to {output_file}")
+        if write_beat_table:
+            save_signals(apply_schema(beats, "bp"), beats_path(output_file), fs)
+            print(f"Beat table ({len(beats)} beats) saved to {beats_path(output_file)}")
+        return output_file
+    else:
+        print("No BP data generated.")
+        return None
 
 def main():
     parser = argparse.ArgumentParser()
@@ -138,38 +181,29 @@ def main():
     parser.add_argument("--acq_file", required=True)
     parser.add_argument("--events_file", required=True)
     parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--output_format", choices=OUTPUT_FORMATS, default="csv", help="csv (default) or parquet")
+    parser.add_argument("--archive_dir", required=False, help="ACQ archive from ingest_acq.py (used instead of decoding the .acq if current)")
+    parser.add_argument("--target_rate", type=float, default=None, help="Decimate the BP channel to about this rate (Hz) before processing (default: native rate)")
+    parser.add_argument("--sparse_peaks", action="store_true", help="Store peak positions only in the _index.npz sidecar, not as 0/1 columns")
+    parser.add_argument("--beat_table", action="store_true", help="Write a per-beat table (<stem>_beats) instead of the interpolated SBP/DBP columns")
     
     args = parser.parse_args()
     
-    # Load Data
+    # Load Data (only the channel(s) this modality needs are decoded)
     try:
-        data = bioread.read_file(args.acq_file)
+        data = read_acq(args.acq_file, find_bp_channel, archive_dir=args.archive_dir)
     except Exception as e:
         print(f"Error reading ACQ: {e}")
         sys.exit(1)
         
-    # Find Channel
-    bp_chan = find_bp_channel(data)
-    
-    if bp_chan is None:
-        print("No Blood Pressure channel found.")
-        sys.exit(0)
-        
     # Load Events
     events_df = None
     if os.path.exists(args.events_file):
         events_df = pd.read_csv(args.events_file)
         
-    # Process
-    signals_df = process_bp(bp_chan, data.samples_per_second, events_df)
-    
-    if not signals_df.empty:
-        output_filename = f"processed_bp_{args.participant_id}_{args.visit_type.replace(' ', '_')}.csv"
-        output_file = os.path.join(args.output_dir, output_filename)
-        signals_df.to_csv(output_file, index=False)
-        print(f"Processed BP signals saved to {output_file}")
-    else:
-        print("No BP data generated.")
+    # Exits 0 even if no channel was found
+    process_file(data, events_df, args.participant_id, args.visit_type, args.output_dir, args.output_format, args.sparse_peaks, args.target_rate,
+                 args.beat_table)
 
 if __name__ == "__main__":
     main()
@@ -11,11 +11,15 @@ if not hasattr(np, 'trapz'):
         from scipy import integrate
         np.trapz = integrate.trapezoid
 
-import bioread
 import neurokit2 as nk
 import sys
 import os
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import read_acq
+from utils.signal_io import OUTPUT_FORMATS, output_path, save_signals_with_index
+
 def find_ecg_channel(data):
     """
     Attempts to find the ECG channel by name.
@@ -32,7 +36,7 @@ def find_ecg_channel(data):
         print(f" - {c.name}")
     return None
 
-def process_ecg(channel, fs, events_df):
+def process_ecg(channel, fs):
     """
     Process ECG signal.
     """
@@ -50,23 +54,34 @@ def process_ecg(channel, fs, events_df):
     # Add time column relative to start
     # signals['Time_Seconds'] = np.arange(len(signals)) / fs
     
-    # If events are provided, we could map them, but for "clean simple scripts" keeping the signal 
-    # file pure and separate from events file is often better. 
-    # However, adding a 'Label' column if it overlaps with an event is helpful context.
-    
-    if events_df is not None and not events_df.empty:
-        signals['Event_Label'] = None
-        for _, row in events_df.iterrows():
-            label = row['event_label']
-            start_time = row['start_time']
-            # Assume 1 second duration for markers if not specified? 
-            # Or just mark the closest sample?
-            start_idx = int(start_time * fs)
-            if 0 <= start_idx < len(signals):
-                 signals.at[start_idx, 'Event_Label'] = label
+    # Events are not added as a column: keeping the signal file pure and separate
+    # from the events file is better. Their sample positions go in the index sidecar.
                  
     return signals
 
+def process_file(data, events_df, participant_id, visit_type, output_dir, output_format="csv", sparse_peaks=False):
+    """
+    Finds, processes and saves the ECG channel of an already-read ACQ file.
+    Returns the output file path, or None if no ECG channel was found.
+    """
+    # Find Channel
+    ecg_chan = find_ecg_channel(data)
+    if ecg_chan is None:
+        print("No ECG channel found.")
+        return None
+        
+    # Process
+    signals_df = process_ecg(ecg_chan, data.samples_per_second)
+    
+    # Save - using 'processed' prefix
+    output_stem = f"processed_ecg_{participant_id}_{visit_type.replace(' ', '_')}"
+    output_file = output_path(output_dir, output_stem, output_format)
+    
+    # CSV by default; parquet keeps typed columns and the sampling rate.
+    save_signals_with_index(signals_df, output_file, "ecg", data.samples_per_second, sparse_peaks, events_df)
+    print(f"Processed signals saved to {output_file}")
+    return output_file
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--participant_id", required=True)
@@ -74,12 +89,15 @@ def main():
     parser.add_argument("--acq_file", required=True)
     parser.add_argument("--events_file", required=True)
     parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--output_format", choices=OUTPUT_FORMATS, default="csv", help="csv (default) or parquet")
+    parser.add_argument("--archive_dir", required=False, help="ACQ archive from ingest_acq.py (used instead of decoding the .acq if current)")
+    parser.add_argument("--sparse_peaks", action="store_true", help="Store peak positions only in the _index.npz sidecar, not as 0/1 columns")
     
     args = parser.parse_args()
     
-    # Load Data
+    # Load Data (only the channel(s) this modality needs are decoded)
     try:
-        data = bioread.read_file(args.acq_file)
+        data = read_acq(args.acq_file, find_ecg_channel, archive_dir=args.archive_dir)
     except Exception as e:
         print(f"Error reading ACQ: {e}")
         sys.exit(1)
@@ -91,24 +109,9 @@ def main():
         print("Events file not found.")
         events_df = None
         
-    # Find Channel
-    ecg_chan = find_ecg_channel(data)
-    if ecg_chan is None:
-        print("No ECG channel found.")
+    output_file = process_file(data, events_df, args.participant_id, args.visit_type, args.output_dir, args.output_format, args.sparse_peaks)
+    if output_file is None:
         sys.exit(1)
-        
-    # Process
-    signals_df = process_ecg(ecg_chan, data.samples_per_second, events_df)
-    
-    # Save - using 'processed' prefix
-    # Save - using 'processed' prefix
-    output_filename = f"processed_ecg_{args.participant_id}_{args.visit_type.replace(' ', '_')}.csv"
-    output_file = os.path.join(args.output_dir, output_filename)
-    
-    # Save slightly compressed or just raw csv? 
-    # CSV is fine for now.
-    signals_df.to_csv(output_file, index=False)
-    print(f"Processed signals saved to {output_file}")
 
 if __name__ == "__main__":
     main()
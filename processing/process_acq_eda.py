@@ -10,11 +10,16 @@ if not hasattr(np, 'trapz'):
         from scipy import integrate
         np.trapz = integrate.trapezoid
 
-import bioread
 import neurokit2 as nk
 import sys
 import os
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import read_acq
+from utils.decimation import decimate
+from utils.signal_io import OUTPUT_FORMATS, output_path, save_signals_with_index
+
 def find_eda_channel(data):
     """
     Attempts to find the EDA channel by name.
@@ -37,17 +42,20 @@ def find_eda_channel(data):
         print(f" - {c.name}")
     return None
 
-def process_eda(channel, fs, events_df):
+def process_eda(channel, fs, values=None):
     """
     Process EDA signal.
+    values: the samples to process (default: channel.data), e.g. after decimation.
     Returns DataFrame with processed signals (Clean, Phasic, Tonic, SCR Onsets, etc.)
     """
+    if values is None:
+        values = channel.data
     print(f"Processing {channel.name} with sampling rate {fs}Hz")
     
     # 1. Clean & Decompose
     # 'neurokit' method is standard
     try:
-        signals, info = nk.eda_process(channel.data, sampling_rate=fs, method="neurokit")
+        signals, info = nk.eda_process(values, sampling_rate=fs, method="neurokit")
     except Exception as e:
         print(f"EDA processing failed: {e}")
         return pd.DataFrame()
@@ -55,18 +63,40 @@ def process_eda(channel, fs, events_df):
     # signals usually contains:
     # 'EDA_Raw', 'EDA_Clean', 'EDA_Tonic', 'EDA_Phasic', 'SCR_Onsets', 'SCR_Peaks', 'SCR_Height', 'SCR_Amplitude', 'SCR_RecoveryTime'
     
-    # Add Event Label if matching
-    if events_df is not None and not events_df.empty:
-        signals['Event_Label'] = None
-        for _, row in events_df.iterrows():
-            label = row['event_label']
-            start_time = row['start_time']
-            start_idx = int(start_time * fs)
-            if 0 <= start_idx < len(signals):
-                 signals.at[start_idx, 'Event_Label'] = label
+    # Event positions are saved in the index sidecar, not as a column
                  
     return signals
 
+def process_file(data, events_df, participant_id, visit_type, output_dir, output_format="csv", sparse_peaks=False, target_rate=None):
+    """
+    Finds, processes and saves the EDA channel of an already-read ACQ file.
+    target_rate: decimate to about this rate (Hz) first; the file records the effective rate.
+    Returns the output file path, or None if nothing was generated.
+    """
+    # Find Channel
+    eda_chan = find_eda_channel(data)
+    if eda_chan is None:
+        print("No EDA channel found.")
+        return None
+        
+    # Anti-aliased decimation (no-op without a target rate)
+    values, fs = decimate(eda_chan.data, data.samples_per_second, target_rate)
+    if fs != data.samples_per_second:
+        print(f"Decimated {eda_chan.name} from {data.samples_per_second}Hz to {fs}Hz")
+
+    # Process
+    signals_df = process_eda(eda_chan, fs, values)
+    
+    if not signals_df.empty:
+        output_stem = f"processed_eda_{participant_id}_{visit_type.replace(' ', '_')}"
+        output_file = output_path(output_dir, output_stem, output_format)
+        save_signals_with_index(signals_df, output_file, "eda", fs, sparse_peaks, events_df)
+        print(f"Processed EDA signals saved to {output_file}")
+        return output_file
+    else:
+        print("No processed EDA data generated.")
+        return None
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--participant_id", required=True)
@@ -74,12 +104,16 @@ def main():
     parser.add_argument("--acq_file", required=True)
     parser.add_argument("--events_file", required=True)
     parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--output_format", choices=OUTPUT_FORMATS, default="csv", help="csv (default) or parquet")
+    parser.add_argument("--archive_dir", required=False, help="ACQ archive from ingest_acq.py (used instead of decoding the .acq if current)")
+    parser.add_argument("--target_rate", type=float, default=None, help="Decimate the EDA channel to about this rate (Hz) before processing (default: native rate)")
+    parser.add_argument("--sparse_peaks", action="store_true", help="Store peak positions only in the _index.npz sidecar, not as 0/1 columns")
     
     args = parser.parse_args()
     
-    # Load Data
+    # Load Data (only the channel(s) this modality needs are decoded)
     try:
-        data = bioread.read_file(args.acq_file)
+        data = read_acq(args.acq_file, find_eda_channel, archive_dir=args.archive_dir)
     except Exception as e:
         print(f"Error reading ACQ: {e}")
         sys.exit(1)
@@ -91,22 +125,8 @@ def main():
         print("Events file not found.")
         events_df = None
         
-    # Find Channel
-    eda_chan = find_eda_channel(data)
-    if eda_chan is None:
-        print("No EDA channel found.")
-        sys.exit(0) # Exit gracefully if just no channel
-        
-    # Process
-    signals_df = process_eda(eda_chan, data.samples_per_second, events_df)
-    
-    if not signals_df.empty:
-        output_filename = f"processed_eda_{args.participant_id}_{args.visit_type.replace(' ', '_')}.csv"
-        output_file = os.path.join(args.output_dir, output_filename)
-        signals_df.to_csv(output_file, index=False)
-        print(f"Processed EDA signals saved to {output_file}")
-    else:
-        print("No processed EDA data generated.")
+    # Exits 0 even if no channel was found
+    process_file(data, events_df, args.participant_id, args.visit_type, args.output_dir, args.output_format, args.sparse_peaks, args.target_rate)
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,16 @@
 import argparse
 import pandas as pd
 import numpy as np
-import bioread
 import neurokit2 as nk
 import sys
 import os
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import read_acq
+from utils.channel_pool import join_channels, process_channels
+from utils.signal_io import OUTPUT_FORMATS, output_path, save_signals_with_index
+
 def find_emg_channels(data):
     """
     Finds all EMG channels.
@@ -18,17 +23,18 @@ def find_emg_channels(data):
             emg_channels.append(channel)
     return emg_channels
 
-def process_single_emg(channel, fs, suffix):
+def process_single_emg(values, fs, suffix, name):
     """
-    Process a single EMG channel.
+    Process a single EMG channel's samples (name is the channel name, for
+    logging). Takes a bare array so it can run in a worker process.
     """
-    print(f"Processing {channel.name} (Suffix: {suffix})")
+    print(f"Processing {name} (Suffix: {suffix})")
     
     try:
         # NeuroKit2 EMG Process
         # 1. Clean (Bandpass 100-900 usually? NK defaults are good: 100-500Hz for surface EMG)
         # 2. Activity (Activation detection)
-        signals, info = nk.emg_process(channel.data, sampling_rate=fs)
+        signals, info = nk.emg_process(values, sampling_rate=fs)
         
         # Rename columns to be specific to this channel
         # Standard NK output: EMG_Raw, EMG_Clean, EMG_Amplitude, EMG_Activity, EMG_Onsets
@@ -39,45 +45,29 @@ def process_single_emg(channel, fs, suffix):
         
         # Add raw if not in output (nk.emg_process returns a dataframe with Raw usually)
         if f"EMG_Raw_{suffix}" not in signals.columns:
-             signals[f"EMG_Raw_{suffix}"] = channel.data
+             signals[f"EMG_Raw_{suffix}"] = values
              
         return signals
         
     except Exception as e:
-        print(f"Failed to process {channel.name}: {e}")
+        print(f"Failed to process {name}: {e}")
         return pd.DataFrame()
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--participant_id", required=True)
-    parser.add_argument("--visit_type", required=True)
-    parser.add_argument("--acq_file", required=True)
-    parser.add_argument("--events_file", required=True)
-    parser.add_argument("--output_dir", required=True)
-    
-    args = parser.parse_args()
-    
-    # Load Data
-    try:
-        data = bioread.read_file(args.acq_file)
-    except Exception as e:
-        print(f"Error reading ACQ: {e}")
-        sys.exit(1)
-        
+def process_file(data, events_df, participant_id, visit_type, output_dir, output_format="csv", workers=1):
+    """
+    Finds, processes and saves all EMG channels of an already-read ACQ file.
+    workers: process the channels in a pool of this many processes.
+    Returns the output file path, or None if nothing was generated.
+    """
     # Find Channels
     emg_channels = find_emg_channels(data)
     
     if not emg_channels:
         print("No EMG channels found.")
-        sys.exit(0)
-        
-    # Load Events
-    events_df = None
-    if os.path.exists(args.events_file):
-        events_df = pd.read_csv(args.events_file)
+        return None
         
     # Process All Channels
-    all_signals = []
+    tasks = []
     
     # We might have channel names like "EMG - Zygomatic", "EMG - Corrugator"
     # Or just "EMG1", "EMG2". 
@@ -89,33 +79,49 @@ def main():
         safe_name = "".join([c for c in channel.name if c.isalnum() or c=='_'])
         suffix = f"Channel_{i+1}_{safe_name}"
         
-        sig_df = process_single_emg(channel, data.samples_per_second, suffix)
-        if not sig_df.empty:
-            all_signals.append(sig_df)
-            
-    if not all_signals:
+        tasks.append((channel.data, data.samples_per_second, suffix, channel.name))
+
+    # Channels side by side (no concat copy)
+    final_df = join_channels(process_channels(process_single_emg, tasks, "emg", workers))
+    if final_df.empty:
         print("No EMG signals generated.")
-        sys.exit(0)
-        
-    # Concatenate columns
-    final_df = pd.concat(all_signals, axis=1)
+        return None
     
-    # Add Event Labels (Just once)
-    if events_df is not None and not events_df.empty:
-        fs = data.samples_per_second
-        final_df['Event_Label'] = None
-        for _, row in events_df.iterrows():
-            label = row['event_label']
-            start_time = row['start_time']
-            start_idx = int(start_time * fs)
-            if 0 <= start_idx < len(final_df):
-                 final_df.at[start_idx, 'Event_Label'] = label
-                 
     # Save
-    output_filename = f"processed_emg_{args.participant_id}_{args.visit_type.replace(' ', '_')}.csv"
-    output_file = os.path.join(args.output_dir, output_filename)
-    final_df.to_csv(output_file, index=False)
+    output_stem = f"processed_emg_{participant_id}_{visit_type.replace(' ', '_')}"
+    output_file = output_path(output_dir, output_stem, output_format)
+    # Event positions (just once, for all channels) go in the index sidecar
+    save_signals_with_index(final_df, output_file, "emg", data.samples_per_second, events_df=events_df)
     print(f"Processed EMG signals saved to {output_file}")
+    return output_file
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--participant_id", required=True)
+    parser.add_argument("--visit_type", required=True)
+    parser.add_argument("--acq_file", required=True)
+    parser.add_argument("--events_file", required=True)
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--output_format", choices=OUTPUT_FORMATS, default="csv", help="csv (default) or parquet")
+    parser.add_argument("--archive_dir", required=False, help="ACQ archive from ingest_acq.py (used instead of decoding the .acq if current)")
+    parser.add_argument("--workers", type=int, default=1, help="Process the channels in a pool of this many processes (default: 1, one after another)")
+    
+    args = parser.parse_args()
+    
+    # Load Data (only the channel(s) this modality needs are decoded)
+    try:
+        data = read_acq(args.acq_file, find_emg_channels, archive_dir=args.archive_dir)
+    except Exception as e:
+        print(f"Error reading ACQ: {e}")
+        sys.exit(1)
+        
+    # Load Events
+    events_df = None
+    if os.path.exists(args.events_file):
+        events_df = pd.read_csv(args.events_file)
+        
+    # Exits 0 even if no channel was found
+    process_file(data, events_df, args.participant_id, args.visit_type, args.output_dir, args.output_format, args.workers)
 
 if __name__ == "__main__":
     main()
@@ -10,11 +10,17 @@ if not hasattr(np, 'trapz'):
         from scipy import integrate
         np.trapz = integrate.trapezoid
 
-import bioread
 import neurokit2 as nk
 import sys
 import os
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import read_acq
+from utils.channel_pool import join_channels, process_channels
+from utils.decimation import decimate
+from utils.signal_io import OUTPUT_FORMATS, output_path, save_signals_with_index
+
 def find_rsp_channels(data):
     """
     Finds all respiration channels.
@@ -29,11 +35,15 @@ def find_rsp_channels(data):
             
     return rsp_channels
 
-def process_single_rsp(channel, fs, suffix):
-    print(f"Processing {suffix} ({channel.name}) with sampling rate {fs}Hz")
+def process_single_rsp(values, fs, suffix, name):
+    """
+    Processes one respiration channel's samples (name is the channel name,
+    for logging). Takes a bare array so it can run in a worker process.
+    """
+    print(f"Processing {suffix} ({name}) with sampling rate {fs}Hz")
     try:
         # NeuroKit cleaning and processing
-        signals, info = nk.rsp_process(channel.data, sampling_rate=fs, method="khodadad2018")
+        signals, info = nk.rsp_process(values, sampling_rate=fs, method="khodadad2018")
         
         # Rename columns
         signals.columns = [f"{col}_{suffix}" for col in signals.columns]
@@ -42,69 +52,81 @@ def process_single_rsp(channel, fs, suffix):
         print(f"Failed to process {suffix}: {e}")
         return pd.DataFrame()
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--participant_id", required=True)
-    parser.add_argument("--visit_type", required=True)
-    parser.add_argument("--acq_file", required=True)
-    parser.add_argument("--events_file", required=True)
-    parser.add_argument("--output_dir", required=True)
-    
-    args = parser.parse_args()
-    
-    # Load Data
-    try:
-        data = bioread.read_file(args.acq_file)
-    except Exception as e:
-        print(f"Error reading ACQ: {e}")
-        sys.exit(1)
-        
+def process_file(data, events_df, participant_id, visit_type, output_dir, output_format="csv", target_rate=None, workers=1):
+    """
+    Finds, processes and saves all respiration channels of an already-read ACQ file.
+    target_rate: decimate to about this rate (Hz) first; the file records the effective rate.
+    workers: process the channels in a pool of this many processes.
+    Returns the output file path, or None if nothing was generated.
+    """
     # Find Channels
     rsp_channels = find_rsp_channels(data)
     
     if not rsp_channels:
         print("No Respiration channels found (RSP).")
-        sys.exit(0)
+        return None
         
     fs = data.samples_per_second
     
-    combined = pd.DataFrame()
-    
     # Process each found channel
+    tasks = []
     for i, chan in enumerate(rsp_channels):
         # Suffix using part of the name to be distinct but readable
         # e.g. RSP2208000207 -> RSP_1_2208000207
         # or just RSP_1, RSP_2
         suffix = f"Channel_{i+1}_{chan.name.replace(' ', '_')}"
         
-        df_res = process_single_rsp(chan, fs, suffix)
-        
-        if not df_res.empty:
-            if combined.empty:
-                combined = df_res
-            else:
-                combined = pd.concat([combined, df_res], axis=1)
+        # Anti-aliased decimation (no-op without a target rate)
+        # (same rate for every channel, so fs is also the rate of the combined file)
+        values, fs = decimate(chan.data, data.samples_per_second, target_rate)
+        if fs != data.samples_per_second:
+            print(f"Decimated {chan.name} from {data.samples_per_second}Hz to {fs}Hz")
 
-    # Add Event Labels if exists
-    if os.path.exists(args.events_file) and not combined.empty:
-        events_df = pd.read_csv(args.events_file)
-        combined['Event_Label'] = None
-        # Assuming same FS for alignment
-        for _, row in events_df.iterrows():
-            label = row['event_label']
-            start_time = row['start_time']
-            start_idx = int(start_time * fs)
-            if 0 <= start_idx < len(combined):
-                 combined.at[start_idx, 'Event_Label'] = label
+        tasks.append((values, fs, suffix, chan.name))
+
+    # Channels side by side (no concat copy)
+    combined = join_channels(process_channels(process_single_rsp, tasks, "rsp", workers))
 
     # Save
     if not combined.empty:
-        output_filename = f"processed_rsp_{args.participant_id}_{args.visit_type.replace(' ', '_')}.csv"
-        output_file = os.path.join(args.output_dir, output_filename)
-        combined.to_csv(output_file, index=False)
+        output_stem = f"processed_rsp_{participant_id}_{visit_type.replace(' ', '_')}"
+        output_file = output_path(output_dir, output_stem, output_format)
+        # Event positions go in the index sidecar (assuming same FS for alignment)
+        save_signals_with_index(combined, output_file, "rsp", fs, events_df=events_df)
         print(f"Processed RSP signals saved to {output_file}")
+        return output_file
     else:
         print("No RSP data generated.")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--participant_id", required=True)
+    parser.add_argument("--visit_type", required=True)
+    parser.add_argument("--acq_file", required=True)
+    parser.add_argument("--events_file", required=True)
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--output_format", choices=OUTPUT_FORMATS, default="csv", help="csv (default) or parquet")
+    parser.add_argument("--archive_dir", required=False, help="ACQ archive from ingest_acq.py (used instead of decoding the .acq if current)")
+    parser.add_argument("--target_rate", type=float, default=None, help="Decimate the RSP channels to about this rate (Hz) before processing (default: native rate)")
+    parser.add_argument("--workers", type=int, default=1, help="Process the channels in a pool of this many processes (default: 1, one after another)")
+    
+    args = parser.parse_args()
+    
+    # Load Data (only the channel(s) this modality needs are decoded)
+    try:
+        data = read_acq(args.acq_file, find_rsp_channels, archive_dir=args.archive_dir)
+    except Exception as e:
+        print(f"Error reading ACQ: {e}")
+        sys.exit(1)
+        
+    # Load Events
+    events_df = None
+    if os.path.exists(args.events_file):
+        events_df = pd.read_csv(args.events_file)
+        
+    # Exits 0 even if no channel was found
+    process_file(data, events_df, args.participant_id, args.visit_type, args.output_dir, args.output_format, args.target_rate, args.workers)
 
 if __name__ == "__main__":
     main()
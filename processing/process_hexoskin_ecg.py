@@ -16,6 +16,10 @@ import os
 import glob
 from scipy.io import wavfile
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import OUTPUT_FORMATS, output_path, save_signals_with_index
+
 def load_hexoskin_ecg(hex_dir):
     """
     Loads ECG data from Hexoskin directory.
@@ -110,7 +114,7 @@ def load_hexoskin_ecg(hex_dir):
     
     return None, None
 
-def process_hex_ecg(data, fs, events_df=None):
+def process_hex_ecg(data, fs):
     print(f"Processing Hexoskin ECG with sampling rate {fs}Hz")
     
     # 1. Clean
@@ -121,15 +125,7 @@ def process_hex_ecg(data, fs, events_df=None):
         signals, info = nk.ecg_process(ecg_cleaned, sampling_rate=fs)
         # signals contains ['ECG_Raw', 'ECG_Clean', 'ECG_R_Peaks', 'ECG_Rate'...]
         
-        # Add Event Labels
-        if events_df is not None and not events_df.empty:
-            signals['Event_Label'] = None
-            for _, row in events_df.iterrows():
-                label = row['event_label']
-                start_time = row['start_time']
-                start_idx = int(start_time * fs)
-                if 0 <= start_idx < len(signals):
-                     signals.at[start_idx, 'Event_Label'] = label
+        # Event positions are saved in the index sidecar, not as a column
                      
         return signals
         
@@ -144,6 +140,7 @@ def main():
     parser.add_argument("--hex_path", required=True)
     parser.add_argument("--events_file", required=False, help="Path to events CSV file")
     parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--output_format", choices=OUTPUT_FORMATS, default="csv", help="csv (default) or parquet")
     
     args = parser.parse_args()
     
@@ -163,15 +160,15 @@ def main():
          print(f"Warning: Events file {args.events_file} not found.")
          
     # Process
-    results = process_hex_ecg(data, fs, events_df)
+    results = process_hex_ecg(data, fs)
     
     if not results.empty:
         # Hexoskin output usually doesn't need 'Participant' column IN the csv if 
         # it's a time series file. It's in the filename.
         
-        output_filename = f"processed_hex_ecg_{args.participant_id}_{args.visit_type.replace(' ', '_')}.csv"
-        output_file = os.path.join(args.output_dir, output_filename)
-        results.to_csv(output_file, index=False)
+        output_stem = f"processed_hex_ecg_{args.participant_id}_{args.visit_type.replace(' ', '_')}"
+        output_file = output_path(args.output_dir, output_stem, args.output_format)
+        save_signals_with_index(results, output_file, "ecg", fs, events_df=events_df)
         print(f"Processed signals saved to {output_file}")
 
 if __name__ == "__main__":
@@ -7,6 +7,10 @@ import os
 import glob
 import fnmatch
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import OUTPUT_FORMATS, output_path, save_signals_with_index
+
 def find_hex_rsp_data(hex_dir):
     """
     Scans for CSV files containing Hexoskin respiration columns.
@@ -84,6 +88,7 @@ def main():
     parser.add_argument("--hex_path", required=True)
     parser.add_argument("--events_file", required=False)
     parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--output_format", choices=OUTPUT_FORMATS, default="csv", help="csv (default) or parquet")
     
     args = parser.parse_args()
     
@@ -120,20 +125,11 @@ def main():
         
     final_df = pd.concat(all_signals, axis=1)
     
-    # Add Events
-    if events_df is not None and not events_df.empty:
-        final_df['Event_Label'] = None
-        for _, row in events_df.iterrows():
-            label = row['event_label']
-            start_time = row['start_time']
-            start_idx = int(start_time * fs)
-            if 0 <= start_idx < len(final_df):
-                 final_df.at[start_idx, 'Event_Label'] = label
-
     # Save
-    output_filename = f"processed_hex_rsp_{args.participant_id}_{args.visit_type.replace(' ', '_')}.csv"
-    output_file = os.path.join(args.output_dir, output_filename)
-    final_df.to_csv(output_file, index=False)
+    output_stem = f"processed_hex_rsp_{args.participant_id}_{args.visit_type.replace(' ', '_')}"
+    output_file = output_path(args.output_dir, output_stem, args.output_format)
+    # Event positions go in the index sidecar
+    save_signals_with_index(final_df, output_file, "rsp", fs, events_df=events_df)
     print(f"Processed signals saved to {output_file}")
 
 if __name__ == "__main__":
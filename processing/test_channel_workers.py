@@ -0,0 +1,46 @@
+import filecmp
+import os
+from types import SimpleNamespace
+
+import neurokit2 as nk
+import numpy as np
+import pandas as pd
+
+import process_acq_emg
+import process_acq_rsp
+from utils.channel_pool import join_channels
+
+FS = 250
+
+def _data():
+    # ACQ-like recording with two respiration and two EMG channels
+    channel = lambda name, data: SimpleNamespace(name=name, data=data)
+    return SimpleNamespace(samples_per_second=FS, channels=[
+        channel("RSP2208000207", nk.rsp_simulate(duration=60, sampling_rate=FS, random_state=1)),
+        channel("RSP Abdomen", nk.rsp_simulate(duration=60, sampling_rate=FS, random_state=2)),
+        channel("EMG - Zyg", nk.emg_simulate(duration=60, sampling_rate=FS, burst_number=3, random_state=1)),
+        channel("EMG - Cor", nk.emg_simulate(duration=60, sampling_rate=FS, burst_number=4, random_state=2)),
+    ])
+
+def test_parallel_channels_match_serial(tmp_path):
+    data = _data()
+    for module in (process_acq_rsp, process_acq_emg):
+        outputs = []
+        for workers in (1, 2):
+            output_dir = tmp_path / f"{module.__name__}_{workers}"
+            os.makedirs(output_dir)
+            outputs.append(module.process_file(data, None, "1", "TSST Visit", str(output_dir), workers=workers))
+        assert filecmp.cmp(outputs[0], outputs[1], shallow=False)
+        columns = pd.read_csv(outputs[0], nrows=0).columns
+        # Both channels made it into the file
+        assert any("_Channel_1_" in col for col in columns) and any("_Channel_2_" in col for col in columns)
+
+def test_join_channels():
+    a = pd.DataFrame({"x_1": np.arange(5.0), "y_1": np.zeros(5, dtype=np.int8)})
+    b = pd.DataFrame({"x_2": np.arange(5.0) * 2})
+    joined = join_channels([a, pd.DataFrame(), b])
+    pd.testing.assert_frame_equal(joined, pd.concat([a, b], axis=1))
+    # Different lengths: padded like pd.concat
+    short = pd.DataFrame({"x_3": np.arange(3.0)})
+    pd.testing.assert_frame_equal(join_channels([a, short]), pd.concat([a, short], axis=1))
+    assert join_channels([pd.DataFrame()]).empty
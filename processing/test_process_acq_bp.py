@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import process_acq_bp
+from process_acq_bp import find_troughs
+from utils.signal_io import beat_table, beats_from_values, peak_envelope
+
+FS = 100
+
+def _pressure(seconds=60, seed=0):
+    # Pulsatile pressure (~72 bpm) on a slowly drifting baseline, with some noise
+    t = np.arange(seconds * FS) / FS
+    rng = np.random.default_rng(seed)
+    return 80 + 40 * np.sin(2 * np.pi * 1.2 * t) ** 8 + 5 * np.sin(2 * np.pi * 0.05 * t) + rng.standard_normal(len(t))
+
+def _troughs_loop(signal, peaks):
+    # The per-beat loop find_troughs replaces
+    return np.array([peaks[i] + np.argmin(signal[peaks[i]:peaks[i + 1]]) for i in range(len(peaks) - 1)], dtype=np.int64)
+
+def test_find_troughs_matches_argmin_loop():
+    signal = _pressure()
+    peaks = np.sort(np.random.default_rng(1).choice(len(signal), 80, replace=False))
+    np.testing.assert_array_equal(find_troughs(signal, peaks), _troughs_loop(signal, peaks))
+    # Ties go to the first minimum; beats with NaN to their first NaN, as np.argmin
+    signal = np.round(signal / 10)
+    signal[1000:1005] = np.nan
+    np.testing.assert_array_equal(find_troughs(signal, peaks), _troughs_loop(signal, peaks))
+    assert len(find_troughs(signal, peaks[:1])) == 0 and len(find_troughs(signal, [])) == 0
+
+def test_envelope_matches_pandas_interpolation():
+    values = _pressure()
+    peaks = np.array([37, 120, 210, 333, 5000])
+    # The columns processed BP files store by default (interpolated, back-filled, written as float32)
+    series = pd.Series(np.nan, index=np.arange(len(values)))
+    series.iloc[peaks] = values[peaks]
+    expected = series.interpolate(method="linear").bfill().astype(np.float32)
+    np.testing.assert_allclose(peak_envelope(peaks, values[peaks], 0, len(values)), expected, rtol=1e-6)
+    np.testing.assert_allclose(peak_envelope(peaks, values[peaks], 100, 400), expected[100:400], rtol=1e-6)
+    assert np.isnan(peak_envelope([], [], 0, 10)).all()
+
+def test_beat_table():
+    signal = _pressure()
+    peaks = np.array([10, 95, 180, 262, 350])
+    troughs = find_troughs(signal, peaks)
+    beats = beat_table(signal, peaks, troughs, FS)
+    assert len(beats) == len(peaks)
+    np.testing.assert_array_equal(beats["Diastolic_Sample"][:-1].to_numpy(dtype=np.int64), troughs)
+    np.testing.assert_allclose(beats["BP_MAP"][:-1], [signal[a:b].mean() for a, b in zip(peaks[:-1], peaks[1:])])
+    np.testing.assert_allclose(beats["IBI_ms"][:-1], np.diff(peaks) * 1000 / FS)
+    np.testing.assert_allclose(beats["BP_PulsePressure"][:-1], signal[peaks[:-1]] - signal[troughs])
+    # The last beat has no following trough or interval
+    assert beats["Diastolic_Sample"].isna().iloc[-1] and beats[["BP_Diastolic", "BP_MAP", "IBI_ms"]].iloc[-1].isna().all()
+    # Same table from the values at the peaks and per-beat sums (chunked pass); the last beat's sum is ignored
+    sums = np.append(np.add.reduceat(signal[peaks[0]:peaks[-1]], peaks[:-1] - peaks[0]), 1e9)
+    pd.testing.assert_frame_equal(beats_from_values(peaks, signal[peaks], troughs, signal[troughs], sums, FS), beats)
+
+def test_process_bp_envelopes():
+    channel = SimpleNamespace(name="NIBP100D", data=_pressure())
+    signals, beats = process_acq_bp.process_bp(channel, FS)
+    without, beats_only = process_acq_bp.process_bp(channel, FS, envelopes=False)
+    assert "BP_Systolic_Interp" not in without.columns and "BP_Diastolic_Interp" not in without.columns
+    pd.testing.assert_frame_equal(signals[without.columns], without)
+    pd.testing.assert_frame_equal(beats, beats_only)
+    # The envelopes pass through the beats' systolic and diastolic pressures
+    np.testing.assert_allclose(signals["BP_Systolic_Interp"].to_numpy()[beats["Systolic_Sample"]], beats["BP_Systolic"], rtol=1e-6)
+    troughs = beats["Diastolic_Sample"].dropna().to_numpy(dtype=np.int64)
+    np.testing.assert_allclose(signals["BP_Diastolic_Interp"].to_numpy()[troughs], beats["BP_Diastolic"].dropna(), rtol=1e-6)
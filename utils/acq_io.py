@@ -0,0 +1,196 @@
+import json
+import os
+import numpy as np
+import bioread
+
+from utils.fingerprint import is_unchanged
+
+# Shared access layer for Acqknowledge (.acq) files.
+# bioread.read_file() decodes every channel's samples. Most scripts need one or
+# two channels (or, for events, only the markers and digital channels), so we
+# read the header first and decode only the channels that are actually used.
+#
+# Files can also be ingested once (processing/ingest_acq.py) into an archive
+# directory: one .npy per channel plus manifest.json (channel headers, event
+# markers and the source file's size/mtime/sha256). read_acq() opens a current
+# archive memory-mapped instead of decoding the .acq again.
+ARCHIVE_MANIFEST = "manifest.json"
+
+def read_acq_header(acq_file):
+    """
+    Reads channel headers and the event marker table without decoding any samples.
+    The returned Datafile has channels (name, units, samples_per_second, point_count)
+    and event_markers, but every channel's .data is None.
+    """
+    return bioread.read_headers(acq_file)
+
+def list_channels(header):
+    """
+    Summary of the channels in an ACQ header: one dict per channel.
+    """
+    return [
+        {
+            "index": i,
+            "name": c.name,
+            "units": c.units,
+            "samples_per_second": c.samples_per_second,
+            "point_count": c.point_count,
+        }
+        for i, c in enumerate(header.channels)
+    ]
+
+def channel_indexes(header, channels):
+    """
+    Resolves channels to their indexes in the file.
+    channels: channel objects from this header and/or channel names
+              (exact name first, then case-insensitive substring match).
+    """
+    indexes = []
+    for target in channels:
+        if isinstance(target, str):
+            matches = [i for i, c in enumerate(header.channels) if c.name == target]
+            if not matches:
+                matches = [i for i, c in enumerate(header.channels) if target.upper() in c.name.upper()]
+            if not matches:
+                raise KeyError(f"Channel '{target}' not found in ACQ file")
+            idx = matches[0]
+        else:
+            idx = next(i for i, c in enumerate(header.channels) if c is target)
+        if idx not in indexes:
+            indexes.append(idx)
+    return sorted(indexes)
+
+def read_acq_channels(acq_file, indexes):
+    """
+    Decodes only the given channel indexes. Other channels keep their
+    headers (so name-based channel finders still work) but have .data None.
+    """
+    return bioread.read_file(acq_file, channel_indexes=list(indexes))
+
+class ArchiveChannel:
+    """
+    A channel from an ACQ archive. Same attributes the scripts use on a
+    bioread Channel; .data is memory-mapped on first access.
+    """
+
+    def __init__(self, path, name, units, samples_per_second, point_count, frequency_divider=1, datafile=None):
+        self.path = path
+        self.name = name
+        self.units = units
+        self.samples_per_second = samples_per_second
+        self.point_count = point_count
+        self.frequency_divider = frequency_divider
+        self.datafile = datafile
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = np.load(self.path, mmap_mode="r")
+        return self._data
+
+    @property
+    def time_index(self):
+        return self.datafile.time_index[::self.frequency_divider][0:self.point_count]
+
+    def __repr__(self):
+        return f"Channel {self.name}: {self.point_count} samples, {self.samples_per_second} samples/sec (archive)"
+
+class ArchiveMarker:
+    def __init__(self, text, sample_index, channel_number=None, type_code=None, date_created_str=""):
+        self.text = text
+        self.sample_index = sample_index
+        self.channel_number = channel_number
+        self.type_code = type_code
+        self.date_created_str = date_created_str
+
+class ArchiveDatafile:
+    """
+    Stand-in for bioread's Datafile backed by an ACQ archive, so channel finders,
+    process_file() and events_from_data() work on it unchanged.
+    """
+
+    def __init__(self, archive_dir, manifest):
+        self.archive_dir = archive_dir
+        self.samples_per_second = manifest["samples_per_second"]
+        self.channels = [
+            ArchiveChannel(os.path.join(archive_dir, c["file"]), c["name"], c["units"],
+                           c["samples_per_second"], c["point_count"], c.get("frequency_divider", 1), self)
+            for c in manifest["channels"]
+        ]
+        self.event_markers = [ArchiveMarker(**m) for m in manifest["event_markers"]]
+        self._time_index = None
+
+    @property
+    def named_channels(self):
+        return {c.name: c for c in self.channels}
+
+    @property
+    def time_index(self):
+        # Same construction as bioread, so event times match a direct read exactly
+        if self._time_index is None:
+            total_samples = max(c.frequency_divider * c.point_count for c in self.channels)
+            total_seconds = total_samples / self.samples_per_second
+            self._time_index = np.linspace(0, total_seconds, total_samples)
+        return self._time_index
+
+def read_archive_manifest(archive_dir):
+    """
+    Returns the archive manifest, or None if there is no (complete) archive.
+    """
+    manifest_file = os.path.join(archive_dir, ARCHIVE_MANIFEST)
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file) as f:
+        return json.load(f)
+
+def archive_is_current(archive_dir, acq_file):
+    """
+    True if archive_dir holds an archive of acq_file as it is now
+    (same size and mtime, or same content hash).
+    """
+    manifest = read_archive_manifest(archive_dir)
+    if manifest is None:
+        return False
+    return is_unchanged(acq_file, manifest.get("source"))
+
+def open_acq_archive(archive_dir):
+    """
+    Opens an ACQ archive. No samples are read until a channel's .data is used.
+    """
+    manifest = read_archive_manifest(archive_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No ACQ archive in {archive_dir}")
+    return ArchiveDatafile(archive_dir, manifest)
+
+def read_acq(acq_file, *finders, archive_dir=None):
+    """
+    Reads an ACQ file, decoding only the channels returned by the finder functions
+    (e.g. find_ecg_channel, find_rsp_channels). Finders are run on the header
+    first; each may return a channel, a list of channels, or None.
+    If no finder matches anything, the header-only Datafile is returned.
+    If archive_dir holds a current archive of acq_file, it is opened instead
+    (memory-mapped, nothing is decoded).
+    """
+    if archive_dir is not None:
+        if archive_is_current(archive_dir, acq_file):
+            print(f"Using ACQ archive {archive_dir}")
+            return open_acq_archive(archive_dir)
+        print(f"No current ACQ archive in {archive_dir}, reading {acq_file} directly.")
+
+    header = read_acq_header(acq_file)
+
+    wanted = []
+    for finder in finders:
+        found = finder(header)
+        if found is None:
+            continue
+        if isinstance(found, (list, tuple)):
+            wanted.extend(found)
+        else:
+            wanted.append(found)
+
+    if not wanted:
+        return header
+
+    return read_acq_channels(acq_file, channel_indexes(header, wanted))
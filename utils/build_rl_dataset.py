@@ -0,0 +1,152 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+import pandas as pd
+
+# Make the repository root importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features_extraction.windowing import window_name
+
+# Modalities in join order; the first one present in --modalities is the base
+# (its windows are the dataset rows and its Condition labels them).
+MODALITIES = ["rsp", "ecg", "eda", "bp"]
+PARTITION_COLS = ["Participant_ID", "Visit"]
+# Label columns of the windowed feature files. They are strings even when a
+# visit has none (e.g. RSP_Phase_Dominant without an RSP_Phase column), which
+# pandas would read as float64.
+TEXT_COLUMNS = {"Condition", "RSP_Slope_Dominant", "RSP_Phase_Dominant"}
+
+def find_visits(source_dir, modalities, window_tag):
+    """
+    Walks <source_dir>/<PID>/<Visit>/ (the Layer 3 output layout) and returns
+    [(pid, visit, {modality: windowed feature file})] for every visit with at
+    least one of the modalities' windowed files for window_tag.
+    """
+    visits = []
+    for visit_dir in sorted(p for p in Path(source_dir).glob("*/*") if p.is_dir()):
+        pid, visit = visit_dir.parent.name, visit_dir.name
+        files = {}
+        for mod in modalities:
+            path = visit_dir / f"features_{mod}_windowed_{window_tag}_{pid}_{visit.replace(' ', '_')}.csv"
+            if path.exists():
+                files[mod] = path
+        if files:
+            visits.append((pid, visit, files))
+    return visits
+
+def dataset_schema(visits, modalities):
+    """
+    One pyarrow schema for every partition: the columns of each modality's
+    files in join order (Condition from the base only), strings for
+    TEXT_COLUMNS and any other text column, float64 for the rest. Visits missing a modality get its
+    columns as nulls, so all partitions read back as one table.
+    """
+    import pyarrow as pa
+
+    fields = {"Time": pa.float64()}
+    for mod in modalities:
+        for _, _, files in visits:
+            if mod in files:
+                # The header and a few rows are enough to tell text from numbers
+                sample = pd.read_csv(files[mod], nrows=1000)
+                break
+        else:
+            continue
+        for col, dtype in sample.dtypes.items():
+            if col in fields or (col == "Condition" and mod != modalities[0]):
+                continue
+            fields[col] = pa.string() if col in TEXT_COLUMNS or dtype == object else pa.float64()
+    fields.setdefault("Condition", pa.string())
+    return pa.schema([pa.field(name, dtype) for name, dtype in fields.items()])
+
+def merge_visit(files, modalities, tolerance):
+    """
+    Joins one visit's windowed feature files on Time. Rows are the base
+    modality's windows; every other modality contributes the window nearest
+    in time within tolerance seconds (NaN if there is none).
+    """
+    base_mod = next(mod for mod in modalities if mod in files)
+    merged = pd.read_csv(files[base_mod]).sort_values("Time", kind="stable").reset_index(drop=True)
+    for mod in modalities:
+        if mod == base_mod or mod not in files:
+            continue
+        other = pd.read_csv(files[mod]).drop(columns=["Condition"], errors="ignore")
+        # Only Time is shared: the other columns are already modality-prefixed
+        other = other[["Time"] + [c for c in other.columns if c not in merged.columns]]
+        merged = pd.merge_asof(merged, other.sort_values("Time", kind="stable"), on="Time",
+                               direction="nearest", tolerance=tolerance)
+    return merged
+
+def build_dataset(source_dir, dest_dir, window_size=1.0, hop_size=None, modalities=MODALITIES, tolerance=None):
+    """
+    Writes the merged multimodal dataset to dest_dir as Parquet, partitioned by
+    Participant_ID and Visit (dest_dir/Participant_ID=<pid>/Visit=<visit>/).
+    Visits are read, joined and written one at a time, so memory use is that
+    of a single visit. Re-running replaces the partitions of the visits found.
+    A visit that cannot be merged or converted is reported and skipped.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    window_tag = window_name(window_size, hop_size)
+    if tolerance is None:
+        # Half a hop: windows of the same start time in every modality, never the neighbours
+        tolerance = (hop_size or window_size) / 2
+
+    visits = find_visits(source_dir, modalities, window_tag)
+    if not visits:
+        print(f"No windowed feature files ({window_tag}) found in {source_dir}.")
+        sys.exit(1)
+    print(f"Found {len(visits)} visits with {window_tag} windowed features.")
+
+    schema = dataset_schema(visits, modalities)
+    columns = schema.names
+    string_cols = [f.name for f in schema if f.type == pa.string()]
+    os.makedirs(dest_dir, exist_ok=True)
+
+    total_rows = 0
+    skipped = []
+    for pid, visit, files in visits:
+        missing = [mod for mod in modalities if mod not in files]
+        print(f"{pid} / {visit}: {', '.join(files)}" + (f" (missing {', '.join(missing)})" if missing else ""))
+        try:
+            merged = merge_visit(files, modalities, tolerance)
+
+            merged = merged.reindex(columns=columns)
+            for col in string_cols:
+                merged[col] = merged[col].astype(object).where(merged[col].notna(), None)
+            table = pa.Table.from_pandas(merged, schema=schema, preserve_index=False)
+            table = table.append_column("Participant_ID", pa.array([pid] * len(table), pa.string()))
+            table = table.append_column("Visit", pa.array([visit] * len(table), pa.string()))
+
+            pq.write_to_dataset(table, dest_dir, partition_cols=PARTITION_COLS,
+                                basename_template="part-{i}.parquet", existing_data_behavior="delete_matching")
+        except Exception as e:
+            print(f"Error merging {pid} / {visit}: {e}")
+            skipped.append(f"{pid} / {visit}")
+            continue
+        total_rows += len(table)
+
+    print(f"\nWrote {total_rows} rows from {len(visits) - len(skipped)} visits to {dest_dir}")
+    if skipped:
+        print(f"Skipped {len(skipped)} visits: {', '.join(skipped)}")
+    return dest_dir
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge every visit's windowed ECG/EDA/RSP/BP features on Time into one partitioned Parquet dataset.")
+
+    parser.add_argument("source_dir", help="Feature output root, laid out as <PID>/<Visit>/ (e.g., Processed_Data)")
+    parser.add_argument("dest_dir", help="Destination directory of the Parquet dataset")
+    parser.add_argument("--window_size", type=float, default=1.0, help="Window size of the feature files to merge, in seconds")
+    parser.add_argument("--hop_size", type=float, default=None, help="Hop of the feature files to merge, in seconds (default: none, back-to-back windows)")
+    parser.add_argument("--modalities", nargs="+", choices=MODALITIES, default=MODALITIES,
+                        help="Modalities to join; the first one present in a visit gives the rows (default: rsp ecg eda bp)")
+    parser.add_argument("--tolerance", type=float, default=None, help="Max Time difference for a join match, in seconds (default: half the hop)")
+
+    args = parser.parse_args()
+
+    build_dataset(args.source_dir, args.dest_dir, args.window_size, args.hop_size, args.modalities, args.tolerance)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+from utils.signal_io import apply_schema
+
+# RSP and EMG recordings can have several channels, each processed on its own.
+# With workers > 1 the channels go to a process pool, one NeuroKit call per
+# process. Workers get bare sample arrays (not channel objects) and send back
+# their columns already downcast to the output schema, which the parent puts
+# side by side without copying them again.
+
+def _process_channel(func, modality, args):
+    return apply_schema(func(*args), modality)
+
+def process_channels(func, tasks, modality, workers=1):
+    """
+    Runs func(*task) for every task (one per channel); func returns the
+    channel's signals DataFrame, empty if it failed. With workers > 1 the
+    tasks run in a pool of that many processes. Returns the DataFrames in
+    task order, with the modality's OUTPUT_SCHEMAS dtypes.
+    """
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = [pool.submit(_process_channel, func, modality, task) for task in tasks]
+            return [future.result() for future in futures]
+    return [_process_channel(func, modality, task) for task in tasks]
+
+def join_channels(frames):
+    """
+    Puts per-channel signal DataFrames side by side, like pd.concat(axis=1)
+    but referencing each column's array instead of copying it. Empty frames
+    are skipped. Channels of different lengths fall back to pd.concat
+    (shorter ones padded with NaN).
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len({len(frame) for frame in frames}) > 1:
+        return pd.concat(frames, axis=1)
+    columns = {col: frame[col].to_numpy() for frame in frames for col in frame.columns}
+    return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,39 @@
+import numpy as np
+from scipy import signal
+
+# EDA, respiration and the BP pressure envelope carry nothing above a few Hz,
+# but are recorded at the ACQ rate (typically 1-2 kHz). The processors can
+# decimate them to a target rate before NeuroKit runs (--target_rate), which
+# cuts processing time and the size of the processed files by the same factor.
+# The factor divides the native rate exactly, so the effective rate (written to
+# the file metadata and index sidecar) is a whole number of Hz at or above the
+# target: window lengths in samples (int(window_size * fs)) stay exact and
+# window starts don't drift against event boundaries.
+
+def decimation_factor(sampling_rate, target_rate=None):
+    """
+    Integer factor taking sampling_rate down to about target_rate: the
+    largest divisor of the native rate that keeps the rate >= target_rate
+    (e.g. 1000 Hz with target 30 -> 25, i.e. 40 Hz). 1 = no decimation,
+    also for a native rate that is not a whole number of Hz.
+    """
+    if not target_rate or target_rate >= sampling_rate or sampling_rate != int(sampling_rate):
+        return 1
+    native = int(sampling_rate)
+    return max(q for q in range(1, int(native // target_rate) + 1) if native % q == 0)
+
+def decimate(values, sampling_rate, target_rate=None):
+    """
+    Anti-aliased decimation of a 1-D signal to about target_rate Hz
+    (a whole-number rate at or above it, see decimation_factor).
+    A polyphase FIR low-pass at the new Nyquist frequency is applied before
+    keeping every q-th sample; the ends are padded with a fitted line so the
+    DC level of EDA/BP doesn't ring at the edges.
+    Returns (values, effective sampling rate); values are returned as they
+    are if no decimation is needed.
+    """
+    q = decimation_factor(sampling_rate, target_rate)
+    if q == 1:
+        return values, sampling_rate
+    decimated = signal.resample_poly(np.asarray(values, dtype=float), 1, q, padtype="line")
+    return decimated, sampling_rate / q
@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+
+# Make the repository root importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import is_parquet, read_signal_metadata
+
+def export_csv(parquet_file, csv_file=None, batch_size=500_000):
+    """
+    Exports a processed .parquet signal file to CSV.
+    Writes in batches so the whole recording never has to be in memory.
+    """
+    import pyarrow.parquet as pq
+
+    if not is_parquet(parquet_file):
+        print(f"Error: '{parquet_file}' is not a .parquet file.")
+        sys.exit(1)
+
+    if csv_file is None:
+        csv_file = parquet_file[:-len(".parquet")] + ".csv"
+
+    metadata = read_signal_metadata(parquet_file)
+    if metadata:
+        print(f"Metadata: {metadata}")
+
+    pf = pq.ParquetFile(parquet_file)
+    print(f"Exporting {pf.metadata.num_rows} rows -> {csv_file}")
+
+    header = True
+    with open(csv_file, "w", newline="") as f:
+        for batch in pf.iter_batches(batch_size=batch_size):
+            batch.to_pandas().to_csv(f, index=False, header=header)
+            header = False
+
+    print(f"CSV saved to {csv_file}")
+    return csv_file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a processed .parquet signal file to CSV.")
+    parser.add_argument("file", help="Path to the .parquet file")
+    parser.add_argument("-o", "--output", default=None, help="Output CSV path (default: same name with .csv)")
+
+    args = parser.parse_args()
+
+    export_csv(args.file, args.output)
@@ -0,0 +1,212 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+from urllib.parse import unquote
+import pandas as pd
+
+# Feature store: every features_<modality>_<kind>_* output as Parquet, one
+# table per kind ('event_based', 'windowed_1_0s', 'windowed_30_0s_hop_1_0s', ...)
+# partitioned by participant, visit and modality:
+#   <store>/<table>/Participant_ID=<pid>/Visit=<visit>/Modality=<modality>/part-0.parquet
+# Queries prune partitions by directory name and read only the columns asked
+# for, so selecting e.g. the Speech Period rows of TSST visits never opens
+# the other visits' files.
+PARTITION_COLS = ["Participant_ID", "Visit", "Modality"]
+# Row keys read alongside any column selection
+KEY_COLS = ["Time", "Start_Time", "Condition"]
+MODALITIES = ["ecg", "eda", "rsp", "bp"]
+
+def write_features(features_df, store_dir, table, participant_id, visit, modality):
+    """
+    Writes one features DataFrame to its partition of the store, replacing
+    whatever the partition held. Numbers are stored as float64 and labels as
+    strings, whatever the writer's dtypes, so partitions written by the
+    feature scripts and by ingest_features() share one schema.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = features_df.copy()
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            df[col] = df[col].astype("float64")
+        else:
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    df["Participant_ID"] = str(participant_id)
+    df["Visit"] = visit
+    df["Modality"] = modality
+
+    pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), os.path.join(store_dir, table),
+                        partition_cols=PARTITION_COLS, basename_template="part-{i}.parquet",
+                        existing_data_behavior="delete_matching")
+
+def _partition_value(dir_name, key):
+    prefix = f"{key}="
+    return unquote(dir_name[len(prefix):]) if dir_name.startswith(prefix) else None
+
+def _as_set(values):
+    if values is None:
+        return None
+    if isinstance(values, (str, int)):
+        values = [values]
+    return {str(v) for v in values}
+
+def _and(expr, other):
+    return other if expr is None else expr & other
+
+def list_partitions(store_dir, table, participants=None, visits=None, modalities=None):
+    """
+    [(pid, visit, modality, directory)] of the table's partitions matching the
+    filters (None = any). Only directory names are looked at.
+    """
+    participants, visits, modalities = _as_set(participants), _as_set(visits), _as_set(modalities)
+    table_dir = Path(store_dir) / table
+    if not table_dir.is_dir():
+        return []
+
+    partitions = []
+    for p_dir in sorted(table_dir.iterdir()):
+        pid = _partition_value(p_dir.name, "Participant_ID")
+        if pid is None or (participants is not None and pid not in participants):
+            continue
+        for v_dir in sorted(p_dir.iterdir()):
+            visit = _partition_value(v_dir.name, "Visit")
+            if visit is None or (visits is not None and visit not in visits):
+                continue
+            for m_dir in sorted(v_dir.iterdir()):
+                modality = _partition_value(m_dir.name, "Modality")
+                if modality is None or (modalities is not None and modality not in modalities):
+                    continue
+                partitions.append((pid, visit, modality, m_dir))
+    return partitions
+
+def list_tables(store_dir):
+    return sorted(p.name for p in Path(store_dir).iterdir() if p.is_dir()) if os.path.isdir(store_dir) else []
+
+def query_features(store_dir, table="windowed_1_0s", participants=None, visits=None, modalities=None,
+                   conditions=None, time_range=None, columns=None):
+    """
+    Reads rows of one store table as a DataFrame with Participant_ID, Visit
+    and Modality columns. The result is long form: one row per modality and
+    window/event, so features of different modalities are on separate rows
+    (pivot or merge on Participant_ID, Visit, Time/Condition to line them up).
+    participants, visits, modalities: partition filters (a value or a list;
+        None = all). Non-matching partitions are never opened.
+    conditions: keep rows whose Condition is one of these.
+    time_range: (start, end) in seconds, inclusive, on Time (Start_Time for
+        event-based tables); either end may be None.
+    columns: feature columns to read (None = all). Partitions of a modality
+        that has none of them are skipped, so e.g. ECG columns only return ECG
+        rows; a modality with some of them has NaN for the others.
+    Row and column filters are pushed down to the Parquet reader, which skips
+    row groups and columns that cannot match.
+    """
+    import pyarrow.dataset as ds
+
+    partitions = list_partitions(store_dir, table, participants, visits, modalities)
+    conditions = _as_set(conditions)
+    wanted = None if columns is None else set(columns) - set(KEY_COLS)
+
+    frames = []
+    for pid, visit, modality, part_dir in partitions:
+        dataset = ds.dataset(str(part_dir), format="parquet")
+        names = dataset.schema.names
+        if wanted and wanted.isdisjoint(names):
+            continue
+
+        filter_expr = None
+        if conditions is not None:
+            if "Condition" not in names:
+                continue
+            filter_expr = ds.field("Condition").isin(sorted(conditions))
+        if time_range is not None:
+            time_col = "Time" if "Time" in names else "Start_Time"
+            if time_col not in names:
+                continue
+            start, end = time_range
+            if start is not None:
+                filter_expr = _and(filter_expr, ds.field(time_col) >= start)
+            if end is not None:
+                filter_expr = _and(filter_expr, ds.field(time_col) <= end)
+
+        read_cols = names if columns is None else [c for c in names if c in columns or c in KEY_COLS]
+        df = dataset.to_table(columns=read_cols, filter=filter_expr).to_pandas()
+        if df.empty:
+            continue
+        df.insert(0, "Modality", modality)
+        df.insert(0, "Visit", visit)
+        df.insert(0, "Participant_ID", pid)
+        frames.append(df)
+
+    if not frames:
+        return pd.DataFrame(columns=PARTITION_COLS + (list(columns) if columns is not None else []))
+    result = pd.concat(frames, ignore_index=True)
+    if columns is not None:
+        keep = PARTITION_COLS + [c for c in KEY_COLS if c in result.columns]
+        result = result.reindex(columns=keep + [c for c in columns if c not in keep])
+    return result
+
+def ingest_features(source_dir, store_dir):
+    """
+    Adds existing features_<modality>_<table>_* CSVs under <source_dir>/<PID>/<Visit>/
+    (the Layer 3 output layout) to the store. Returns the number of files ingested.
+    """
+    count = 0
+    for visit_dir in sorted(p for p in Path(source_dir).glob("*/*") if p.is_dir()):
+        pid, visit = visit_dir.parent.name, visit_dir.name
+        suffix = f"_{pid}_{visit.replace(' ', '_')}.csv"
+        for path in sorted(visit_dir.glob(f"features_*{suffix}")):
+            # features_<modality>_<table>_<pid>_<visit>.csv, as written by features_acq_*.py
+            modality, _, table = path.name[len("features_"):-len(suffix)].partition("_")
+            if modality not in MODALITIES or not (table == "event_based" or table.startswith("windowed_")):
+                continue
+            try:
+                write_features(pd.read_csv(path), store_dir, table, pid, visit, modality)
+            except Exception as e:
+                print(f"Error ingesting {path}: {e}")
+                continue
+            print(f"{path} -> {table}")
+            count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature store: ingest feature CSVs, or query the store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = subparsers.add_parser("ingest", help="Add existing feature CSVs (<source_dir>/<PID>/<Visit>/features_*.csv) to the store")
+    p_ingest.add_argument("source_dir", help="Feature output root (e.g., Processed_Data)")
+    p_ingest.add_argument("store_dir", help="Feature store directory")
+
+    p_query = subparsers.add_parser("query", help="Select rows/columns of a store table")
+    p_query.add_argument("store_dir", help="Feature store directory")
+    p_query.add_argument("--table", default="windowed_1_0s", help="Table, e.g. 'windowed_1_0s' or 'event_based' (default: windowed_1_0s)")
+    p_query.add_argument("--participants", nargs="+", default=None)
+    p_query.add_argument("--visits", nargs="+", default=None)
+    p_query.add_argument("--modalities", nargs="+", choices=MODALITIES, default=None)
+    p_query.add_argument("--conditions", nargs="+", default=None)
+    p_query.add_argument("--time_range", nargs=2, type=float, default=None, metavar=("START", "END"))
+    p_query.add_argument("--columns", nargs="+", default=None,
+                         help="Feature columns to read; modalities with none of them are skipped (default: all)")
+    p_query.add_argument("-o", "--output", default=None, help="Write the result to this CSV instead of printing a summary")
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        count = ingest_features(args.source_dir, args.store_dir)
+        print(f"\nIngested {count} feature files into {args.store_dir}")
+        return
+
+    if args.table not in list_tables(args.store_dir):
+        print(f"Error: no table '{args.table}' in {args.store_dir} (tables: {', '.join(list_tables(args.store_dir)) or 'none'})")
+        sys.exit(1)
+    df = query_features(args.store_dir, args.table, args.participants, args.visits, args.modalities,
+                        args.conditions, args.time_range, args.columns)
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"{len(df)} rows saved to {args.output}")
+    else:
+        print(df)
+
+if __name__ == "__main__":
+    main()
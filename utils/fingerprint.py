@@ -0,0 +1,41 @@
+import hashlib
+import os
+
+def file_sha256(path, chunk_size=8 * 1024 * 1024):
+    """
+    SHA-256 of a file, read in chunks so large .acq files don't need to fit in memory.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_fingerprint(path, previous=None):
+    """
+    Identity of a file as {'size', 'mtime', 'sha256'}.
+    If `previous` (an earlier fingerprint) has the same size and mtime, its hash
+    is reused instead of re-reading the file.
+    """
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime}
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+        fingerprint["sha256"] = previous.get("sha256")
+    else:
+        fingerprint["sha256"] = file_sha256(path)
+    return fingerprint
+
+def is_unchanged(path, previous):
+    """
+    True if the file still matches an earlier fingerprint.
+    Size + mtime match is trusted; otherwise the content hash decides
+    (so a copied or touched but identical file still counts as unchanged).
+    """
+    if not previous or not os.path.exists(path):
+        return False
+    stat = os.stat(path)
+    if stat.st_size != previous.get("size"):
+        return False
+    if stat.st_mtime == previous.get("mtime"):
+        return True
+    return file_sha256(path) == previous.get("sha256")
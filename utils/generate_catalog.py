@@ -8,7 +8,11 @@ DATA_ROOT = r"N:\Aditya\Participant Data"
 # Save to repository root (one level up from utils)
 OUTPUT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "processing_catalog.csv")
 
-def scan_participants_modality_based(root_dir):
+def scan_participants_modality_based(root_dir, acq_mode="per_modality"):
+    """
+    acq_mode: 'per_modality' -> one row per Acq modality (ecg, eda, rsp, bp, emg)
+              'single_pass'  -> one 'all' row per Acq file (process_acq_all.py reads it once)
+    """
     catalog_data = []
     
     # Get all participant directories (assuming numeric IDs)
@@ -32,6 +36,8 @@ def scan_participants_modality_based(root_dir):
                         acq_file = acq_files[0]
                         # Add rows for each Acq modality
                         modalities = ['ecg', 'eda', 'rsp', 'bp', 'emg']
+                        if acq_mode == "single_pass":
+                            modalities = ['all']
                         for mod in modalities:
                             catalog_data.append({
                                 "participant_id": pid,
@@ -85,7 +91,13 @@ def scan_participants_modality_based(root_dir):
     return pd.DataFrame(catalog_data)
 
 if __name__ == "__main__":
-    df = scan_participants_modality_based(DATA_ROOT)
+    parser = argparse.ArgumentParser(description="Generate processing_catalog.csv")
+    parser.add_argument("--data_root", default=DATA_ROOT)
+    parser.add_argument("--acq_mode", choices=["per_modality", "single_pass"], default="per_modality",
+                        help="single_pass: one 'all' row per ACQ file, decoded once by process_acq_all.py")
+    args = parser.parse_args()
+
+    df = scan_participants_modality_based(args.data_root, args.acq_mode)
     
     if not df.empty:
         df.to_csv(OUTPUT_FILE, index=False)
@@ -1,15 +1,22 @@
-import bioread
+import os
 import sys
 
+# Make the repository root importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.acq_io import read_acq_header, list_channels
+
 # File from previous steps
 FILE = r"N:\Aditya\Participant Data\126641\TSST Visit\Acqknowledge\TSST_Acqknowledge_126641_11_4_2025.acq"
+if len(sys.argv) > 1:
+    FILE = sys.argv[1]
 
 try:
-    data = bioread.read_file(FILE)
+    # Header + marker table only: no channel samples are decoded
+    data = read_acq_header(FILE)
     print("Channels found:")
-    for c in data.channels:
-        print(f" - {c.name} (Units: {c.units}, FS: {c.samples_per_second})")
-        if any(x in c.name.upper() for x in ["BP", "BLOOD", "PRES", "SYS", "DIA", "NIBP"]):
+    for c in list_channels(data):
+        print(f" - [{c['index']}] {c['name']} (Units: {c['units']}, FS: {c['samples_per_second']}, Samples: {c['point_count']})")
+        if any(x in c['name'].upper() for x in ["BP", "BLOOD", "PRES", "SYS", "DIA", "NIBP"]):
             print(f"   *** Potential BP Channel ***")
             
     print("\nNamed Channels (keys):")
@@ -0,0 +1,299 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+# Make the repository root importable when run as a script
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from utils.fingerprint import file_fingerprint, file_sha256, is_unchanged
+
+# Pipeline manifest: for every output of a pipeline step (one catalog row in
+# one layer), the fingerprints of its inputs, the hashes of the code that
+# produced it and its parameters. A step whose inputs, code, parameters and
+# outputs all still match its entry is up to date and is skipped by the
+# workflows. Entries live in <OUTPUT_ROOT>/<PID>/<Visit>/.manifest/<step>.json,
+# one file per step, so concurrent array tasks never write the same file.
+MANIFEST_DIRNAME = ".manifest"
+LAYERS = ["events", "processing", "features"]
+FEATURE_MODALITIES = ["ecg", "eda", "rsp", "bp"]
+PROCESSED_MODALITIES = ["ecg", "eda", "rsp", "bp", "emg"]
+
+# Local imports: 'from utils.x import ...', 'import sibling', 'from sibling import ...'
+IMPORT_RE = re.compile(r"^\s*(?:from\s+([\w\.]+)\s+import|import\s+([\w\.]+))", re.MULTILINE)
+
+def code_files(script):
+    """
+    The script plus every repository module it imports, directly or not
+    (utils.* and sibling scripts), sorted.
+    """
+    seen = set()
+    pending = [os.path.abspath(script)]
+    while pending:
+        path = pending.pop()
+        if path in seen or not os.path.exists(path):
+            continue
+        seen.add(path)
+        with open(path) as f:
+            source = f.read()
+        for match in IMPORT_RE.finditer(source):
+            module = match.group(1) or match.group(2)
+            candidates = [os.path.join(REPO_ROOT, *module.split(".")) + ".py",
+                          os.path.join(os.path.dirname(path), *module.split(".")) + ".py"]
+            pending.extend(c for c in candidates if os.path.exists(c))
+    return sorted(seen)
+
+def _visit_dir(output_root, participant_id, visit_type):
+    return os.path.join(output_root, str(participant_id), visit_type)
+
+def _stem(participant_id, visit_type):
+    return f"{participant_id}_{visit_type.replace(' ', '_')}"
+
+def _input_files(path):
+    # Hexoskin rows may point at a directory of recordings
+    if os.path.isdir(path):
+        return sorted(p for p in glob.glob(os.path.join(path, "**", "*"), recursive=True) if os.path.isfile(p))
+    return [path]
+
+def layer_params(layer, device, modality):
+    """
+    Parameters of a step that change its outputs, from the cluster_config.sh
+    variables (same defaults as the workflows).
+    """
+    env = os.environ
+    if layer == "processing":
+        params = {"output_format": env.get("OUTPUT_FORMAT") or "csv"}
+        if device == "acq" and modality in ("ecg", "eda", "bp", "all"):
+            params["sparse_peaks"] = env.get("SPARSE_PEAKS") == "true"
+        # Decimation target rates, only recorded when set (native rate otherwise)
+        if device == "acq":
+            for mod in ("eda", "rsp", "bp"):
+                rate = env.get(f"{mod.upper()}_TARGET_RATE")
+                if rate and modality in (mod, "all"):
+                    params[f"{mod}_target_rate"] = rate
+        if device == "acq" and modality in ("bp", "all") and env.get("BP_BEAT_TABLE") == "true":
+            params["bp_beat_table"] = True
+        return params
+    if layer == "features":
+        params = {
+            "window_size": (env.get("FEATURE_WINDOW_SIZE") or "1.0").split(),
+            "hop_size": env.get("FEATURE_HOP_SIZE") or None,
+            "feature_store": env.get("FEATURE_STORE") or None,
+        }
+        # Chunked reads round slightly differently; only recorded when used
+        if env.get("FEATURE_MAX_MEMORY"):
+            params["max_memory"] = env["FEATURE_MAX_MEMORY"]
+        return params
+    return {}
+
+def step_spec(layer, participant_id, visit_type, device, modality, file_path, output_root):
+    """
+    What a catalog row runs in a layer: {'step', 'script', 'inputs' (files),
+    'outputs' (globs in the visit directory), 'params'}, or None if the row
+    has nothing to do in that layer (mirrors run_events/processing/features.sh).
+    """
+    visit_dir = _visit_dir(output_root, participant_id, visit_type)
+    stem = _stem(participant_id, visit_type)
+    events_file = os.path.join(visit_dir, "events.csv")
+
+    if layer == "events":
+        # Events come from the 'ecg' row of an ACQ file ('all' rows extract them in Layer 2)
+        if device != "acq" or modality != "ecg":
+            return None
+        script = os.path.join(REPO_ROOT, "processing", "extract_events.py")
+        inputs, outputs = [file_path], ["events.csv"]
+    elif layer == "processing":
+        if device not in ("acq", "hexoskin"):
+            return None
+        script = os.path.join(REPO_ROOT, "processing", f"process_{device}_{modality}.py")
+        inputs = _input_files(file_path)
+        if modality == "all":
+            outputs = ["events.csv"] + [f"processed_{m}_{stem}*" for m in PROCESSED_MODALITIES]
+        else:
+            inputs.append(events_file)
+            prefix = "processed_hex" if device == "hexoskin" else "processed"
+            outputs = [f"{prefix}_{modality}_{stem}*"]
+    elif layer == "features":
+        if device != "acq" or modality not in FEATURE_MODALITIES + ["all"]:
+            return None
+        script = os.path.join(REPO_ROOT, "features_extraction", f"features_acq_{modality}.py")
+        modalities = FEATURE_MODALITIES if modality == "all" else [modality]
+        inputs = [events_file]
+        for m in modalities:
+            inputs.extend(sorted(glob.glob(os.path.join(visit_dir, f"processed_{m}_{stem}*"))))
+        outputs = [f"features_{m}_*_{stem}.csv" for m in modalities]
+    else:
+        raise ValueError(f"Unknown layer: {layer}")
+
+    return {
+        "step": f"{layer}_{device}_{modality}",
+        "script": script,
+        "inputs": inputs,
+        "outputs": outputs,
+        "params": layer_params(layer, device, modality),
+    }
+
+def entry_path(output_root, participant_id, visit_type, step):
+    return os.path.join(_visit_dir(output_root, participant_id, visit_type), MANIFEST_DIRNAME, f"{step}.json")
+
+def read_entry(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def code_hashes(script):
+    return {os.path.relpath(p, REPO_ROOT): file_sha256(p) for p in code_files(script)}
+
+def _output_files(visit_dir, patterns):
+    return sorted({p for pattern in patterns for p in glob.glob(os.path.join(visit_dir, pattern))})
+
+def stale_reason(spec, entry):
+    """
+    Why a step must (re)run, or None if its outputs are up to date.
+    """
+    if entry is None:
+        return "no manifest entry"
+    if entry.get("params") != spec["params"]:
+        return "parameters changed"
+    if entry.get("code") != code_hashes(spec["script"]):
+        return "code changed"
+    recorded_inputs = entry.get("inputs", {})
+    if sorted(recorded_inputs) != sorted(spec["inputs"]):
+        return "input files changed"
+    for path in spec["inputs"]:
+        if not is_unchanged(path, recorded_inputs[path]):
+            return f"input changed: {os.path.basename(path)}"
+    recorded_outputs = entry.get("outputs", {})
+    if not recorded_outputs:
+        return "no outputs recorded"
+    for path, fingerprint in recorded_outputs.items():
+        if not is_unchanged(path, fingerprint):
+            return f"output missing or modified: {os.path.basename(path)}"
+    return None
+
+def record_step(spec, output_root, participant_id, visit_type):
+    """
+    Writes the manifest entry of a step that just completed successfully.
+    """
+    visit_dir = _visit_dir(output_root, participant_id, visit_type)
+    path = entry_path(output_root, participant_id, visit_type, spec["step"])
+    previous = read_entry(path) or {}
+
+    def fingerprints(paths, recorded):
+        # Hashes of files whose size and mtime did not change are reused
+        return {p: file_fingerprint(p, recorded.get(p)) for p in paths if os.path.exists(p)}
+
+    entry = {
+        "step": spec["step"],
+        "participant_id": str(participant_id),
+        "visit_type": visit_type,
+        "completed_at": datetime.now().isoformat(timespec="seconds"),
+        "params": spec["params"],
+        "code": code_hashes(spec["script"]),
+        "inputs": fingerprints(spec["inputs"], previous.get("inputs", {})),
+        "outputs": fingerprints(_output_files(visit_dir, spec["outputs"]), previous.get("outputs", {})),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+def read_catalog(catalog_file):
+    with open(catalog_file, newline="") as f:
+        return list(csv.DictReader(f))
+
+def plan(catalog_file, output_root):
+    """
+    Dry run: for every catalog row and layer, whether the step would run and
+    why. A step also runs when a step it depends on in the same visit runs
+    (events -> processing -> features).
+    Returns [(layer, row_number, participant_id, visit_type, step, reason or None)].
+    """
+    rows = read_catalog(catalog_file)
+    plan_rows = []
+    # (participant_id, visit_type) -> steps that will run in earlier layers
+    running = {}
+    for layer in LAYERS:
+        for row_number, row in enumerate(rows, start=1):
+            pid, visit, device, modality = row["participant_id"], row["visit_type"], row["device"], row["modality"]
+            spec = step_spec(layer, pid, visit, device, modality, row["file_path"], output_root)
+            if spec is None:
+                continue
+            visit_steps = running.setdefault((pid, visit), set())
+            upstream = []
+            if layer == "processing" and modality != "all":
+                upstream = ["events_acq_ecg"]
+            elif layer == "features":
+                upstream = [f"processing_acq_{m}" for m in (FEATURE_MODALITIES if modality == "all" else [modality])]
+                upstream += ["processing_acq_all", "events_acq_ecg"]
+            reason = next((f"{step} reruns" for step in upstream if step in visit_steps), None)
+            if reason is None:
+                entry = read_entry(entry_path(output_root, pid, visit, spec["step"]))
+                reason = stale_reason(spec, entry)
+            if reason is not None:
+                visit_steps.add(spec["step"])
+            plan_rows.append((layer, row_number, pid, visit, spec["step"], reason))
+    return plan_rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline manifest: skip pipeline steps whose outputs are up to date.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in [("check", "Exit 0 if the step of a catalog row is up to date, 1 if it must run"),
+                               ("record", "Record a successfully completed step")]:
+        p = subparsers.add_parser(command, help=help_text)
+        p.add_argument("--layer", required=True, choices=LAYERS)
+        p.add_argument("--participant_id", required=True)
+        p.add_argument("--visit_type", required=True)
+        p.add_argument("--device", required=True)
+        p.add_argument("--modality", required=True)
+        p.add_argument("--file_path", required=True)
+        p.add_argument("--output_root", required=True)
+
+    p_plan = subparsers.add_parser("plan", help="Dry run: list what each layer would run for the catalog")
+    p_plan.add_argument("--catalog", required=True, help="processing_catalog.csv")
+    p_plan.add_argument("--output_root", required=True)
+
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        plan_rows = plan(args.catalog, args.output_root)
+        for layer, row_number, pid, visit, step, reason in plan_rows:
+            status = "RUN " if reason is not None else "SKIP"
+            print(f"{status} {layer:<10} row {row_number:<4} {pid} / {visit}: {step}" + (f" ({reason})" if reason else ""))
+        for layer in LAYERS:
+            n_run = sum(1 for r in plan_rows if r[0] == layer and r[5] is not None)
+            n_total = sum(1 for r in plan_rows if r[0] == layer)
+            print(f"{layer}: {n_run} to run, {n_total - n_run} up to date")
+        return
+
+    spec = step_spec(args.layer, args.participant_id, args.visit_type, args.device, args.modality,
+                     args.file_path, args.output_root)
+    if spec is None:
+        print(f"Nothing to do in {args.layer} for {args.device} - {args.modality}.")
+        sys.exit(1 if args.command == "check" else 0)
+
+    if args.command == "check":
+        entry = read_entry(entry_path(args.output_root, args.participant_id, args.visit_type, spec["step"]))
+        reason = stale_reason(spec, entry)
+        if reason is None:
+            print(f"Up to date: {spec['step']}")
+            sys.exit(0)
+        print(f"Needs to run: {spec['step']} ({reason})")
+        sys.exit(1)
+
+    path = record_step(spec, args.output_root, args.participant_id, args.visit_type)
+    print(f"Manifest entry saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from utils.fingerprint import file_sha256
+
+# Visit segmentation: the protocol phases of a visit (the events.csv markers
+# that matter for its visit type), each running from its own start time until
+# the next later marker or the end of the recording. It is derived once per
+# visit and kept in segments.json next to events.csv, together with each
+# phase's start/end sample indexes for every sampling rate asked for so far.
+# The sidecar is keyed by the sha256 of events.csv (and the visit type), so it
+# is re-derived whenever the events change.
+SEGMENTS_FILE = "segments.json"
+
+VISIT_MARKERS = {
+    "TSST": [
+        'Baseline Resting Period', 'Task Introduction', 'Speech Preperation',
+        'Speech Period', 'Arithmetic Period', 'Debrief Period', 'Recovery Period'
+    ],
+    # Note: User confirmed 'Speech Period' for PDST
+    "PDST": [
+        'Baseline Resting Period', 'Speech Period', 'Debrief Period', 'Recovery Period'
+    ],
+}
+
+def load_events(events_file):
+    """
+    Loads the events CSV (Event, Time, Duration, Type), dropping rows without a valid time.
+    """
+    print(f"Loading events: {events_file}")
+    try:
+        events_df = pd.read_csv(events_file, header=None, names=['Event', 'Time', 'Duration', 'Type'], on_bad_lines='skip')
+        events_df['Time'] = pd.to_numeric(events_df['Time'], errors='coerce')
+        events_df = events_df.dropna(subset=['Time'])
+    except Exception as e:
+        print(f"Error reading events file: {e}")
+        sys.exit(1)
+
+    return events_df
+
+def filter_events(events_df, visit_type):
+    """
+    Filters events based on meaningful markers for the visit type.
+    """
+    for visit_key, visit_markers in VISIT_MARKERS.items():
+        if visit_key in visit_type:
+            markers = visit_markers
+            break
+    else:
+        print(f"Unknown visit type: {visit_type}. Using all events.")
+        markers = events_df['Event'].unique().tolist()
+
+    filtered_events = events_df[events_df['Event'].isin(markers)].copy()
+
+    # Sort events by time just in case
+    filtered_events = filtered_events.sort_values(by='Time').reset_index(drop=True)
+    return filtered_events, markers
+
+def segments_path(events_file):
+    return os.path.join(os.path.dirname(os.path.abspath(events_file)), SEGMENTS_FILE)
+
+def derive_phases(events_filtered):
+    """
+    [{'event', 'start_time', 'end_time'}] in time order; each phase ends at the
+    first later start time, the last one (end_time None) at the end of the recording.
+    """
+    times = events_filtered['Time'].to_numpy(dtype=float)
+    # First start strictly later than each one (repeated times share their end)
+    next_pos = np.searchsorted(times, times, side='right')
+    phases = []
+    for event, start_time, pos in zip(events_filtered['Event'], times, next_pos):
+        phases.append({
+            "event": None if pd.isna(event) else event,
+            "start_time": float(start_time),
+            "end_time": float(times[pos]) if pos < len(times) else None,
+        })
+    return phases
+
+def phase_samples(phases, sampling_rate):
+    """
+    Start/end sample indexes of each phase at sampling_rate (int(time * fs));
+    None for the end of the last phase (end of the recording).
+    """
+    return {
+        "start": [int(p["start_time"] * sampling_rate) for p in phases],
+        "end": [None if p["end_time"] is None else int(p["end_time"] * sampling_rate) for p in phases],
+    }
+
+def _write_segmentation(path, segmentation):
+    # Written to a temporary file first: scripts of the same visit may run concurrently
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(segmentation, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_segmentation(events_file, visit_type, sampling_rates=()):
+    """
+    The visit's segmentation from segments.json, re-derived from events_file
+    (and the sidecar rewritten) if the events or the visit type changed.
+    Sample indexes for any new sampling_rates are added to the sidecar.
+    Returns {'events_sha256', 'visit_type', 'phases', 'samples': {rate: ...}}.
+    """
+    path = segments_path(events_file)
+    events_sha256 = file_sha256(events_file)
+
+    segmentation = None
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                segmentation = json.load(f)
+        except (OSError, ValueError):
+            segmentation = None
+    if (segmentation is None or segmentation.get("events_sha256") != events_sha256
+            or segmentation.get("visit_type") != visit_type):
+        events_filtered, _ = filter_events(load_events(events_file), visit_type)
+        segmentation = {
+            "events_sha256": events_sha256,
+            "visit_type": visit_type,
+            "phases": derive_phases(events_filtered),
+            "samples": {},
+        }
+        changed = True
+    else:
+        print(f"Loading segmentation: {path}")
+        changed = False
+
+    for rate in sampling_rates:
+        if str(float(rate)) not in segmentation["samples"]:
+            segmentation["samples"][str(float(rate))] = phase_samples(segmentation["phases"], rate)
+            changed = True
+
+    if changed:
+        try:
+            _write_segmentation(path, segmentation)
+        except OSError as e:
+            # Read-only event directories still work, just without the cache
+            print(f"Warning: could not write {path}: {e}")
+    return segmentation
+
+def segment_table(segmentation, sampling_rate, total_samples):
+    """
+    One row per phase for a signal of total_samples at sampling_rate: Event,
+    Time and End_Time (seconds), Start_Sample and End_Sample. The last phase
+    ends at the end of the signal (int(total_samples / fs * fs), as the
+    per-event loops computed it).
+    """
+    phases = segmentation["phases"]
+    samples = segmentation["samples"].get(str(float(sampling_rate)))
+    if samples is None:
+        samples = phase_samples(phases, sampling_rate)
+
+    end_times = [total_samples / sampling_rate if p["end_time"] is None else p["end_time"] for p in phases]
+    return pd.DataFrame({
+        'Event': pd.Series([p["event"] for p in phases], dtype=object),
+        'Time': np.array([p["start_time"] for p in phases], dtype=float),
+        'End_Time': np.array(end_times, dtype=float),
+        'Start_Sample': np.array(samples["start"], dtype=np.int64),
+        'End_Sample': np.array([int(end_time * sampling_rate) if end is None else end
+                                for end, end_time in zip(samples["end"], end_times)], dtype=np.int64),
+    })
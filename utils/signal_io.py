@@ -0,0 +1,387 @@
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# Processed signal files can be written as plain CSV (default, easy to inspect)
+# or as Parquet, which keeps typed columns and stores the sampling rate in the
+# file metadata so downstream scripts don't have to be told what it was.
+OUTPUT_FORMATS = ["csv", "parquet"]
+METADATA_KEY = b"moxie"
+
+# Chunked reads (iter_signals): working copies of a chunk the feature scripts
+# hold at once, used to turn a memory budget into a chunk length.
+CHUNK_MEMORY_FACTOR = 8
+
+# Peak/onset markers are stored by the processors as full-length 0/1 columns,
+# almost all zeros. Their sample indexes are also written to a small .npz
+# sidecar next to the signal file (<stem>_index.npz), which the feature scripts
+# use directly. With --sparse_peaks the dense columns are left out entirely.
+# The sidecar also holds the visit's events as sample positions + labels
+# (event_samples / event_labels), instead of a per-sample Event_Label column.
+INDEX_SUFFIX = "_index.npz"
+# With --beat_table, BP also gets a per-beat table (<stem>_beats.csv/.parquet:
+# systolic/diastolic sample, time and value, MAP, pulse pressure, inter-beat
+# interval) and its signal file leaves out the SBP/DBP envelope columns, which
+# are written by default; peak_envelope() rebuilds them for such files.
+BEATS_SUFFIX = "_beats"
+PEAK_COLUMNS = {
+    "ecg": ["ECG_R_Peaks", "ECG_P_Peaks", "ECG_P_Onsets", "ECG_P_Offsets", "ECG_Q_Peaks",
+            "ECG_R_Onsets", "ECG_R_Offsets", "ECG_S_Peaks", "ECG_T_Peaks", "ECG_T_Onsets", "ECG_T_Offsets"],
+    "eda": ["SCR_Onsets", "SCR_Peaks", "SCR_Recovery"],
+    "bp": ["BP_Systolic_Peak", "BP_Diastolic_Peak"],
+}
+
+# Output dtypes. NeuroKit returns everything as float64/int64; the 0/1 flag
+# columns are written as int8 and continuous signals as float32, which halves
+# the size of the processed files and of the DataFrames the feature scripts load.
+# Rules are regexes on the column name (first match wins), so they also cover the
+# per-channel suffixes of RSP/EMG (e.g. RSP_Peaks_Channel_1_RSP2208000207).
+# A flag column that contains NaN (e.g. RSP_Phase before the first breath) stays float32.
+OUTPUT_SCHEMAS = {
+    "ecg": [
+        (r"^ECG_[PQRST]_(Peaks|Onsets|Offsets)$", "int8"),
+        (r"^ECG_Phase_(Atrial|Ventricular)$", "int8"),
+        (r"^ECG_", "float32"),
+    ],
+    "eda": [
+        (r"^SCR_(Onsets|Peaks|Recovery)$", "int8"),
+        (r"^(EDA|SCR)_", "float32"),
+    ],
+    "rsp": [
+        (r"^RSP_(Peaks|Troughs|Phase)(_(?!Completion)|$)", "int8"),
+        (r"^RSP_", "float32"),
+    ],
+    "bp": [
+        (r"^BP_(Systolic|Diastolic)_Peak$", "int8"),
+        (r"^BP_", "float32"),
+    ],
+    "emg": [
+        (r"^EMG_(Activity|Onsets|Offsets)(_|$)", "int8"),
+        (r"^EMG_", "float32"),
+    ],
+}
+
+def schema_dtype(col, modality=None):
+    """
+    Output dtype for a column ('int8' / 'float32'), or None if no rule covers it.
+    modality=None checks the rules of every modality (column names don't overlap).
+    """
+    schemas = [OUTPUT_SCHEMAS[modality]] if modality else OUTPUT_SCHEMAS.values()
+    for rules in schemas:
+        for pattern, dtype in rules:
+            if re.search(pattern, col):
+                return dtype
+    return None
+
+def apply_schema(signals_df, modality=None):
+    """
+    Downcasts the columns of a signals DataFrame to their schema dtypes (in place).
+    Columns without a rule, or non-numeric ones, are left as they are.
+    """
+    for col in signals_df.columns:
+        dtype = schema_dtype(col, modality)
+        values = signals_df[col]
+        if dtype is None or not pd.api.types.is_numeric_dtype(values) or values.dtype == dtype:
+            continue
+        if dtype == "int8" and (values.isna().any() or values.min() < -128 or values.max() > 127):
+            dtype = "float32"
+        signals_df[col] = values.astype(dtype)
+    return signals_df
+
+def output_path(output_dir, stem, output_format="csv"):
+    """
+    Builds the output file path for a processed signal file.
+    e.g. output_path(dir, "processed_ecg_126641_TSST_Visit", "parquet")
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return os.path.join(output_dir, f"{stem}.{output_format}")
+
+def is_parquet(path):
+    return str(path).lower().endswith(".parquet")
+
+def save_signals(signals_df, output_file, sampling_rate=None):
+    """
+    Writes a processed signals DataFrame. The format is picked from the file
+    extension (.csv or .parquet). For Parquet, the sampling rate is stored in
+    the file metadata.
+    """
+    if is_parquet(output_file):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(signals_df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[METADATA_KEY] = json.dumps({"sampling_rate": sampling_rate}).encode()
+        table = table.replace_schema_metadata(metadata)
+        pq.write_table(table, output_file)
+    else:
+        signals_df.to_csv(output_file, index=False)
+    return output_file
+
+def read_signal_metadata(path):
+    """
+    Returns the metadata dict stored with a processed signal file.
+    CSV files carry no metadata, so an empty dict is returned.
+    """
+    if not is_parquet(path):
+        return {}
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(path).metadata or {}
+    if METADATA_KEY not in metadata:
+        return {}
+    return json.loads(metadata[METADATA_KEY])
+
+def read_sampling_rate(path, default=None):
+    """
+    Sampling rate stored in the file metadata, else the one in its index
+    sidecar (CSV files), or `default` if there is none. Processors that
+    decimate write the effective rate, so this is the rate of the file's rows.
+    """
+    sampling_rate = read_signal_metadata(path).get("sampling_rate")
+    if sampling_rate is None:
+        sampling_rate = _index_sampling_rate(path)
+    return sampling_rate if sampling_rate is not None else default
+
+def signal_columns(path):
+    """
+    Lists the columns of a processed signal file without loading any rows.
+    """
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+def load_signals(path, columns=None, exclude=()):
+    """
+    Loads a processed signal file (.csv or .parquet) with the OUTPUT_SCHEMAS dtypes
+    (so CSVs and files written before the schema load as int8/float32 too).
+    columns: only load these columns (None = all).
+    exclude: skip any column containing one of these substrings
+             (e.g. 'Event_Label', the mixed-type column in older processed files).
+    """
+    cols = _selected_columns(path, columns, exclude)
+    if is_parquet(path):
+        df = pd.read_parquet(path, columns=cols)
+    else:
+        # Parse straight to float32 (flags too, as they may hold NaN), then downcast flags
+        dtypes = {c: "float32" for c in cols if schema_dtype(c) is not None}
+        df = pd.read_csv(path, usecols=cols, dtype=dtypes)
+    return apply_schema(df)
+
+def _selected_columns(path, columns=None, exclude=()):
+    def keep(col):
+        if columns is not None and col not in columns:
+            return False
+        return not any(x in col for x in exclude)
+
+    return [c for c in signal_columns(path) if keep(c)]
+
+def iter_signals(path, chunk_rows, columns=None, exclude=()):
+    """
+    Reads a processed signal file in consecutive DataFrames of up to
+    chunk_rows rows, with the same columns and dtypes as load_signals()
+    (a flag column may come back float32 in a chunk where it holds NaN).
+    Only one chunk is held in memory at a time.
+    """
+    cols = _selected_columns(path, columns, exclude)
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=cols):
+            yield apply_schema(batch.to_pandas())
+    else:
+        dtypes = {c: "float32" for c in cols if schema_dtype(c) is not None}
+        with pd.read_csv(path, usecols=cols, dtype=dtypes, chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield apply_schema(chunk.reset_index(drop=True))
+
+def chunk_rows_for_budget(path, max_memory_mb, columns=None, exclude=(), min_rows=1):
+    """
+    Rows per chunk for iter_signals() that keep chunked feature extraction
+    within about max_memory_mb: the budget over the parsed size of a row
+    (8 bytes per column while the CSV parser holds it) times
+    CHUNK_MEMORY_FACTOR. At least min_rows.
+    """
+    n_columns = max(len(_selected_columns(path, columns, exclude)), 1)
+    rows = int(max_memory_mb * 2**20 / (8 * n_columns * CHUNK_MEMORY_FACTOR))
+    return max(rows, min_rows)
+
+def index_path(signal_file):
+    """
+    Path of the index sidecar for a processed signal file.
+    e.g. processed_ecg_126641_TSST_Visit.parquet -> processed_ecg_126641_TSST_Visit_index.npz
+    """
+    stem, _ = os.path.splitext(str(signal_file))
+    return stem + INDEX_SUFFIX
+
+def beats_path(signal_file):
+    """
+    Path of the per-beat table for a processed BP file (same format).
+    e.g. processed_bp_126641_TSST_Visit.csv -> processed_bp_126641_TSST_Visit_beats.csv
+    """
+    stem, ext = os.path.splitext(str(signal_file))
+    return stem + BEATS_SUFFIX + ext
+
+def load_beats(signal_file):
+    """
+    The per-beat table of a processed BP file (beats_path), or None if it has none.
+    """
+    path = beats_path(signal_file)
+    if not os.path.exists(path):
+        return None
+    print(f"Loading beat table: {path}")
+    beats = load_signals(path)
+    # CSV reads the trough samples back as float (the last beat has none)
+    beats['Diastolic_Sample'] = beats['Diastolic_Sample'].astype("Int64")
+    return beats
+
+def beat_table(bp_cleaned, peaks, troughs, fs):
+    """
+    Compact per-beat table, one row per systolic peak: systolic and diastolic
+    sample, time and pressure, MAP (mean of BP_Clean from this peak to the
+    next), pulse pressure and the interval to the next peak. troughs[i] is
+    the diastolic trough after peaks[i] (process_acq_bp.find_troughs); the
+    last peak has no following trough or interval (NaN).
+    Written by process_acq_bp.py (--beat_table) and rebuilt the same way by
+    features_acq_bp.py for files without one.
+    """
+    peaks = np.asarray(peaks, dtype=np.int64)
+    troughs = np.asarray(troughs, dtype=np.int64)
+    beat_sums = None
+    if len(peaks) > 1:
+        span = np.asarray(bp_cleaned[peaks[0]:peaks[-1]], dtype=float)
+        beat_sums = np.add.reduceat(span, peaks[:-1] - peaks[0])
+    return beats_from_values(peaks, bp_cleaned[peaks], troughs, bp_cleaned[troughs], beat_sums, fs)
+
+def beats_from_values(peaks, sbp, troughs, dbp, beat_sums, fs):
+    """
+    beat_table() from the BP_Clean values at the peaks (sbp) and troughs
+    (dbp) and the sum of BP_Clean over each beat (beat_sums, from a peak to
+    the next one; a final entry for the last beat is ignored), for a pass
+    over the signal in chunks.
+    """
+    n_beats = len(peaks)
+    diastolic = np.full(n_beats, np.nan)
+    diastolic[:len(troughs)] = troughs
+    dbp_all = np.full(n_beats, np.nan)
+    dbp_all[:len(troughs)] = dbp
+    mean_pressure = np.full(n_beats, np.nan)
+    ibi = np.full(n_beats, np.nan)
+    if n_beats > 1:
+        lengths = np.diff(peaks)
+        mean_pressure[:-1] = np.asarray(beat_sums[:n_beats - 1], dtype=float) / lengths
+        ibi[:-1] = lengths / fs * 1000
+
+    return pd.DataFrame({
+        'Systolic_Sample': peaks,
+        'Systolic_Time': peaks / fs,
+        'BP_Systolic': sbp,
+        'Diastolic_Sample': pd.array(diastolic, dtype="Int64"),
+        'Diastolic_Time': diastolic / fs,
+        'BP_Diastolic': dbp_all,
+        'BP_MAP': mean_pressure,
+        'BP_PulsePressure': sbp - dbp_all,
+        'IBI_ms': ibi,
+    })
+
+def peak_envelope(indexes, values, start, stop):
+    """
+    Envelope through the values at peak sample indexes, for samples
+    start..stop-1 (float32): linear between peaks, held at the first/last
+    value outside them, all NaN without peaks. The same values as the
+    BP_Systolic_Interp / BP_Diastolic_Interp columns processed BP files
+    store unless written with --beat_table.
+    """
+    if len(indexes) == 0:
+        return np.full(stop - start, np.nan, dtype=np.float32)
+    return np.interp(np.arange(start, stop), indexes, values).astype(np.float32)
+
+def peak_indexes(signals_df, columns):
+    """
+    Sample indexes where each 0/1 marker column is 1: {column: int64 array}.
+    Columns missing from the DataFrame are skipped.
+    """
+    return {
+        col: np.flatnonzero(signals_df[col].to_numpy() == 1).astype(np.int64)
+        for col in columns if col in signals_df.columns
+    }
+
+def save_index(signal_file, arrays, sampling_rate=None):
+    """
+    Writes the index sidecar for a processed signal file.
+    """
+    path = index_path(signal_file)
+    np.savez(path, sampling_rate=np.nan if sampling_rate is None else sampling_rate, **arrays)
+    return path
+
+def load_index(signal_file):
+    """
+    Loads the index sidecar of a processed signal file as {name: array}.
+    Returns an empty dict if the file has no sidecar.
+    """
+    path = index_path(signal_file)
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as index:
+        return {name: index[name] for name in index.files if name != "sampling_rate"}
+
+def _index_sampling_rate(signal_file):
+    path = index_path(signal_file)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as index:
+        if "sampling_rate" not in index.files:
+            return None
+        sampling_rate = float(index["sampling_rate"])
+    return None if np.isnan(sampling_rate) else sampling_rate
+
+def events_to_sample_index(events_df, sampling_rate, n_samples):
+    """
+    Sample positions of the events in an events.csv DataFrame for a signal of
+    n_samples: (int64 indexes, labels). Uses int(start_time * fs) like the old
+    Event_Label column; events outside the signal are dropped.
+    """
+    if events_df is None or events_df.empty:
+        return np.array([], dtype=np.int64), np.array([], dtype=str)
+    samples = (events_df['start_time'].to_numpy(dtype=float) * sampling_rate).astype(np.int64)
+    labels = events_df['event_label'].astype(str).to_numpy(dtype=str)
+    keep = (samples >= 0) & (samples < n_samples)
+    return samples[keep], labels[keep]
+
+def load_event_index(signal_file):
+    """
+    Event positions stored with a processed signal file: (int64 sample indexes, labels).
+    Empty arrays if the file has no events in its sidecar.
+    """
+    index = load_index(signal_file)
+    return (index.get("event_samples", np.array([], dtype=np.int64)),
+            index.get("event_labels", np.array([], dtype=str)))
+
+def save_signals_with_index(signals_df, output_file, modality, sampling_rate=None, sparse_peaks=False, events_df=None):
+    """
+    save_signals() plus the index sidecar holding the modality's peak indexes
+    and, if events_df is given, the event positions. Columns are downcast to
+    the modality's OUTPUT_SCHEMAS dtypes.
+    sparse_peaks: drop the dense 0/1 peak columns from the signal file.
+    """
+    columns = PEAK_COLUMNS.get(modality, [])
+    arrays = peak_indexes(signals_df, columns)
+    signals_df = apply_schema(signals_df, modality)
+    if events_df is not None:
+        arrays["event_samples"], arrays["event_labels"] = events_to_sample_index(events_df, sampling_rate, len(signals_df))
+    save_index(output_file, arrays, sampling_rate)
+    if sparse_peaks:
+        signals_df = signals_df.drop(columns=[c for c in columns if c in signals_df.columns])
+    return save_signals(signals_df, output_file, sampling_rate)
+
+def peaks_between(indexes, start_idx, end_idx):
+    """
+    Peak indexes falling in [start_idx, end_idx), relative to start_idx
+    (the same positions np.where() gives on df.iloc[start_idx:end_idx]).
+    """
+    lo, hi = np.searchsorted(indexes, [start_idx, end_idx])
+    return indexes[lo:hi] - start_idx
@@ -0,0 +1,31 @@
+import pandas as pd
+import pyarrow.dataset as ds
+
+from utils.build_rl_dataset import build_dataset
+
+def _write_visit(root, pid, visit, modality, df):
+    visit_dir = root / pid / visit
+    visit_dir.mkdir(parents=True, exist_ok=True)
+    df.to_csv(visit_dir / f"features_{modality}_windowed_1_0s_{pid}_{visit.replace(' ', '_')}.csv", index=False)
+
+def _rsp(phases, rate=15.0):
+    return pd.DataFrame({"Time": [0.0, 1.0, 2.0], "Condition": "Speech Period", "RSP_Rate_Mean": rate,
+                         "RSP_Phase_Dominant": phases})
+
+def test_text_columns_and_bad_visits(tmp_path):
+    source = tmp_path / "features"
+    # The first visit has no phase labels, so its column reads back as float64
+    _write_visit(source, "1", "TSST Visit", "rsp", _rsp([None, None, None]))
+    _write_visit(source, "1", "TSST Visit", "ecg", pd.DataFrame({"Time": [0.0, 1.0, 2.0], "Condition": "Speech Period",
+                                                                  "ECG_Rate_Mean": [60.0, 61.0, 62.0]}))
+    _write_visit(source, "2", "TSST Visit", "rsp", _rsp(["Inhale", "Exhale", None]))
+    # Text in a numeric column: this visit is skipped, the others are written
+    _write_visit(source, "3", "TSST Visit", "rsp", _rsp(["Inhale"] * 3, rate="high"))
+
+    dest = tmp_path / "dataset"
+    build_dataset(str(source), str(dest), modalities=["rsp", "ecg"])
+    df = ds.dataset(str(dest), format="parquet", partitioning="hive").to_table().to_pandas()
+    assert sorted(df["Participant_ID"].astype(str).unique()) == ["1", "2"]
+    df = df.sort_values(["Participant_ID", "Time"])
+    assert df["RSP_Phase_Dominant"].tolist() == [None, None, None, "Inhale", "Exhale", None]
+    assert df["ECG_Rate_Mean"].tolist()[:3] == [60.0, 61.0, 62.0] and df["ECG_Rate_Mean"].isna().sum() == 3
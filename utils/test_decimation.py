@@ -0,0 +1,36 @@
+import numpy as np
+
+from utils.decimation import decimate, decimation_factor
+
+def test_factor_divides_native_rate():
+    # 1000 // 30 = 33 would give 30.303 Hz; 25 is the largest divisor keeping >= 30 Hz
+    assert decimation_factor(1000, 30) == 25
+    assert decimation_factor(1000.0, 30) == 25
+    assert decimation_factor(2000, 50) == 40
+    assert decimation_factor(2000, 100) == 20
+    for fs in (250, 256, 500, 1000, 2000):
+        for target in (7, 10, 25, 30, 50, 100, 128):
+            q = decimation_factor(fs, target)
+            assert fs % q == 0 and fs / q >= min(target, fs)
+
+def test_no_decimation():
+    assert decimation_factor(1000, None) == 1
+    assert decimation_factor(1000, 1000) == 1
+    assert decimation_factor(1000, 2000) == 1
+    assert decimation_factor(999.5, 30) == 1
+    values = np.arange(10.0)
+    out, fs = decimate(values, 1000, None)
+    assert out is values and fs == 1000
+
+def test_decimate_keeps_slow_signal():
+    fs = 1000
+    t = np.arange(20 * fs) / fs
+    slow = 5 + np.sin(2 * np.pi * 0.3 * t)
+    noisy = slow + 0.5 * np.sin(2 * np.pi * 200 * t)
+    out, rate = decimate(noisy, fs, 30)
+    assert rate == 40.0
+    assert len(out) == len(noisy) // 25
+    # The 200 Hz component is filtered out and the 0.3 Hz wave kept; the DC level
+    # doesn't ring at the ends (line padding)
+    np.testing.assert_allclose(out[10:-10], slow[::25][10:-10], atol=1e-3)
+    np.testing.assert_allclose(out, slow[::25], atol=0.05)
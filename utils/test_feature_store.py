@@ -0,0 +1,46 @@
+import pandas as pd
+
+from utils.feature_store import list_partitions, query_features, write_features
+
+def _windows(prefix, n=6, condition="Speech Period"):
+    return pd.DataFrame({"Time": [float(t) for t in range(n)], "Condition": [condition] * (n // 2) + ["Arithmetic Period"] * (n - n // 2),
+                         f"{prefix}_Mean": [float(t) * 2 for t in range(n)]})
+
+def _store(tmp_path):
+    store = str(tmp_path / "store")
+    for pid in ("1", "2"):
+        for visit in ("TSST Visit", "Baseline Visit"):
+            write_features(_windows("ECG_Rate"), store, "windowed_1_0s", pid, visit, "ecg")
+            write_features(_windows("EDA_Tonic"), store, "windowed_1_0s", pid, visit, "eda")
+    return store
+
+def _corrupt(part_dir):
+    # An unreadable partition: any query that opens it fails
+    for path in part_dir.glob("*.parquet"):
+        path.write_bytes(b"not parquet")
+
+def test_partitions_pruned_by_directory(tmp_path):
+    store = _store(tmp_path)
+    assert len(list_partitions(store, "windowed_1_0s")) == 8
+    selected = list_partitions(store, "windowed_1_0s", participants="1", visits=["TSST Visit"])
+    assert [(pid, visit, modality) for pid, visit, modality, _ in selected] == [("1", "TSST Visit", "ecg"), ("1", "TSST Visit", "eda")]
+    for pid, visit, modality, part_dir in list_partitions(store, "windowed_1_0s"):
+        if (pid, visit) != ("1", "TSST Visit"):
+            _corrupt(part_dir)
+
+    df = query_features(store, "windowed_1_0s", participants=1, visits="TSST Visit", conditions="Speech Period",
+                        time_range=(1, None))
+    assert set(df["Modality"]) == {"ecg", "eda"} and (df["Participant_ID"] == "1").all() and (df["Visit"] == "TSST Visit").all()
+    assert sorted(df["Time"].unique()) == [1.0, 2.0] and (df["Condition"] == "Speech Period").all()
+    assert query_features(store, "windowed_1_0s", participants="3").empty
+
+def test_partitions_without_requested_columns_skipped(tmp_path):
+    store = _store(tmp_path)
+    # EDA partitions hold no ECG column: none of their rows, not even the keys
+    df = query_features(store, "windowed_1_0s", columns=["ECG_Rate_Mean"])
+    assert list(df.columns) == ["Participant_ID", "Visit", "Modality", "Time", "Condition", "ECG_Rate_Mean"]
+    assert set(df["Modality"]) == {"ecg"} and len(df) == 4 * 6 and df["ECG_Rate_Mean"].notna().all()
+    # A modality with some of the columns has NaN for the others
+    df = query_features(store, "windowed_1_0s", participants="2", columns=["ECG_Rate_Mean", "EDA_Tonic_Mean"])
+    assert len(df) == 2 * 2 * 6 and (df["ECG_Rate_Mean"].isna() == (df["Modality"] == "eda")).all()
+    assert query_features(store, "windowed_1_0s", columns=["RSP_Rate_Mean"]).empty
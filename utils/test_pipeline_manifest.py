@@ -0,0 +1,96 @@
+import csv
+import os
+
+import pytest
+
+from utils import pipeline_manifest
+from utils.pipeline_manifest import LAYERS, plan, read_catalog, record_step, stale_reason, step_spec
+
+PID, VISIT = "1", "TSST Visit"
+PARAM_VARS = ["OUTPUT_FORMAT", "SPARSE_PEAKS", "BP_BEAT_TABLE", "EDA_TARGET_RATE", "RSP_TARGET_RATE", "BP_TARGET_RATE",
+              "FEATURE_WINDOW_SIZE", "FEATURE_HOP_SIZE", "FEATURE_STORE", "FEATURE_MAX_MEMORY"]
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    # One visit's ACQ file (ECG and BP rows), with every step's outputs written and recorded
+    for name in PARAM_VARS:
+        monkeypatch.delenv(name, raising=False)
+    acq_file = tmp_path / "raw" / "1_tsst.acq"
+    acq_file.parent.mkdir()
+    acq_file.write_bytes(b"acq v1")
+    output_root = tmp_path / "out"
+    visit_dir = output_root / PID / VISIT
+    visit_dir.mkdir(parents=True)
+    for name in ["events.csv", "processed_ecg_1_TSST_Visit.csv", "processed_bp_1_TSST_Visit.csv",
+                 "features_ecg_event_based_1_TSST_Visit.csv", "features_bp_windowed_1_0s_1_TSST_Visit.csv"]:
+        (visit_dir / name).write_text(name)
+    catalog = tmp_path / "processing_catalog.csv"
+    with open(catalog, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["participant_id", "visit_type", "device", "modality", "file_path"])
+        writer.writeheader()
+        for modality in ("ecg", "bp"):
+            writer.writerow({"participant_id": PID, "visit_type": VISIT, "device": "acq", "modality": modality,
+                             "file_path": str(acq_file)})
+    for layer in LAYERS:
+        for row in read_catalog(catalog):
+            spec = step_spec(layer, PID, VISIT, row["device"], row["modality"], row["file_path"], str(output_root))
+            if spec is not None:
+                record_step(spec, str(output_root), PID, VISIT)
+    return str(catalog), str(output_root), acq_file, visit_dir
+
+def _to_run(catalog, output_root):
+    return {step: reason for _, _, _, _, step, reason in plan(catalog, output_root) if reason is not None}
+
+def test_plan_up_to_date(pipeline):
+    catalog, output_root, _, _ = pipeline
+    steps = [step for _, _, _, _, step, _ in plan(catalog, output_root)]
+    assert steps == ["events_acq_ecg", "processing_acq_ecg", "processing_acq_bp", "features_acq_ecg", "features_acq_bp"]
+    assert _to_run(catalog, output_root) == {}
+
+def test_plan_reruns_downstream_of_changed_input(pipeline):
+    catalog, output_root, acq_file, _ = pipeline
+    acq_file.write_bytes(b"acq v2, re-exported")
+    assert _to_run(catalog, output_root) == {
+        "events_acq_ecg": "input changed: 1_tsst.acq",
+        "processing_acq_ecg": "events_acq_ecg reruns",
+        "processing_acq_bp": "events_acq_ecg reruns",
+        "features_acq_ecg": "processing_acq_ecg reruns",
+        "features_acq_bp": "processing_acq_bp reruns",
+    }
+
+def test_plan_reruns_downstream_of_changed_output(pipeline):
+    # A processed file replaced by hand: its step and the features built from it
+    catalog, output_root, _, visit_dir = pipeline
+    (visit_dir / "processed_bp_1_TSST_Visit.csv").write_text("edited by hand")
+    assert _to_run(catalog, output_root) == {
+        "processing_acq_bp": "output missing or modified: processed_bp_1_TSST_Visit.csv",
+        "features_acq_bp": "processing_acq_bp reruns",
+    }
+
+def test_plan_reruns_on_parameter_change(pipeline, monkeypatch):
+    catalog, output_root, _, _ = pipeline
+    monkeypatch.setenv("FEATURE_HOP_SIZE", "0.5")
+    assert _to_run(catalog, output_root) == {"features_acq_ecg": "parameters changed", "features_acq_bp": "parameters changed"}
+    monkeypatch.delenv("FEATURE_HOP_SIZE")
+    monkeypatch.setenv("BP_BEAT_TABLE", "true")
+    assert _to_run(catalog, output_root) == {"processing_acq_bp": "parameters changed", "features_acq_bp": "processing_acq_bp reruns"}
+
+def test_stale_reason(pipeline, tmp_path):
+    _, output_root, acq_file, visit_dir = pipeline
+    script = tmp_path / "process_test.py"
+    script.write_text("print('v1')\n")
+    spec = {"step": "processing_acq_test", "script": str(script), "inputs": [str(acq_file)],
+            "outputs": ["processed_ecg_*"], "params": {"output_format": "csv"}}
+    assert stale_reason(spec, None) == "no manifest entry"
+    record_step(spec, output_root, PID, VISIT)
+    entry = pipeline_manifest.read_entry(pipeline_manifest.entry_path(output_root, PID, VISIT, spec["step"]))
+    assert stale_reason(spec, entry) is None
+    # Touched but identical files are still up to date
+    os.utime(acq_file, (0, 0))
+    assert stale_reason(spec, entry) is None
+    assert stale_reason({**spec, "params": {"output_format": "parquet"}}, entry) == "parameters changed"
+    assert stale_reason({**spec, "inputs": [str(acq_file), str(visit_dir / "events.csv")]}, entry) == "input files changed"
+    (visit_dir / "processed_ecg_1_TSST_Visit.csv").unlink()
+    assert stale_reason(spec, entry) == "output missing or modified: processed_ecg_1_TSST_Visit.csv"
+    script.write_text("print('v2')\n")
+    assert stale_reason(spec, entry) == "code changed"
@@ -1,17 +1,35 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import load_index, load_signals, peak_envelope, peak_indexes, read_sampling_rate
 
 file_path = "processed_bp_126641_TSST_Visit.csv"
+if len(sys.argv) > 1:
+    file_path = sys.argv[1]
 
 def verify_bp(file_path):
     print(f"Loading {file_path}...")
     try:
-        df = pd.read_csv(file_path)
+        df = load_signals(file_path)
     except Exception as e:
         print(f"Failed to load: {e}")
         return
 
+    # Files processed with --beat_table store no envelopes: interpolate them through the peaks
+    if 'BP_Systolic_Interp' not in df.columns:
+        peaks = load_index(file_path)
+        if 'BP_Systolic_Peak' not in peaks:
+            peaks = peak_indexes(df, ['BP_Systolic_Peak', 'BP_Diastolic_Peak'])
+        clean = df['BP_Clean'].to_numpy()
+        for col, peak_col in [('BP_Systolic_Interp', 'BP_Systolic_Peak'), ('BP_Diastolic_Interp', 'BP_Diastolic_Peak')]:
+            idx = peaks.get(peak_col, np.array([], dtype=np.int64))
+            df[col] = peak_envelope(idx, clean[idx], 0, len(df))
+
     # 1. Sanity Checks on Values
     sbp = df['BP_Systolic_Interp']
     dbp = df['BP_Diastolic_Interp']
@@ -41,9 +59,9 @@ def verify_bp(file_path):
 
     # 2. Visualization
     # Plot a random 30-second segment (FS=2000, so 60000 samples)
-    fs = 2000
+    fs = read_sampling_rate(file_path, default=2000)
     duration = 30
-    n_samples = fs * duration
+    n_samples = int(fs * duration)
     
     # Pick a segment in the middle
     mid_idx = len(df) // 2
@@ -1,18 +1,32 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import load_index, load_signals, peak_indexes, peaks_between, read_sampling_rate
 
 file_path = "processed_ecg_126641_TSST_Visit.csv"
+if len(sys.argv) > 1:
+    file_path = sys.argv[1]
 
 def verify_ecg(file_path):
     print(f"Loading {file_path}...")
     try:
         cols = ['ECG_Clean', 'ECG_Rate', 'ECG_R_Peaks']
-        df = pd.read_csv(file_path, usecols=cols)
+        df = load_signals(file_path, columns=cols)
     except Exception as e:
         print(f"Failed to load: {e}")
         return
 
+    # R-peaks: index sidecar, or the 0/1 column (files written without --sparse_peaks)
+    index = load_index(file_path)
+    if 'ECG_R_Peaks' not in index:
+        index = peak_indexes(df, ['ECG_R_Peaks'])
+    r_peaks = index.get('ECG_R_Peaks', np.array([], dtype=np.int64))
+
     # 1. Statistics
     rate = df['ECG_Rate']
     print("\n--- Statistics ---")
@@ -26,9 +40,9 @@ def verify_ecg(file_path):
 
     # 2. Visualization
     # Plot a random 10-second segment
-    fs = 2000
+    fs = read_sampling_rate(file_path, default=2000)
     duration = 10
-    n_samples = fs * duration
+    n_samples = int(fs * duration)
     
     # Pick a segment in the middle
     mid_idx = len(df) // 2
@@ -49,7 +63,7 @@ def verify_ecg(file_path):
     ax1.plot(time, segment['ECG_Clean'], label='ECG (Clean)', color='black', alpha=0.8, linewidth=1)
     
     # Plot R-Peaks
-    peaks = segment[segment['ECG_R_Peaks'] == 1].index
+    peaks = peaks_between(r_peaks, start_idx, end_idx)
     if len(peaks) > 0:
         ax1.scatter(time[peaks], segment.loc[peaks, 'ECG_Clean'], color='red', s=50, zorder=5, label='R-Peaks')
     
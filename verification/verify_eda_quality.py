@@ -1,15 +1,23 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import load_index, load_signals, peak_indexes, peaks_between, read_sampling_rate
 
 file_path = "processed_eda_126641_TSST_Visit.csv"
+if len(sys.argv) > 1:
+    file_path = sys.argv[1]
 
 def verify_eda(file_path):
     print(f"Loading {file_path}...")
     try:
         # Load columns
         # EDA_Clean, EDA_Tonic, EDA_Phasic, SCR_Peaks
-        df = pd.read_csv(file_path)
+        df = load_signals(file_path)
     except Exception as e:
         print(f"Failed to load: {e}")
         return
@@ -19,18 +27,19 @@ def verify_eda(file_path):
     tonic = df['EDA_Tonic']
     phasic = df['EDA_Phasic'] # Driver
     
-    # SCR Peaks (Binary column usually indicating peak location)
-    # Check if SCR_Peaks exists
-    if 'SCR_Peaks' in df.columns:
-        scr_count = df['SCR_Peaks'].sum()
-    else:
-        scr_count = 0
+    # SCR Peaks: index sidecar, or the 0/1 column (files written without --sparse_peaks)
+    index = load_index(file_path)
+    if 'SCR_Peaks' not in index:
+        index = peak_indexes(df, ['SCR_Peaks'])
+    scr_peaks = index.get('SCR_Peaks', np.array([], dtype=np.int64))
+    scr_count = len(scr_peaks)
         
     print("\n--- Statistics ---")
     print(f"EDA Mean:   {clean.mean():.2f} uS (Std: {clean.std():.2f})")
     print(f"Tonic Mean: {tonic.mean():.2f} uS")
     print(f"Phasic Max: {phasic.max():.2f} uS")
-    print(f"Total SCRs detected: {scr_count} ({scr_count / (len(df)/2000/60):.2f} per minute)")
+    fs = read_sampling_rate(file_path, default=2000)
+    print(f"Total SCRs detected: {scr_count} ({scr_count / (len(df)/fs/60):.2f} per minute)")
     
     # Check for negative values (EDA should generally be positive, uS)
     neg_values = (clean < 0).sum()
@@ -38,9 +47,8 @@ def verify_eda(file_path):
 
     # 2. Visualization
     # Plot a random 60-second segment (EDA changes slower than ECG)
-    fs = 2000
     duration = 60
-    n_samples = fs * duration
+    n_samples = int(fs * duration)
     
     # Pick a segment in the middle
     mid_idx = len(df) // 2
@@ -61,10 +69,9 @@ def verify_eda(file_path):
     ax1.plot(time, segment['EDA_Tonic'], label='Tonic Component', color='orange', linestyle='--', linewidth=2)
     
     # Mark SCR Peaks on the main signal
-    if 'SCR_Peaks' in segment.columns:
-        peaks = segment[segment['SCR_Peaks'] == 1].index
-        if len(peaks) > 0:
-            ax1.scatter(time[peaks], segment.loc[peaks, 'EDA_Clean'], color='red', s=50, zorder=5, label='SCR Peak')
+    peaks = peaks_between(scr_peaks, start_idx, end_idx)
+    if len(peaks) > 0:
+        ax1.scatter(time[peaks], segment.loc[peaks, 'EDA_Clean'], color='red', s=50, zorder=5, label='SCR Peak')
 
     ax1.set_title(f"EDA Signal & Tonic Component (60s Segment)")
     ax1.set_ylabel("Conductance (uS)")
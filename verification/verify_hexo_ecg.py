@@ -1,8 +1,13 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
 import sys
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import load_signals, read_sampling_rate
+
 # Default file - updated dynamically if run via command line
 file_path = "processed_hex_ecg_124961_TSST_Visit.csv"
 if len(sys.argv) > 1:
@@ -11,7 +16,7 @@ if len(sys.argv) > 1:
 def verify_hexo_ecg(file_path):
     print(f"Loading {file_path}...")
     try:
-        df = pd.read_csv(file_path)
+        df = load_signals(file_path)
     except Exception as e:
         print(f"Failed to load: {e}")
         return
@@ -38,9 +43,9 @@ def verify_hexo_ecg(file_path):
     print(f"HR Outliers (>200 or <40): {hr_outliers} ({hr_outliers/len(df)*100:.2f}%)")
 
     # 2. Visualization
-    fs = 256
+    fs = read_sampling_rate(file_path, default=256)
     duration = 10
-    n_samples = fs * duration
+    n_samples = int(fs * duration)
     
     mid_idx = len(df) // 2
     start_idx = mid_idx
@@ -1,8 +1,13 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
 import sys
 
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import load_event_index, load_signals, read_sampling_rate, signal_columns
+
 # Default file
 file_path = "processed_hex_rsp_124961_TSST_Visit.csv"
 if len(sys.argv) > 1:
@@ -12,8 +17,7 @@ def verify_hexo_rsp(file_path):
     print(f"Loading {file_path}...")
     try:
         # Load header first
-        df_head = pd.read_csv(file_path, nrows=1)
-        all_cols = df_head.columns.tolist()
+        all_cols = signal_columns(file_path)
         
         # Identify Channels
         thoracic = [c for c in all_cols if "Thoracic" in c]
@@ -27,13 +31,13 @@ def verify_hexo_rsp(file_path):
         print(f"Found Abdominal columns: {len(abdominal)}")
         
         # Load Full
-        df = pd.read_csv(file_path)
+        df = load_signals(file_path)
         
     except Exception as e:
         print(f"Failed to load: {e}")
         return
 
-    fs = 256
+    fs = read_sampling_rate(file_path, default=256)
     
     # Setup Plot
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(15, 12), sharex=True)
@@ -50,16 +54,19 @@ def verify_hexo_rsp(file_path):
         rate = df['RSP_Rate_Abdominal']
         print(f"Rate Mean: {rate.mean():.2f} brpm (Std: {rate.std():.2f})")
 
-    # Check Events
-    if 'Event_Label' in df.columns:
+    # Check Events (index sidecar; older files have an Event_Label column)
+    event_samples, event_labels = load_event_index(file_path)
+    if len(event_samples) > 0:
+        print(f"\nEvent Labels Found: {np.unique(event_labels)} ({len(event_samples)} events)")
+    elif 'Event_Label' in df.columns:
         labels = df['Event_Label'].unique()
         print(f"\nEvent Labels Found: {labels}")
     else:
-        print("\nNo Event_Label column found.")
+        print("\nNo events found.")
 
     # Visualization (60s segment)
     duration = 60
-    n_samples = fs * duration
+    n_samples = int(fs * duration)
     mid_idx = len(df) // 2
     start_idx = mid_idx
     end_idx = start_idx + n_samples
@@ -1,16 +1,22 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+
+# Shared helpers live in utils/ at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.signal_io import load_signals, read_sampling_rate, signal_columns
 
 file_path = "processed_rsp_126641_TSST_Visit.csv"
+if len(sys.argv) > 1:
+    file_path = sys.argv[1]
 
 def verify_rsp(file_path):
     print(f"Loading {file_path}...")
     try:
         # Load first few rows to check columns
-        df_iter = pd.read_csv(file_path, chunksize=1000)
-        df_head = next(df_iter)
-        all_cols = df_head.columns.tolist()
+        all_cols = signal_columns(file_path)
         
         # Identify Channels based on 'RSP_Clean_' prefix
         clean_cols = [c for c in all_cols if c.startswith("RSP_Clean_")]
@@ -18,13 +24,13 @@ def verify_rsp(file_path):
         
         # Now load full file (or enough chunks)
         # For verification, we can just load the whole thing
-        df = pd.read_csv(file_path)
+        df = load_signals(file_path)
         
     except Exception as e:
         print(f"Failed to load: {e}")
         return
 
-    fs = 2000
+    fs = read_sampling_rate(file_path, default=2000)
     
     # Setup Plot
     fig, axes = plt.subplots(len(clean_cols), 1, figsize=(15, 5 * len(clean_cols)), sharex=True)
@@ -55,7 +61,7 @@ def verify_rsp(file_path):
         
         # Visualization (60s segment)
         duration = 60
-        n_samples = fs * duration
+        n_samples = int(fs * duration)
         mid_idx = len(df) // 2
         start_idx = mid_idx
         end_idx = start_idx + n_samples
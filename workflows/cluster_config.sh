@@ -14,5 +14,50 @@ export CATALOG_FILE="$PROJECT_ROOT/processing_catalog.csv"
 export OUTPUT_ROOT="$PROJECT_ROOT/Processed_Data"
 export SCRIPT_DIR="$PROJECT_ROOT/processing"
 
-# Ensure output directory exists when config is loaded
-mkdir -p "$OUTPUT_ROOT"
+# Processed signal format: "csv" (default) or "parquet" (typed columns, much faster to write/read)
+export OUTPUT_FORMAT="csv"
+
+# ACQ archive (opt-in): "true" makes Layer 1 decode each .acq once into <OUTPUT_ROOT>/<PID>/<Visit>/acq_archive
+# (per-channel .npy, memory-mapped by later stages), so unchanged files are never decoded again.
+# Costs a full uncompressed copy of every ACQ file under OUTPUT_ROOT. "false" = Layer 2 reads the .acq directly.
+export USE_ACQ_ARCHIVE="false"
+
+# Peak indexes (R-peaks, SCR onsets/peaks, BP systolic/diastolic) are always written to a
+# <stem>_index.npz sidecar. "true" also drops the full-length 0/1 peak columns from the signal files.
+export SPARSE_PEAKS="false"
+
+# Layer 2 decimation (Hz): EDA, respiration and BP are decimated (anti-aliased) to about this rate
+# before NeuroKit processing, e.g. 50 / 50 / 100 for 10-40x smaller, faster processing at 1-2 kHz.
+# The effective rate is stored with each processed file, so Layer 3 picks it up. Empty = native rate.
+export EDA_TARGET_RATE=""
+export RSP_TARGET_RATE=""
+export BP_TARGET_RATE=""
+
+# Layer 2 BP: "true" writes a per-beat table (processed_bp_*_beats) and leaves the interpolated
+# BP_Systolic_Interp / BP_Diastolic_Interp columns out of processed_bp (rebuilt by Layer 3 when needed).
+export BP_BEAT_TABLE="false"
+
+# Layer 3 windowed features: window length(s) and hop between window starts, in seconds.
+# Several space-separated sizes (e.g. "1 10 60") give one output file each.
+# Leave FEATURE_HOP_SIZE empty for back-to-back windows; e.g. 30 with a hop of 1 gives overlapping windows.
+export FEATURE_WINDOW_SIZE="1.0"
+export FEATURE_HOP_SIZE=""
+
+# Feature store: if set, Layer 3 also writes every feature table to this directory as Parquet,
+# partitioned by participant/visit/modality (query with utils/feature_store.py). Empty = CSVs only.
+export FEATURE_STORE=""
+
+# Layer 3 memory budget in MB: if set, the feature scripts read each processed file in chunks
+# (--max_memory) instead of loading it whole, so a task's memory no longer grows with the recording
+# length and run_features.sh can ask for less --mem. Empty = load whole files (fastest).
+export FEATURE_MAX_MEMORY=""
+
+# Incremental runs: each layer records its outputs in <OUTPUT_ROOT>/<PID>/<Visit>/.manifest/ (input hashes,
+# code hashes, parameters) and skips steps that are up to date. "true" recomputes everything.
+# Dry run (what would run): python utils/pipeline_manifest.py plan --catalog "$CATALOG_FILE" --output_root "$OUTPUT_ROOT"
+export FORCE_RECOMPUTE="false"
+
+# Ensure output directory exists when config is loaded (not for read-only uses such as submit_batch.sh --dry-run)
+if [ "$MOXIE_DRY_RUN" != "true" ]; then
+    mkdir -p "$OUTPUT_ROOT"
+fi
@@ -10,7 +10,7 @@
 #SBATCH --nodes=1
 #SBATCH --ntasks-per-node=1
 #SBATCH --cpus-per-task=1
-#SBATCH --mem=4g
+#SBATCH --mem=8g
 #SBATCH --time=00:30:00
 #SBATCH --account=sungchoi99
 #SBATCH --partition=standard
@@ -55,6 +55,7 @@ IFS=',' read -r PID VISIT DEVICE MODALITY FILE_PATH <<< "$LINE"
 # We only want to run Event Extraction ONCE per Acqknowledge file.
 # The catalog has multiple rows for the same file (ecg, eda, rsp, etc.).
 # We designate 'ecg' as the "Trigger Modality" for event extraction.
+# Single-pass catalogs ('all' rows) extract events during Layer 2 instead.
 
 if [ "$DEVICE" == "acq" ] && [ "$MODALITY" == "ecg" ]; then
     echo "Processing Job $ROW_INDEX (Triggered by $DEVICE - $MODALITY)"
@@ -66,8 +67,23 @@ if [ "$DEVICE" == "acq" ] && [ "$MODALITY" == "ecg" ]; then
     TARGET_DIR="$OUTPUT_ROOT/$PID/$VISIT"
     mkdir -p "$TARGET_DIR"
 
+    # Ingest once into the ACQ archive (no-op if the archive matches the file)
+    ARCHIVE_ARG=""
+    if [ "$USE_ACQ_ARCHIVE" == "true" ]; then
+        ARCHIVE_DIR="$TARGET_DIR/acq_archive"
+        python $SCRIPT_DIR/ingest_acq.py --acq_file "$FILE_PATH" --archive_dir "$ARCHIVE_DIR" || echo "WARNING: Ingest failed, later stages will read the .acq directly."
+        ARCHIVE_ARG="--archive_dir \"$ARCHIVE_DIR\""
+    fi
+
+    # Skip if the manifest says this step's outputs are up to date (FORCE_RECOMPUTE="true" to rerun anyway)
+    MANIFEST_ARGS="--layer events --participant_id \"$PID\" --visit_type \"$VISIT\" --device \"$DEVICE\" --modality \"$MODALITY\" --file_path \"$FILE_PATH\" --output_root \"$OUTPUT_ROOT\""
+    if [ "$FORCE_RECOMPUTE" != "true" ] && eval python $PROJECT_ROOT/utils/pipeline_manifest.py check $MANIFEST_ARGS; then
+        echo "Outputs are up to date. Skipping."
+        exit 0
+    fi
+
     # Execute
-    CMD="python $SCRIPT_DIR/extract_events.py --acq_file \"$FILE_PATH\" --output_dir \"$TARGET_DIR\""
+    CMD="python $SCRIPT_DIR/extract_events.py --acq_file \"$FILE_PATH\" --output_dir \"$TARGET_DIR\" $ARCHIVE_ARG"
     echo "Running: $CMD"
     eval $CMD
     
@@ -76,6 +92,19 @@ if [ "$DEVICE" == "acq" ] && [ "$MODALITY" == "ecg" ]; then
         echo "Failed with exit code $exit_code"
         exit $exit_code
     fi
+    eval python $PROJECT_ROOT/utils/pipeline_manifest.py record $MANIFEST_ARGS
+
+elif [ "$DEVICE" == "acq" ] && [ "$MODALITY" == "all" ]; then
+    # Single-pass catalog: process_acq_all.py (Layer 2) extracts events in the same read.
+    if [ "$USE_ACQ_ARCHIVE" == "true" ]; then
+        TARGET_DIR="$OUTPUT_ROOT/$PID/$VISIT"
+        mkdir -p "$TARGET_DIR"
+        echo "Ingesting Job $ROW_INDEX ($DEVICE - $MODALITY): Events are extracted by process_acq_all.py in Layer 2."
+        python $SCRIPT_DIR/ingest_acq.py --acq_file "$FILE_PATH" --archive_dir "$TARGET_DIR/acq_archive"
+        exit $?
+    fi
+    echo "Skipping Job $ROW_INDEX ($DEVICE - $MODALITY): Events are extracted by process_acq_all.py in Layer 2."
+    exit 0
 
 else
     echo "Skipping Job $ROW_INDEX ($DEVICE - $MODALITY): Not a primary event trigger."
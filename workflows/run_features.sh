@@ -8,7 +8,7 @@
 #SBATCH --nodes=1
 #SBATCH --ntasks-per-node=1
 #SBATCH --cpus-per-task=1
-#SBATCH --mem=32g
+#SBATCH --mem=16g
 #SBATCH --time=00:45:00
 #SBATCH --account=sungchoi99
 #SBATCH --partition=standard
@@ -72,11 +72,61 @@ fi
 TARGET_DIR="$OUTPUT_ROOT/$PID/$VISIT"
 EVENTS_FILE="$TARGET_DIR/events.csv"
 
-# Construct Processed File Name: processed_{modality}_{pid}_{visit}.csv
+if [ ! -f "$EVENTS_FILE" ]; then
+    echo "Warning: Events file not found: $EVENTS_FILE"
+    # Some features might extract without events, or script will fail.
+    # Allowing script to decide.
+fi
+
+# Skip if the manifest says this step's outputs are up to date (FORCE_RECOMPUTE="true" to rerun anyway)
+MANIFEST_ARGS="--layer features --participant_id \"$PID\" --visit_type \"$VISIT\" --device \"$DEVICE\" --modality \"$MODALITY\" --file_path \"$FILE_PATH\" --output_root \"$OUTPUT_ROOT\""
+if [ "$FORCE_RECOMPUTE" != "true" ] && eval python $PROJECT_ROOT/utils/pipeline_manifest.py check $MANIFEST_ARGS; then
+    echo "Outputs are up to date. Skipping."
+    exit 0
+fi
+
+# Single-pass catalogs have one 'all' row per ACQ file: one process extracts every modality
+# with a processed file, reading the events once (modalities in parallel on the task's CPUs).
+if [ "$MODALITY" == "all" ]; then
+    CMD="python $PROJECT_ROOT/features_extraction/features_acq_all.py \
+        --id \"$PID\" \
+        --visit \"$VISIT\" \
+        --dir \"$TARGET_DIR\" \
+        --events_file \"$EVENTS_FILE\" \
+        --out \"$TARGET_DIR\" \
+        --window_size ${FEATURE_WINDOW_SIZE:-1.0} \
+        --workers ${SLURM_CPUS_PER_TASK:-1}"
+
+    if [ -n "$FEATURE_HOP_SIZE" ]; then
+        CMD="$CMD --hop_size $FEATURE_HOP_SIZE"
+    fi
+    if [ -n "$FEATURE_STORE" ]; then
+        CMD="$CMD --feature_store \"$FEATURE_STORE\""
+    fi
+    if [ -n "$FEATURE_MAX_MEMORY" ]; then
+        CMD="$CMD --max_memory $FEATURE_MAX_MEMORY"
+    fi
+
+    echo "Running: $CMD"
+    eval $CMD
+
+    exit_code=$?
+    if [ $exit_code -ne 0 ]; then
+        echo "Feature extraction failed with exit code $exit_code"
+        exit $exit_code
+    fi
+    eval python $PROJECT_ROOT/utils/pipeline_manifest.py record $MANIFEST_ARGS
+    echo "Job Complete."
+    exit 0
+fi
+
+# Construct Processed File Name: processed_{modality}_{pid}_{visit}.parquet (or .csv)
 # Note: Python scripts replace spaces in visit with underscores
 VISIT_CLEAN=${VISIT// /_}
-PROCESSED_FILE_NAME="processed_${MODALITY}_${PID}_${VISIT_CLEAN}.csv"
-PROCESSED_FILE="$TARGET_DIR/$PROCESSED_FILE_NAME"
+PROCESSED_FILE="$TARGET_DIR/processed_${MODALITY}_${PID}_${VISIT_CLEAN}.parquet"
+if [ ! -f "$PROCESSED_FILE" ]; then
+    PROCESSED_FILE="$TARGET_DIR/processed_${MODALITY}_${PID}_${VISIT_CLEAN}.csv"
+fi
 
 echo "  Input File: $PROCESSED_FILE"
 echo "  Events File: $EVENTS_FILE"
@@ -89,12 +139,6 @@ if [ ! -f "$PROCESSED_FILE" ]; then
     exit 1
 fi
 
-if [ ! -f "$EVENTS_FILE" ]; then
-    echo "Warning: Events file not found: $EVENTS_FILE"
-    # Some features might extract without events, or script will fail.
-    # Allowing script to decide.
-fi
-
 # Select Script
 SCRIPT_NAME="features_acq_${MODALITY}.py"
 PYTHON_SCRIPT="$PROJECT_ROOT/features_extraction/$SCRIPT_NAME"
@@ -112,7 +156,18 @@ CMD="python $PYTHON_SCRIPT \
     --visit \"$VISIT\" \
     --file \"$PROCESSED_FILE\" \
     --events_file \"$EVENTS_FILE\" \
-    --out \"$TARGET_DIR\""
+    --out \"$TARGET_DIR\" \
+    --window_size ${FEATURE_WINDOW_SIZE:-1.0}"
+
+if [ -n "$FEATURE_HOP_SIZE" ]; then
+    CMD="$CMD --hop_size $FEATURE_HOP_SIZE"
+fi
+if [ -n "$FEATURE_STORE" ]; then
+    CMD="$CMD --feature_store \"$FEATURE_STORE\""
+fi
+if [ -n "$FEATURE_MAX_MEMORY" ]; then
+    CMD="$CMD --max_memory $FEATURE_MAX_MEMORY"
+fi
 
 echo "Running: $CMD"
 eval $CMD
@@ -122,5 +177,6 @@ if [ $exit_code -ne 0 ]; then
     echo "Feature extraction failed with exit code $exit_code"
     exit $exit_code
 fi
+eval python $PROJECT_ROOT/utils/pipeline_manifest.py record $MANIFEST_ARGS
 
 echo "Job Complete."
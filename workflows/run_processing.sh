@@ -69,17 +69,26 @@ OUTPUT_DIR="$OUTPUT_ROOT/$PID/$VISIT"
 EVENTS_FILE="$OUTPUT_DIR/events.csv"
 
 # Check if events exist (Layer 1 Check)
-if [ ! -f "$EVENTS_FILE" ]; then
+# Not needed for single-pass 'all' rows: process_acq_all.py writes events.csv itself.
+if [ ! -f "$EVENTS_FILE" ] && [ "$MODALITY" != "all" ]; then
     echo "WARNING: Events file not found at $EVENTS_FILE"
     # Proceed? Or Fail? 
     # Hexoskin RSP/ECG might need events. Acq scripts definitely do.
     # For now, we pass it. The python scripts should handle missing events gracefully if possible, or fail.
 fi
 
+# Skip if the manifest says this step's outputs are up to date (FORCE_RECOMPUTE="true" to rerun anyway)
+MANIFEST_ARGS="--layer processing --participant_id \"$PID\" --visit_type \"$VISIT\" --device \"$DEVICE\" --modality \"$MODALITY\" --file_path \"$FILE_PATH\" --output_root \"$OUTPUT_ROOT\""
+if [ "$FORCE_RECOMPUTE" != "true" ] && eval python $PROJECT_ROOT/utils/pipeline_manifest.py check $MANIFEST_ARGS; then
+    echo "Outputs are up to date. Skipping."
+    exit 0
+fi
+
 # Select Script
 PYTHON_SCRIPT=""
 case "$DEVICE" in
     "acq")
+        # MODALITY 'all' -> process_acq_all.py (one read, events + every modality)
         PYTHON_SCRIPT="$SCRIPT_DIR/process_acq_${MODALITY}.py"
         ;;
     "hexoskin")
@@ -106,13 +115,54 @@ CMD="python $PYTHON_SCRIPT --participant_id $PID --visit_type \"$VISIT\" --event
 
 if [ "$DEVICE" == "acq" ]; then
     CMD="$CMD --acq_file \"$FILE_PATH\""
+    # Memory-mapped archive written by Layer 1 (falls back to the .acq if missing or stale)
+    if [ "$USE_ACQ_ARCHIVE" == "true" ]; then
+        CMD="$CMD --archive_dir \"$OUTPUT_DIR/acq_archive\""
+    fi
 elif [ "$DEVICE" == "hexoskin" ]; then
     # Hexoskin scripts expect --hex_path (which handles dir or file now)
     CMD="$CMD --hex_path \"$FILE_PATH\""
 fi
 
-# Append output directory argument
-CMD="$CMD --output_dir \"$OUTPUT_DIR\""
+# Append output directory and format arguments
+CMD="$CMD --output_dir \"$OUTPUT_DIR\" --output_format ${OUTPUT_FORMAT:-csv}"
+
+# Peak columns only in the index sidecar (scripts that write one)
+if [ "$SPARSE_PEAKS" == "true" ] && [ "$DEVICE" == "acq" ]; then
+    case "$MODALITY" in
+        ecg|eda|bp|all) CMD="$CMD --sparse_peaks" ;;
+    esac
+fi
+
+# Decimate slow modalities before processing (EDA/RSP/BP_TARGET_RATE, empty = native rate)
+if [ "$DEVICE" == "acq" ]; then
+    case "$MODALITY" in
+        eda) [ -n "$EDA_TARGET_RATE" ] && CMD="$CMD --target_rate $EDA_TARGET_RATE" ;;
+        rsp) [ -n "$RSP_TARGET_RATE" ] && CMD="$CMD --target_rate $RSP_TARGET_RATE" ;;
+        bp) [ -n "$BP_TARGET_RATE" ] && CMD="$CMD --target_rate $BP_TARGET_RATE" ;;
+        all)
+            TARGET_RATES=""
+            [ -n "$EDA_TARGET_RATE" ] && TARGET_RATES="$TARGET_RATES eda=$EDA_TARGET_RATE"
+            [ -n "$RSP_TARGET_RATE" ] && TARGET_RATES="$TARGET_RATES rsp=$RSP_TARGET_RATE"
+            [ -n "$BP_TARGET_RATE" ] && TARGET_RATES="$TARGET_RATES bp=$BP_TARGET_RATE"
+            [ -n "$TARGET_RATES" ] && CMD="$CMD --target_rates$TARGET_RATES"
+            ;;
+    esac
+fi
+
+# BP per-beat table instead of the interpolated SBP/DBP columns
+if [ "$BP_BEAT_TABLE" == "true" ] && [ "$DEVICE" == "acq" ]; then
+    case "$MODALITY" in
+        bp|all) CMD="$CMD --beat_table" ;;
+    esac
+fi
+
+# Multi-channel RSP/EMG: one process per channel on the task's CPUs (--cpus-per-task)
+if [ "$DEVICE" == "acq" ]; then
+    case "$MODALITY" in
+        rsp|emg|all) CMD="$CMD --workers ${SLURM_CPUS_PER_TASK:-1}" ;;
+    esac
+fi
 
 echo "Running: $CMD"
 eval $CMD
@@ -122,5 +172,6 @@ if [ $exit_code -ne 0 ]; then
     echo "Process failed with exit code $exit_code"
     exit $exit_code
 fi
+eval python $PROJECT_ROOT/utils/pipeline_manifest.py record $MANIFEST_ARGS
 
 echo "Job Complete."
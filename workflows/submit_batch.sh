@@ -1,6 +1,7 @@
 #!/bin/bash
 # Master Submission Script for MOXIE Pipeline
-# Usage: ./submit_batch.sh
+# Usage: ./submit_batch.sh [--dry-run]
+#   --dry-run: list what each layer would (re)compute (pipeline manifest), submit nothing
 
 # Configuration (Adjust paths for cluster)
 REPO_ROOT=$(dirname "$(realpath "$0")")/..
@@ -8,6 +9,21 @@ DATA_ROOT="/nfs/turbo/lsa-aditya/Participant Data"  # Example Cluster Path
 OUTPUT_ROOT="$REPO_ROOT/Processed_Data"
 CATALOG_FILE="$REPO_ROOT/processing_catalog.csv"
 
+# Dry run: steps whose outputs are up to date are skipped by the layer jobs, so list only what would run.
+# Paths (OUTPUT_ROOT, CATALOG_FILE) and parameters (OUTPUT_FORMAT, FEATURE_WINDOW_SIZE, ...) come from
+# cluster_config.sh, as in the jobs; MOXIE_DRY_RUN keeps it from creating OUTPUT_ROOT.
+if [ "$1" == "--dry-run" ]; then
+    MOXIE_DRY_RUN="true"
+    source "$REPO_ROOT/workflows/cluster_config.sh"
+    if [ ! -f "$CATALOG_FILE" ]; then
+        echo "Error: Catalog not found at $CATALOG_FILE"
+        exit 1
+    fi
+    PLAN_CMD="python \"$REPO_ROOT/utils/pipeline_manifest.py\" plan --catalog \"$CATALOG_FILE\" --output_root \"$OUTPUT_ROOT\""
+    eval $PLAN_CMD
+    exit $?
+fi
+
 # Check if catalog exists
 if [ ! -f "$CATALOG_FILE" ]; then
     echo "Error: Catalog not found at $CATALOG_FILE"